@@ -1,16 +1,29 @@
 from datetime import datetime, timedelta, time, date
 from typing import Optional, Tuple
+from time import perf_counter
 import os
 import re
 import json
+import asyncio
+import threading
 
 import torch
-from transformers import BertTokenizerFast, BertForTokenClassification
-from fastapi import FastAPI, Depends
+from transformers import BertConfig, BertTokenizerFast, BertForTokenClassification
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 
+from ml.batcher import MicroBatcher
+from ml.parse_cache import ParseCache
+from ml.word_encoder import WordPieceCache
+from ml.label_spans import decode_spans
+from ml.day_resolver import DayResolver
+from ml.bulk_parse import (
+    NDJSON_MEDIA_TYPE, PARSE_BULK_MAX_BODY_BYTES, read_body, split_bulk_body, stream_bulk_parse,
+)
+
 # Database setup
 DATABASE_URL = "sqlite:///./events.db"
 engine = create_engine(
@@ -43,15 +56,65 @@ def get_db():
 
 # Use the hosted model instead of local files
 MODEL_NAME = "dex7er999/NLPCalendar"
-
-# Зареждане на токенизатор и модел
-tokenizer = BertTokenizerFast.from_pretrained(MODEL_NAME)
-model = BertForTokenClassification.from_pretrained(MODEL_NAME)
-model.eval()
-
-# Load labels from the model config
-config = model.config
-LABELS = [label for _, label in sorted(config.id2label.items(), key=lambda x: int(x[0]))]
+BATCH_SIZE = int(os.getenv("ML_BATCH_SIZE", "32"))
+ML_EAGER_LOAD = os.getenv("ML_EAGER_LOAD", "true").lower() == "true"
+
+# Токенизаторът и моделът се зареждат при първа заявка или във фонов thread при startup
+tokenizer = None
+model = None
+word_encoder = None
+LABELS = []
+_model_lock = threading.Lock()
+_model_status = {"state": "cold", "load_seconds": None, "warmup_seconds": None, "error": None}
+
+WARMUP_TEXTS = [
+    "Йога клас утре сутринта",
+    "Обяд от 15 събота с Иван",
+    "Онлайн лекция по програмиране в понеделник от 10 до 12",
+]
+
+def _config_labels(config) -> list[str]:
+    return [label for _, label in sorted(config.id2label.items(), key=lambda x: int(x[0]))]
+
+def ensure_model_loaded() -> bool:
+    """Loads and warms up the model on first use (thread-safe). Returns whether it is available;
+    after a failed load it stays "failed" and is not retried on every request."""
+    global tokenizer, model, LABELS, word_encoder
+    if model is not None:
+        return True
+    with _model_lock:
+        if model is not None:
+            return True
+        if _model_status["state"] == "failed":
+            return False
+        _model_status["state"] = "loading"
+        started = perf_counter()
+        try:
+            tok = BertTokenizerFast.from_pretrained(MODEL_NAME)
+            mdl = BertForTokenClassification.from_pretrained(MODEL_NAME)
+            mdl.eval()
+        except Exception as e:
+            print(f"Model loading failed: {e}")
+            _model_status.update(state="failed", error=str(e))
+            return False
+        _model_status["load_seconds"] = round(perf_counter() - started, 3)
+
+        # Load labels from the model config
+        LABELS = _config_labels(mdl.config)
+        tokenizer, model = tok, mdl
+        word_encoder = WordPieceCache(tok)
+
+        # Warm-up: a batch and a single sentence prime the kernels and the tokenizer
+        _model_status["state"] = "warming"
+        started = perf_counter()
+        try:
+            _predict_labels([text.split() for text in WARMUP_TEXTS])
+            _predict_labels([WARMUP_TEXTS[0].split()])
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+        _model_status["warmup_seconds"] = round(perf_counter() - started, 3)
+        _model_status.update(state="ready", error=None)
+        return True
 
 # Use the same maps from nlp_parser_ml.py
 WEEKDAYS = {
@@ -67,54 +130,11 @@ DAYTIME_HINTS = {
     "следобед": time(15, 0), "вечерта": time(19, 0), "вечер": time(19, 0)
 }
 
-def _next_weekday(from_date: date, target_weekday: int) -> date:
-    current_date = from_date.date() if isinstance(from_date, datetime) else from_date
-    current_weekday = current_date.weekday()
-    days_ahead = target_weekday - current_weekday
-    if days_ahead <= 0:
-        days_ahead += 7
-    next_date = current_date + timedelta(days=days_ahead)
-    return next_date
+# Day expression -> date lookups, one table per reference day
+day_resolver = DayResolver(WEEKDAYS, RELATIVE)
 
 def _parse_day_from_tokens(day_tokens: list[str], now: datetime) -> Optional[date]:
-    if not day_tokens:
-        return None
-
-    for t in day_tokens:
-        if t.lower() in RELATIVE:
-            return (now + timedelta(days=RELATIVE[t.lower()])).date()
-
-    for t in day_tokens:
-        weekday_val = WEEKDAYS.get(t) or WEEKDAYS.get(t.lower())
-        if weekday_val is not None:
-            return _next_weekday(now, weekday_val)
-
-    for t in day_tokens:
-        m = re.match(r"^(\d{1,2})(?:-?(ви|ри|ти|ми))?\.?$", t)
-        if m:
-            day = int(m.group(1))
-            y, mth = now.year, now.month
-            try:
-                candidate = date(y, mth, day)
-            except ValueError:
-                if mth == 12:
-                    candidate = date(y + 1, 1, day)
-                else:
-                    candidate = date(y, mth + 1, day)
-            if candidate < now.date():
-                if candidate.month == 12:
-                    candidate = date(candidate.year + 1, 1, candidate.day)
-                else:
-                    for i in range(1, 3):
-                        try:
-                            candidate = date(y + (mth + i - 1) // 12,
-                                          ((mth + i - 1) % 12) + 1,
-                                          day)
-                            break
-                        except ValueError:
-                            continue
-            return candidate
-    return None
+    return day_resolver.resolve(day_tokens, now)
 
 def _parse_time_from_tokens(time_tokens: list[str]) -> Tuple[Optional[time], Optional[time]]:
     if not time_tokens:
@@ -145,105 +165,89 @@ def _parse_time_from_tokens(time_tokens: list[str]) -> Tuple[Optional[time], Opt
         return times[0], None
     return None, None
 
-def _find_daytime_hint(tokens: list[str], labels: list[str]) -> Optional[time]:
-    for tok, lab in zip(tokens, labels):
-        if lab in ("B-WHEN_DAY", "I-WHEN_DAY") and tok.lower() in DAYTIME_HINTS:
+def _find_daytime_hint(day_tokens: list[str]) -> Optional[time]:
+    for tok in day_tokens:
+        if tok.lower() in DAYTIME_HINTS:
             return DAYTIME_HINTS[tok.lower()]
     return None
 
+# Labels for repeated phrases; dates are re-resolved against "now" on every hit
+parse_cache = ParseCache()
+
 def parse_text(text: str) -> dict:
-    if not text or not text.strip():
-        return {
-            "error": "не успях да разбера текста. Опитай да преформулираш.",
-            "debug": {"model_name": MODEL_NAME, "note": "empty text"}
-        }
-    
-    # Ensure proper UTF-8 encoding
-    try:
-        if isinstance(text, bytes):
-            text = text.decode('utf-8')
-        elif isinstance(text, str):
-            text = text.encode('utf-8').decode('utf-8')
-    except Exception as e:
-        print(f"Encoding error: {str(e)}")
-        return {
-            "error": "проблем с кодирането на текста",
-            "debug": {"model_name": MODEL_NAME, "note": "encoding error"}
-        }
+    return parse_texts([text])[0]
 
-    words = text.split()
-    encoding = tokenizer(words, is_split_into_words=True, return_tensors="pt", truncation=True, padding=True)
+def parse_texts(texts: list[str]) -> list[dict]:
+    results = [None] * len(texts)
+    pending = []
+    now = datetime.now()
+
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            results[i] = {
+                "error": "не успях да разбера текста. Опитай да преформулираш.",
+                "debug": {"model_name": MODEL_NAME, "note": "empty text"}
+            }
+            continue
+
+        # Ensure proper UTF-8 encoding
+        try:
+            if isinstance(text, bytes):
+                text = text.decode('utf-8')
+            elif isinstance(text, str):
+                text = text.encode('utf-8').decode('utf-8')
+        except Exception as e:
+            print(f"Encoding error: {str(e)}")
+            results[i] = {
+                "error": "проблем с кодирането на текста",
+                "debug": {"model_name": MODEL_NAME, "note": "encoding error"}
+            }
+            continue
+
+        cached = parse_cache.get(text)
+        if cached is not None:
+            results[i] = _build_result(*cached, now)
+            results[i]["debug"]["cache"] = "hit"
+            continue
+
+        pending.append((i, text.split()))
+
+    if pending and not ensure_model_loaded():
+        for i, _ in pending:
+            results[i] = {"error": "Моделът не е наличен.", "debug": {"model": dict(_model_status)}}
+        return results
+
+    for offset in range(0, len(pending), BATCH_SIZE):
+        chunk = pending[offset:offset + BATCH_SIZE]
+        batch_labels = _predict_labels([words for _, words in chunk])
+        for (i, words), labels in zip(chunk, batch_labels):
+            results[i] = _build_result(words, labels, now)
+            parse_cache.put(texts[i], words, labels)
+    return results
+
+def _predict_labels(words_batch: list[list[str]]) -> list[list[str]]:
+    encoding = word_encoder.encode(words_batch, return_tensors="pt")
 
     with torch.no_grad():
         outputs = model(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"])
-    
-    pred_ids = torch.argmax(outputs.logits, dim=-1).squeeze().tolist()
-    word_ids = encoding.word_ids(batch_index=0)
-    
-    labels = []
-    current = None
-    for idx, wid in enumerate(word_ids):
-        if wid is not None and wid != current:
-            current = wid
-            labels.append(LABELS[pred_ids[idx]])
-
-    fixed_labels = [
-        "B-WHEN_DAY" if label == "O" and word.lower() in WEEKDAYS else label
-        for word, label in zip(words, labels)
-    ]
-    labels = fixed_labels
-    tokens = words
 
-    # Extract title
-    first_index = -1
-    last_index = -1
-    title_words = {"клас", "колелета", "тате", "офис", "мол"}
-    
-    for i, (token, label) in enumerate(zip(tokens, labels)):
-        if (label in ["B-TITLE", "B-PERSON", "B-PLACE"] or 
-            token.lower() in title_words or 
-            (i > 0 and tokens[i-1].lower() == "с" and token not in WEEKDAYS and not token.isdigit())):
-            if first_index == -1:
-                first_index = i
-            last_index = i
-
-    if first_index == -1:
-        title_tokens = [t for t, lab in zip(tokens, labels) if lab == "B-TITLE"]
-        title = " ".join(title_tokens).strip()
-    else:
-        title_tokens = tokens[first_index:last_index + 1]
-        filtered_tokens = []
-        
-        for token in title_tokens:
-            if not (
-                token.lower() in {"сутринта", "вечерта", "следобед", "утре", "днес", "вдругиден"} or
-                token in WEEKDAYS or token.lower() in WEEKDAYS or
-                token.lower() in {"на", "от", "до"}
-            ):
-                filtered_tokens.append(token)
-        
-        title = " ".join(filtered_tokens).strip()
+    # One gather over the first-subword mask for the whole batch
+    pred_ids = torch.argmax(outputs.logits, dim=-1).numpy()
+    return encoding.word_labels(pred_ids, LABELS)
 
-    day_tokens = [t for t, lab in zip(tokens, labels) if lab in ("B-WHEN_DAY", "I-WHEN_DAY")]
-    time_section = []
-    in_time_section = False
-    
-    for t, lab in zip(tokens, labels):
-        if lab == "B-WHEN_START":
-            in_time_section = True
-            time_section.append(t)
-        elif in_time_section and (lab == "O" or lab == "B-WHEN_START"):
-            time_section.append(t)
-        elif in_time_section:
-            in_time_section = False
-
-    start_tokens = time_section if time_section else []
-    now = datetime.now()
+def _build_result(words: list[str], labels: list[str], now: datetime) -> dict:
+    decoded = decode_spans(words, labels, WEEKDAYS)
+    labels = decoded.labels
+    tokens = words
+
+    title = decoded.title()
+    day_tokens = decoded.day_tokens()
+    start_tokens = decoded.time_tokens()
     the_date = _parse_day_from_tokens(day_tokens, now)
     start_time, end_time = _parse_time_from_tokens(start_tokens) if start_tokens else (None, None)
 
     if start_time is None:
-        start_time = _find_daytime_hint(tokens, labels)
+        start_time = _find_daytime_hint(day_tokens)
 
     start_dt = None
     end_dt = None
@@ -267,9 +271,7 @@ def parse_text(text: str) -> dict:
                 end_dt += timedelta(days=1)
 
     if not title:
-        non_when = [t for t, lab in zip(tokens, labels) if lab not in ("B-WHEN_DAY", "I-WHEN_DAY", "B-WHEN_START")]
-        filtered = [t for t in non_when if t.lower() not in {"на", "в", "с", "от", "до"}]
-        title = " ".join(filtered).strip()
+        title = decoded.fallback_title()
 
     if not title or not start_dt:
         return {
@@ -292,6 +294,9 @@ def parse_text(text: str) -> dict:
         "debug": {"model_name": MODEL_NAME, "note": "inference ok"}
     }
 
+# Concurrent /parse requests share one padded forward pass
+parse_batcher = MicroBatcher(parse_texts)
+
 app = FastAPI(title="AI Calendar API", version="0.1.0")
 
 # Create an API router with /api prefix
@@ -310,7 +315,10 @@ api_router.add_middleware(
 @api_router.middleware("http")
 async def add_charset_middleware(request, call_next):
     response = await call_next(request)
-    response.headers["Content-Type"] = "application/json; charset=utf-8"
+    if response.headers.get("Content-Type", "").startswith(NDJSON_MEDIA_TYPE):
+        response.headers["Content-Type"] = f"{NDJSON_MEDIA_TYPE}; charset=utf-8"
+    else:
+        response.headers["Content-Type"] = "application/json; charset=utf-8"
     return response
 
 # Mount the API router under /api prefix
@@ -318,19 +326,45 @@ app.mount("/api", api_router)
 
 @api_router.get("/")
 def read_root():
+    # Before the lazy load the labels come from the model config (no weights are loaded);
+    # ensure_model_loaded sets the same list from the model later
+    global LABELS
+    if not LABELS:
+        try:
+            LABELS = _config_labels(BertConfig.from_pretrained(MODEL_NAME))
+        except Exception as e:
+            print(f"Model config loading failed: {e}")
     return {
         "status": "ok",
         "model_name": MODEL_NAME,
-        "labels": LABELS
+        "model_state": _model_status["state"],
+        "labels": LABELS or None
     }
 
-@api_router.post("/parse")
-def parse_event(payload: dict):
-    text = payload.get("text", "")
-    if not text:
-        return {"error": "Не е подаден текст."}
+@app.on_event("startup")
+async def startup_event():
+    if ML_EAGER_LOAD:
+        threading.Thread(target=ensure_model_loaded, name="ml-model-loader", daemon=True).start()
+
+@api_router.get("/ready")
+def readiness_check():
+    status_info = {"model_name": MODEL_NAME, "ready": _model_status["state"] == "ready", **_model_status}
+    return JSONResponse(status_code=200 if status_info["ready"] else 503, content=status_info)
 
-    result = parse_text(text)
+@app.on_event("shutdown")
+async def shutdown_event():
+    await parse_batcher.stop()
+
+@api_router.get("/parse/stats")
+def parse_stats():
+    return {
+        "batcher": parse_batcher.stats(),
+        "cache": parse_cache.stats(),
+        "day_table": day_resolver.stats(),
+        "wordpiece": word_encoder.stats() if word_encoder is not None else None,
+    }
+
+def _format_parse_result(result: dict) -> dict:
     if "error" in result:
         return result
 
@@ -348,6 +382,36 @@ def parse_event(payload: dict):
         "debug": result.get("debug", {})
     }
 
+@api_router.post("/parse")
+async def parse_event(payload: dict):
+    text = payload.get("text", "")
+    if not text:
+        return {"error": "Не е подаден текст."}
+
+    return _format_parse_result(await parse_batcher.submit(text))
+
+def _bulk_format(result: dict) -> dict:
+    if "error" not in result and not (result.get("datetime") or result.get("start")):
+        return {"error": "не успях да разбера датата/часа.", "debug": result.get("debug", {})}
+    return _format_parse_result(result)
+
+async def _bulk_parse_chunk(texts: list[str]) -> list[dict]:
+    results = await asyncio.gather(*(parse_batcher.submit(text) for text in texts))
+    return [_bulk_format(result) for result in results]
+
+@api_router.post("/parse/bulk")
+async def parse_bulk(request: Request):
+    """NDJSON ({"text": ..., "id": ...} per line), a JSON array or plain text lines in
+    (the body is read before the response starts),
+    NDJSON results out in completion order; every line goes through the micro-batcher."""
+    ndjson = request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/json"))
+    try:
+        body = await read_body(request.stream())
+    except ValueError:
+        return JSONResponse(status_code=413, content={"error": f"Максимум {PARSE_BULK_MAX_BODY_BYTES} байта."})
+    items = split_bulk_body(body, ndjson)
+    return StreamingResponse(stream_bulk_parse(items, _bulk_parse_chunk), media_type=NDJSON_MEDIA_TYPE)
+
 @api_router.get("/events")
 def get_events(db: Session = Depends(get_db)):
     events = db.query(Event).all()
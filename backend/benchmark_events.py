@@ -0,0 +1,160 @@
+"""
+Benchmark на GET /events заявките при много събития на потребител.
+
+Пълни отделна база (по подразбиране временен SQLite файл) с --events събития
+за един потребител (няколко години история) и мери:
+
+  - full_list:        всички събития, подредени по start (старото поведение)
+  - month_no_index:   един месец с from/to, без индекса (owner_id, start)
+  - month_indexed:    същата заявка с индекса
+  - month_recent:     последният месец от историята (текущият месец в календара)
+  - page_first:       keyset страница в началото на историята
+  - page_deep:        keyset страница след 90% от историята
+  - offset_deep:      същата дълбока страница с OFFSET (за сравнение)
+  - changes_tail:      GET /events/changes от token преди последните 1% промени
+
+    python -m backend.benchmark_events --events 100000
+    python -m backend.benchmark_events --database-url postgresql://... --events 200000
+
+Не ползва DATABASE_URL на приложението - базата се създава и изтрива от benchmark-а.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from ml.bench_utils import latency_summary
+from . import models
+from .database import Base
+from .event_queries import (
+    EVENTS_CHANGES_MAX, EVENTS_PAGE_SIZE, changes_since, encode_cursor, encode_since, keyset_page, list_owner_events,
+    note_event_spans,
+)
+
+INSERT_CHUNK = 5000
+OTHER_USERS = 4
+
+
+def populate(session, n_events: int, seed: int) -> int:
+    rng = random.Random(seed)
+    users = []
+    for i in range(OTHER_USERS + 1):
+        user = models.User(email=f"bench{i}@example.com", username=f"bench{i}", hashed_password="x",
+                           created_at=datetime(2020, 1, 1), is_active=True)
+        session.add(user)
+        users.append(user)
+    session.flush()
+    heavy = users[0].id
+
+    # Тежкият потребител има n_events събития за ~5 години, останалите - по 10%
+    first = datetime(2021, 1, 1)
+    span_minutes = 5 * 365 * 24 * 60
+    rows = []
+    for owner in [heavy] * n_events + [u.id for u in users[1:] for _ in range(n_events // 10)]:
+        start = first + timedelta(minutes=rng.randrange(span_minutes))
+        rows.append({"title": "Събитие", "start": start, "end": start + timedelta(minutes=rng.choice([30, 60, 90, 24 * 60])),
+                     "raw_text": None, "owner_id": owner})
+    for offset in range(0, len(rows), INSERT_CHUNK):
+        session.execute(models.Event.__table__.insert(), rows[offset:offset + INSERT_CHUNK])
+    # Записите минават покрай API-то - отбелязваме най-дългото събитие като него
+    for user in users:
+        note_event_spans(session, user.id, [(row["start"], row["end"]) for row in rows if row["owner_id"] == user.id])
+    session.commit()
+    return heavy
+
+
+def time_query(fetch, repeat: int) -> dict:
+    """fetch() връща списък от редове; мери го repeat пъти след едно загряващо извикване."""
+    fetch()
+    latencies, rows = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(fetch())
+        latencies.append(time.perf_counter() - started)
+    return {"rows": rows, "latency": latency_summary(latencies)}
+
+
+def query_plan(engine, session, owner_id: int, month_from: datetime, month_to: datetime) -> list[str]:
+    query = list_owner_events(session, owner_id, month_from, month_to)
+    compiled = query.statement.compile(engine, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        return [" ".join(str(col) for col in row) for row in conn.execute(text(prefix + str(compiled)))]
+
+
+def run(database_url: str, n_events: int, repeat: int, seed: int) -> dict:
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        owner_id = populate(session, n_events, seed)
+        report = {"events_per_user": n_events, "populate_seconds": round(time.perf_counter() - started, 2)}
+
+        month_from, month_to = datetime(2024, 3, 1), datetime(2024, 4, 1)
+        month = lambda: list_owner_events(session, owner_id, month_from, month_to).all()  # noqa: E731
+        report["full_list"] = time_query(lambda: list_owner_events(session, owner_id).all(), max(1, repeat // 10))
+
+        index = next(i for i in models.Event.__table__.indexes if i.name == "ix_events_owner_start")
+        index.drop(engine)
+        report["month_no_index"] = time_query(month, repeat)
+        index.create(engine)
+        report["month_indexed"] = time_query(month, repeat)
+        report["month_indexed"]["plan"] = query_plan(engine, session, owner_id, month_from, month_to)
+        report["speedup_vs_full_list"] = round(
+            report["full_list"]["latency"]["p50_ms"] / report["month_indexed"]["latency"]["p50_ms"], 1)
+        report["speedup_vs_no_index"] = round(
+            report["month_no_index"]["latency"]["p50_ms"] / report["month_indexed"]["latency"]["p50_ms"], 1)
+        recent_from, recent_to = datetime(2025, 11, 1), datetime(2025, 12, 1)
+        report["month_recent"] = time_query(
+            lambda: list_owner_events(session, owner_id, recent_from, recent_to).all(), repeat)
+
+        everything = lambda: list_owner_events(session, owner_id)  # noqa: E731
+        deep = int(n_events * 0.9)
+        deep_cursor = encode_cursor(everything().offset(deep - 1).first())
+        report["page_first"] = time_query(lambda: keyset_page(everything(), None, EVENTS_PAGE_SIZE)[0], repeat)
+        report["page_deep"] = time_query(lambda: keyset_page(everything(), deep_cursor, EVENTS_PAGE_SIZE)[0], repeat)
+        report["offset_deep"] = time_query(lambda: everything().offset(deep).limit(EVENTS_PAGE_SIZE).all(), repeat)
+
+        by_update = session.query(models.Event).filter(models.Event.owner_id == owner_id).order_by(
+            models.Event.updated_at.asc(), models.Event.id.asc())
+        since = encode_since(by_update.offset(int(n_events * 0.99) - 1).first())
+        report["changes_tail"] = time_query(
+            lambda: changes_since(session, owner_id, since, EVENTS_CHANGES_MAX)[0], repeat)
+        return report
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GET /events range query and pagination benchmark")
+    parser.add_argument("--events", type=int, default=100_000, help="Events for the heavy user")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    url = args.database_url
+    if not url:
+        tmp_dir = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(tmp_dir, 'bench_events.db')}"
+    report = run(url, args.events, args.repeat, args.seed)
+    if tmp_dir:
+        os.remove(os.path.join(tmp_dir, "bench_events.db"))
+        os.rmdir(tmp_dir)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
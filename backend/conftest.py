@@ -0,0 +1,49 @@
+# backend/conftest.py
+"""
+Общи fixtures за тестовете на API-то: временна SQLite база и модел/Space изключени
+(парсерът минава през dateparser/regex backend-ите).
+
+    python -m pytest backend
+"""
+import os
+import tempfile
+import uuid
+
+# Конфигурацията на backend се чете при import - задаваме я преди него
+_DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["USE_HF_SPACE"] = "false"
+os.environ["ENABLE_ML_MODEL"] = "false"
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend.database import Base, engine  # noqa: E402
+from backend.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    Base.metadata.create_all(engine)
+    with TestClient(app) as test_client:
+        yield test_client
+    Base.metadata.drop_all(engine)
+
+
+def _new_user_headers(client) -> dict:
+    name = f"user{uuid.uuid4().hex[:8]}"
+    client.post("/register", json={"email": f"{name}@example.com", "username": name, "password": "secret123"})
+    token = client.post("/login", data={"username": name, "password": "secret123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Нов потребител за всеки тест - събитията на тестовете не се смесват."""
+    return _new_user_headers(client)
+
+
+@pytest.fixture
+def other_auth_headers(client):
+    """Втори потребител в същия тест (изолация между потребители)."""
+    return _new_user_headers(client)
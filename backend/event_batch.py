@@ -0,0 +1,135 @@
+import os
+from datetime import timedelta
+
+from sqlalchemy import insert, select, update
+
+from . import models
+from .event_queries import change_stamp, naive, note_event_spans
+
+# Максимум операции в една заявка към POST /events/batch
+EVENTS_BATCH_MAX = int(os.getenv("EVENTS_BATCH_MAX", "1000"))
+
+_EVENT_COLUMNS = ("id", "title", "start", "end", "raw_text", "owner_id", "updated_at")
+
+
+def _failure(index: int, op: str, status: int, error: str) -> dict:
+    return {"index": index, "op": op, "status": status, "event": None, "error": error}
+
+
+def _check_row(row: dict):
+    # "end": null изчиства края; заглавието и началото са задължителни
+    if not row["title"]:
+        raise ValueError("Заглавието е задължително")
+    if row["start"] is None:
+        raise ValueError("Началото е задължително")
+    if row["end"] is not None and row["end"] < row["start"]:
+        raise ValueError("Краят е преди началото")
+
+
+def apply_batch(db, owner_id: int, operations: list, atomic: bool = False) -> list[dict]:
+    """Прилага create/update/delete операциите на owner_id в една транзакция.
+
+    Операциите се проверяват в реда им срещу състоянието след предишните
+    (update след delete на същото събитие е 404). После всички нови събития
+    влизат с един многоредов INSERT, промените - с един executemany UPDATE
+    по първичен ключ, изтриванията (tombstone-и) - с един UPDATE ... WHERE id IN.
+    Версията на календара се вдига веднъж за целия пакет.
+
+    Връща по един резултат за всяка операция. Update/delete връщат крайното
+    състояние на събитието след целия пакет (две промени на едно събитие
+    връщат едно и също). При atomic=True и поне една грешка не се записва
+    нищо, а успешните операции получават статус 424."""
+    Event = models.Event
+    ids = {op.id for op in operations if op.op != "create"}
+    live = {}
+    if ids:
+        rows = db.execute(
+            select(*(getattr(Event, column) for column in _EVENT_COLUMNS))
+            .where(Event.owner_id == owner_id, Event.id.in_(ids), Event.deleted_at.is_(None))
+        ).mappings()
+        live = {row["id"]: {**row, "start": naive(row["start"]), "end": naive(row["end"])} for row in rows}
+
+    results: list[dict] = []
+    created: list[tuple[int, dict]] = []
+    changed: dict[int, dict] = {}
+    deleted: dict[int, dict] = {}
+    # (индекс на резултата, id) за успешните update/delete - събитието се попълва накрая
+    touched: list[tuple[int, int]] = []
+    for index, op in enumerate(operations):
+        if op.op == "create":
+            start = naive(op.start)
+            row = {"title": op.title, "start": start, "end": naive(op.end) if op.end else start + timedelta(hours=1),
+                   "raw_text": op.raw_text, "owner_id": owner_id}
+            try:
+                _check_row(row)
+            except ValueError as e:
+                results.append(_failure(index, op.op, 400, str(e)))
+                continue
+            created.append((index, row))
+            results.append(None)
+            continue
+
+        row = live.get(op.id)
+        if row is None:
+            results.append(_failure(index, op.op, 404, "Събитието не е намерено"))
+            continue
+        if op.op == "delete":
+            del live[op.id]
+            changed.pop(op.id, None)
+            deleted[op.id] = row
+            touched.append((index, op.id))
+            results.append({"index": index, "op": op.op, "status": 200, "event": row, "error": None})
+            continue
+
+        updated = {**row, **op.model_dump(exclude={"op", "id"}, exclude_unset=True)}
+        updated["start"], updated["end"] = naive(updated["start"]), naive(updated["end"])
+        try:
+            _check_row(updated)
+        except ValueError as e:
+            results.append(_failure(index, op.op, 400, str(e)))
+            continue
+        live[op.id] = changed[op.id] = updated
+        touched.append((index, op.id))
+        results.append({"index": index, "op": op.op, "status": 200, "event": updated, "error": None})
+
+    failed = sum(result is not None and result["status"] >= 400 for result in results)
+    if atomic and failed:
+        return [
+            result if result is not None and result["status"] >= 400
+            else _failure(index, operations[index].op, 424, "Не е приложено - пакетът съдържа грешки")
+            for index, result in enumerate(results)
+        ]
+    if not (created or changed or deleted):
+        return results
+
+    stamp = change_stamp(db, owner_id)
+    note_event_spans(db, owner_id, [(row["start"], row["end"]) for _, row in created] +
+                     [(row["start"], row["end"]) for row in changed.values()])
+    if created:
+        rows = [{**row, "updated_at": stamp} for _, row in created]
+        new_ids = db.execute(insert(Event).returning(Event.id, sort_by_parameter_order=True), rows).scalars().all()
+        for (index, row), event_id in zip(created, new_ids):
+            row.update(id=event_id, updated_at=stamp)
+            results[index] = {"index": index, "op": "create", "status": 201, "event": row, "error": None}
+    if changed:
+        for row in changed.values():
+            row["updated_at"] = stamp
+        db.execute(update(Event), [
+            {"id": row["id"], "title": row["title"], "start": row["start"], "end": row["end"], "updated_at": stamp}
+            for row in changed.values()
+        ])
+    if deleted:
+        for row in deleted.values():
+            row["updated_at"] = stamp
+        db.execute(
+            update(Event)
+            .where(Event.owner_id == owner_id, Event.id.in_(list(deleted)))
+            .values(deleted_at=stamp, updated_at=stamp)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+
+    final = {**changed, **deleted}
+    for index, event_id in touched:
+        results[index]["event"] = final[event_id]
+    return results
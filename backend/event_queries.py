@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import json
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+from urllib.parse import urlencode
+
+from sqlalchemy import and_, func, or_
+
+from . import models
+
+# Размер на страницата при keyset пагинация (GET /events?limit=...&cursor=...)
+EVENTS_PAGE_SIZE = int(os.getenv("EVENTS_PAGE_SIZE", "50"))
+EVENTS_PAGE_MAX = int(os.getenv("EVENTS_PAGE_MAX", "500"))
+# Максимум промени в един отговор на GET /events/changes (останалите - със следващия since)
+EVENTS_CHANGES_MAX = int(os.getenv("EVENTS_CHANGES_MAX", "1000"))
+
+
+def naive(dt: Optional[datetime]) -> Optional[datetime]:
+    """Събитията се пазят без часова зона - махаме я и от параметрите на заявката."""
+    if dt is not None and dt.tzinfo is not None:
+        return dt.replace(tzinfo=None)
+    return dt
+
+
+def events_in_range(
+    query,
+    range_from: Optional[datetime] = None,
+    range_to: Optional[datetime] = None,
+    max_event_seconds: Optional[int] = None,
+):
+    """Събитията, които се припокриват с [range_from, range_to): start < to и
+    (start >= from или end > from). Събитие без end е точка в start.
+
+    max_event_seconds (най-дългото събитие на потребителя) дава и долна граница
+    start >= from - max_event_seconds, така че индексът (owner_id, start) ограничава
+    сканирането от двете страни, без да изпуска дълги събития."""
+    Event = models.Event
+    range_from, range_to = naive(range_from), naive(range_to)
+    if range_to is not None:
+        query = query.filter(Event.start < range_to)
+    if range_from is not None:
+        if max_event_seconds is not None:
+            query = query.filter(Event.start >= range_from - timedelta(seconds=max_event_seconds))
+        query = query.filter(or_(Event.start >= range_from, Event.end > range_from))
+    return query
+
+
+def live_events(db, owner_id: int):
+    """Събитията на потребителя без изтритите (tombstone-ите остават само за /events/changes)."""
+    return db.query(models.Event).filter(models.Event.owner_id == owner_id, models.Event.deleted_at.is_(None))
+
+
+def list_owner_events(db, owner_id: int, range_from: Optional[datetime] = None, range_to: Optional[datetime] = None):
+    query = live_events(db, owner_id)
+    max_event_seconds = None
+    if range_from is not None:
+        max_event_seconds = db.query(models.User.max_event_seconds).filter(models.User.id == owner_id).scalar()
+    return events_in_range(query, range_from, range_to, max_event_seconds).order_by(models.Event.start.asc(), models.Event.id.asc())
+
+
+def _encode_key(moment: datetime, event_id: int) -> str:
+    raw = json.dumps([naive(moment).isoformat(), event_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_key(token: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        moment, event_id = json.loads(raw)
+        return datetime.fromisoformat(moment), int(event_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid token: {token}") from e
+
+
+def encode_cursor(event) -> str:
+    """Непрозрачен cursor за позицията след event: base64url от [start, id]."""
+    return _encode_key(event.start, event.id)
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Обратното на encode_cursor; ValueError при невалиден cursor."""
+    return _decode_key(cursor)
+
+
+def encode_since(event) -> str:
+    """Sync token след промяната в event: base64url от [updated_at, id]."""
+    return _encode_key(event.updated_at, event.id)
+
+
+def decode_since(since: str) -> tuple[datetime, int]:
+    """Обратното на encode_since; ValueError при невалиден token."""
+    return _decode_key(since)
+
+
+def keyset_page(query, cursor: Optional[str], limit: int) -> tuple[list, Optional[str]]:
+    """Една страница от query, подредена по (start, id), след позицията в cursor.
+
+    Вместо OFFSET продължаваме от последния видян ключ, така че индексът
+    (owner_id, start) стига директно до страницата - N-тата страница струва
+    колкото първата. Връща (събития, cursor за следващата страница или None)."""
+    Event = models.Event
+    if cursor:
+        after_start, after_id = decode_cursor(cursor)
+        query = query.filter(
+            Event.start >= after_start,
+            or_(Event.start > after_start, and_(Event.start == after_start, Event.id > after_id)),
+        )
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(rows[limit - 1])
+
+
+def bump_calendar_version(db, owner_id: int):
+    """+1 на версията на календара - в същата транзакция като промяната на събитията.
+
+    UPDATE ... SET calendar_version = calendar_version + 1, така че паралелни
+    промени не губят увеличение."""
+    db.query(models.User).filter(models.User.id == owner_id).update(
+        {models.User.calendar_version: models.User.calendar_version + 1}, synchronize_session=False
+    )
+
+
+def event_seconds(start: datetime, end: Optional[datetime]) -> int:
+    """Продължителност на събитие в цели секунди (закръглена нагоре); 0 без end."""
+    if end is None or naive(end) <= naive(start):
+        return 0
+    return math.ceil((naive(end) - naive(start)).total_seconds())
+
+
+def note_event_spans(db, owner_id: int, spans):
+    """Вдига users.max_event_seconds до най-дългото от (start, end) в spans.
+
+    Извиква се при всяко създаване/промяна на събития, в същата транзакция."""
+    longest = max((event_seconds(start, end) for start, end in spans), default=0)
+    if longest > 0:
+        db.query(models.User).filter(
+            models.User.id == owner_id, models.User.max_event_seconds < longest
+        ).update({models.User.max_event_seconds: longest}, synchronize_session=False)
+
+
+def change_stamp(db, owner_id: int) -> datetime:
+    """updated_at за промяна на събития на owner_id в текущата транзакция.
+
+    Първо вдига версията на календара - UPDATE-ът заключва реда на потребителя
+    до commit, така че промените на един потребител се сериализират. После
+    взимаме момент, строго по-голям от последния updated_at на потребителя
+    (по индекса (owner_id, updated_at)): sync token-ите растат в реда на
+    commit-ите, дори часовниците на инстанциите да се разминават."""
+    bump_calendar_version(db, owner_id)
+    last = db.query(func.max(models.Event.updated_at)).filter(models.Event.owner_id == owner_id).scalar()
+    stamp = datetime.utcnow()
+    if last is not None and stamp <= naive(last):
+        stamp = naive(last) + timedelta(microseconds=1)
+    return stamp
+
+
+def changes_since(db, owner_id: int, since: Optional[str], limit: int) -> tuple[list, list, Optional[str], bool]:
+    """Промените след since, подредени по (updated_at, id).
+
+    Връща (променени/нови събития, изтрити събития, token за следващата заявка, има ли още).
+    Без since - само живите събития (първоначална синхронизация, tombstone-и не трябват).
+    Без нови промени token-ът остава since."""
+    Event = models.Event
+    query = db.query(Event).filter(Event.owner_id == owner_id)
+    if since:
+        after, after_id = decode_since(since)
+        query = query.filter(
+            Event.updated_at >= after,
+            or_(Event.updated_at > after, and_(Event.updated_at == after, Event.id > after_id)),
+        )
+    else:
+        query = query.filter(Event.deleted_at.is_(None))
+    rows = query.order_by(Event.updated_at.asc(), Event.id.asc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    upserts = [row for row in rows if row.deleted_at is None]
+    deleted = [row for row in rows if row.deleted_at is not None]
+    return upserts, deleted, encode_since(rows[-1]) if rows else since, has_more
+
+
+def calendar_etag(user, query_params) -> str:
+    """Weak ETag за GET /events: потребител + версия на календара + параметрите на заявката."""
+    query = urlencode(sorted(query_params.multi_items()))
+    digest = hashlib.sha1(query.encode()).hexdigest()[:12]
+    return f'W/"{user.id}.{user.calendar_version or 0}.{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
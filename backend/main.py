@@ -1,12 +1,26 @@
 # backend/main.py
 from datetime import datetime, timedelta, timezone
-from fastapi import FastAPI, Depends, HTTPException, status
+from typing import Optional, Union
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from .database import Base, engine, SessionLocal
 from . import models, schemas, auth, google_oauth
-from ml.nlp_parser_ml import parse_text
+from .event_batch import EVENTS_BATCH_MAX, apply_batch
+from .event_queries import (
+    EVENTS_CHANGES_MAX, EVENTS_PAGE_MAX, EVENTS_PAGE_SIZE, calendar_etag, change_stamp, changes_since, etag_matches,
+    keyset_page, list_owner_events, live_events, naive, note_event_spans,
+)
+from ml.nlp_parser_ml import (
+    parse_text_async, parse_texts, parse_events_async, parse_batcher, parse_stats, close_hf_clients, parser_registry,
+    ML_EAGER_LOAD, start_background_load, model_status, hf_space_status,
+)
+from ml.bulk_parse import (
+    NDJSON_MEDIA_TYPE, PARSE_BULK_MAX_BODY_BYTES, read_body, split_bulk_body, stream_bulk_parse,
+)
 import os
 from dotenv import load_dotenv
 
@@ -38,6 +52,11 @@ app.add_middleware(
 async def startup_event():
     try:
         print("🚀 Starting application...")
+
+        # Local model loads in the background so the worker can start serving immediately
+        if ML_EAGER_LOAD:
+            start_background_load()
+
         print(f"🌐 Environment: {os.getenv('VERCEL_ENV', 'local')}")
         print(f"🌐 CORS Origins: {cors_origins_list}")
         
@@ -94,6 +113,11 @@ async def startup_event():
         print(f"❌ Database initialization error: {e}")
         # Don't crash the app, let it start anyway
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await parse_batcher.stop()
+    await close_hf_clients()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -117,9 +141,16 @@ def health_check_detailed():
         "status": "healthy",
         "database": "connected",
         "cors_origins": os.getenv("CORS_ORIGINS", "not-set"),
-        "ml_model": os.getenv("ENABLE_ML_MODEL", "false")
+        "ml_model": os.getenv("ENABLE_ML_MODEL", "false"),
+        "model": model_status(),
+        "hf_space": hf_space_status()
     }
 
+@app.get("/ready")
+def readiness_check():
+    status_info = model_status()
+    return JSONResponse(status_code=200 if status_info["ready"] else 503, content=status_info)
+
 # Authentication endpoints
 @app.post("/register", response_model=schemas.UserOut)
 def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -208,81 +239,62 @@ def google_login(payload: dict, db: Session = Depends(get_db)):
 def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
     return current_user
 
-# Event parsing endpoint (no auth required for parsing)
-@app.post("/parse")
-def parse_event(payload: dict):
-    try:
-        text = payload.get("text", "")
-        if not text:
-            return {"error": "Не е подаден текст."}
+def _format_parse_result(result: dict) -> dict:
+    """Превръща резултата от парсера в отговора на /parse (или в грешка)."""
+    dt = result.get("datetime") or result.get("start")  # Backwards compatibility
+    print(f"📅 Parsed datetime object: {dt} (type: {type(dt)})")
+    
+    if dt is None:
+        return {
+            "error": "Не можах да разбера датата/часа.",
+            "debug": {
+                "tokens": result.get("tokens", []),
+                "labels": result.get("labels", []),
+                **(result.get("debug") or {})
+            }
+        }
 
-        print(f"🔍 Parsing request: '{text}'")
-        result = parse_text(text)
-        print(f"🔍 Parse result: {result}")
-        
-        dt = result.get("datetime") or result.get("start")  # Backwards compatibility
-        print(f"📅 Parsed datetime object: {dt} (type: {type(dt)})")
-        
-        if dt is None:
+    # Convert string datetime to datetime object if needed
+    if isinstance(dt, str):
+        try:
+            # Handle various datetime string formats
+            if dt.endswith('Z'):
+                dt = datetime.fromisoformat(dt.replace('Z', '+00:00'))
+            elif '+' in dt or dt.endswith(('00:00', '+0000')):
+                dt = datetime.fromisoformat(dt)
+            else:
+                # Naive datetime string - parse without timezone
+                dt = datetime.fromisoformat(dt)
+            print(f"🔍 Converted datetime: {dt}")
+        except ValueError as e:
+            print(f"❌ DateTime conversion error: {e}")
             return {
-                "error": "Не можах да разбера датата/часа.",
-                "debug": {
-                    "tokens": result.get("tokens", []),
-                    "labels": result.get("labels", []),
-                    **(result.get("debug") or {})
-                }
+                "error": "Невалиден формат на датата.",
+                "debug": {"raw_datetime": dt, "conversion_error": str(e)}
             }
 
-        # Convert string datetime to datetime object if needed
-        if isinstance(dt, str):
-            try:
-                # Handle various datetime string formats
-                if dt.endswith('Z'):
-                    dt = datetime.fromisoformat(dt.replace('Z', '+00:00'))
-                elif '+' in dt or dt.endswith(('00:00', '+0000')):
-                    dt = datetime.fromisoformat(dt)
-                else:
-                    # Naive datetime string - parse without timezone
-                    dt = datetime.fromisoformat(dt)
-                print(f"🔍 Converted datetime: {dt}")
-            except ValueError as e:
-                print(f"❌ DateTime conversion error: {e}")
-                return {
-                    "error": "Невалиден формат на датата.",
-                    "debug": {"raw_datetime": dt, "conversion_error": str(e)}
-                }
-
-        end = result.get("end_datetime") or result.get("end")  # Get the end time from parse_text
-        
-        # Convert string end datetime to datetime object if needed
-        if isinstance(end, str):
-            try:
-                # Handle various datetime string formats
-                if end.endswith('Z'):
-                    end = datetime.fromisoformat(end.replace('Z', '+00:00'))
-                elif '+' in end or end.endswith(('00:00', '+0000')):
-                    end = datetime.fromisoformat(end)
-                else:
-                    # Naive datetime string - parse without timezone
-                    end = datetime.fromisoformat(end)
-                print(f"🔍 Converted end datetime: {end}")
-            except ValueError:
-                print("⚠️ Could not convert end datetime, will calculate from start")
-                end = None
-        
-        # If no end time is specified, set it to start time + 1 hour
-        if not end and dt:
-            end = dt + timedelta(hours=1)
-            print(f"🔍 Calculated end time: {end}")
+    end = result.get("end_datetime") or result.get("end")  # Get the end time from parse_text
     
-    except Exception as e:
-        print(f"❌ Parse endpoint error: {e}")
-        import traceback
-        traceback.print_exc()
-        return {
-            "error": "Вътрешна грешка при парсиране.",
-            "debug": {"exception": str(e)}
-        }
+    # Convert string end datetime to datetime object if needed
+    if isinstance(end, str):
+        try:
+            # Handle various datetime string formats
+            if end.endswith('Z'):
+                end = datetime.fromisoformat(end.replace('Z', '+00:00'))
+            elif '+' in end or end.endswith(('00:00', '+0000')):
+                end = datetime.fromisoformat(end)
+            else:
+                # Naive datetime string - parse without timezone
+                end = datetime.fromisoformat(end)
+            print(f"🔍 Converted end datetime: {end}")
+        except ValueError:
+            print("⚠️ Could not convert end datetime, will calculate from start")
+            end = None
+    
+    # If no end time is specified, set it to start time + 1 hour
+    if not end and dt:
+        end = dt + timedelta(hours=1)
+        print(f"🔍 Calculated end time: {end}")
     
     # Generate ISO format strings
     start_iso = dt.isoformat()
@@ -299,9 +311,89 @@ def parse_event(payload: dict):
         "debug": result.get("debug", {})
     }
 
+# Event parsing endpoint (no auth required for parsing)
+@app.post("/parse")
+async def parse_event(payload: dict):
+    try:
+        text = payload.get("text", "")
+        if not text:
+            return {"error": "Не е подаден текст."}
+        # "fastest", "cheapest" или име на backend ("space", "local", "dateparser", "regex")
+        backend = payload.get("backend")
+        if backend and not parser_registry.accepts(backend):
+            return {"error": f"Непознат backend за парсиране: {backend}"}
+
+        print(f"🔍 Parsing request: '{text}'")
+        result = await parse_text_async(text, backend)
+        print(f"🔍 Parse result: {result}")
+        return _format_parse_result(result)
+    
+    except Exception as e:
+        print(f"❌ Parse endpoint error: {e}")
+        import traceback
+        traceback.print_exc()
+        return {
+            "error": "Вътрешна грешка при парсиране.",
+            "debug": {"exception": str(e)}
+        }
+
+@app.post("/parse/events")
+async def parse_multiple_events(payload: dict):
+    """Дълъг текст (напр. график за седмицата) -> всички събития в него, с span в оригиналния текст."""
+    text = payload.get("text", "")
+    if not text or not text.strip():
+        return {"error": "Не е подаден текст."}
+
+    try:
+        parsed = await parse_events_async(text)
+    except Exception as e:
+        print(f"❌ Parse events endpoint error: {e}")
+        return {"error": "Вътрешна грешка при парсиране.", "debug": {"exception": str(e)}}
+
+    events = []
+    for result in parsed["events"]:
+        formatted = _format_parse_result(result)
+        if "error" in formatted:
+            parsed["unparsed"].append({"span": result["span"], "text": result["text"]})
+            continue
+        events.append({**formatted, "span": result["span"], "text": result["text"]})
+    return {"events": events, "segments": parsed["segments"], "unparsed": parsed["unparsed"]}
+
+async def _bulk_parse_chunk(texts: list[str]) -> list[dict]:
+    # Цялото парче минава през parse_texts - при HF Space това е една заявка
+    results = await run_in_threadpool(parse_texts, texts)
+    return [_format_parse_result(result) if text.strip() else {"error": "Не е подаден текст."}
+            for text, result in zip(texts, results)]
+
+@app.post("/parse/bulk")
+async def parse_bulk(request: Request):
+    """NDJSON ({"text": ..., "id": ...} на ред), JSON масив или обикновен текст (по едно
+    събитие на ред) -> NDJSON с по един резултат на ред, в реда на завършване.
+
+    Тялото се чете цялото преди отговора (вж. ml.bulk_parse.read_body)."""
+    ndjson = request.headers.get("content-type", "").startswith(("application/x-ndjson", "application/json"))
+    try:
+        body = await read_body(request.stream())
+    except ValueError:
+        return JSONResponse(status_code=413, content={"error": f"Максимум {PARSE_BULK_MAX_BODY_BYTES} байта."})
+    items = split_bulk_body(body, ndjson)
+    return StreamingResponse(stream_bulk_parse(items, _bulk_parse_chunk), media_type=NDJSON_MEDIA_TYPE)
+
+@app.get("/parse/stats")
+def parse_stats_endpoint():
+    return parse_stats()
+
 # Protected event endpoints
+def _save_event(db: Session, obj: models.Event) -> models.Event:
+    obj.updated_at = change_stamp(db, obj.owner_id)
+    note_event_spans(db, obj.owner_id, [(obj.start, obj.end)])
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
 @app.post("/events", response_model=schemas.EventOut)
-def create_event(
+async def create_event(
     payload: dict, 
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
@@ -359,7 +451,7 @@ def create_event(
         if not text:
             raise HTTPException(status_code=400, detail="Не е подаден текст.")
 
-        result = parse_text(text)
+        result = await parse_text_async(text)
         title = result.get("title", "")
         dt = result.get("datetime") or result.get("start")  # Backwards compatibility
         if dt is None:
@@ -377,19 +469,87 @@ def create_event(
             owner_id=current_user.id
         )
 
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
-    return obj
+    # The session is synchronous - commit in the threadpool so the event loop stays free
+    return await run_in_threadpool(_save_event, db, obj)
+
+@app.post("/events/batch", response_model=schemas.EventBatchResult)
+def batch_events(
+    payload: schemas.EventBatch,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Много create/update/delete операции с една заявка и една транзакция.
 
-@app.get("/events", response_model=list[schemas.EventOut])
+    Резултатите са в реда на операциите, всеки със свой статус; грешна
+    операция не спира останалите, освен при atomic=true."""
+    if len(payload.operations) > EVENTS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Максимум {EVENTS_BATCH_MAX} операции в една заявка")
+    results = apply_batch(db, current_user.id, payload.operations, payload.atomic)
+    failed = sum(result["status"] >= 400 for result in results)
+    return {"results": results, "applied": len(results) - failed, "failed": failed}
+
+@app.get("/events", response_model=Union[schemas.EventPage, list[schemas.EventOut]])
 def list_events(
+    request: Request,
+    response: Response,
+    range_from: Optional[datetime] = Query(None, alias="from"),
+    range_to: Optional[datetime] = Query(None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=EVENTS_PAGE_MAX),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    return db.query(models.Event).filter(
-        models.Event.owner_id == current_user.id
-    ).order_by(models.Event.start.asc()).all()
+    """Събитията на потребителя; с from/to - само тези, които се припокриват с периода.
+
+    С limit или cursor отговорът е страница {"events": [...], "next_cursor": ...};
+    без тях - целият списък, както досега.
+
+    ETag-ът идва от версията на календара (в реда на потребителя, който вече е
+    зареден за auth), затова If-None-Match получава 304 без заявка към events."""
+    etag = calendar_etag(current_user, request.query_params)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+
+    if range_from and range_to and naive(range_from) >= naive(range_to):
+        raise HTTPException(status_code=400, detail="'from' трябва да е преди 'to'")
+    query = list_owner_events(db, current_user.id, range_from, range_to)
+    if limit is None and cursor is None:
+        return query.all()
+
+    try:
+        events, next_cursor = keyset_page(query, cursor, limit or EVENTS_PAGE_SIZE)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Невалиден cursor")
+    return {"events": events, "next_cursor": next_cursor}
+
+@app.get("/events/changes", response_model=schemas.EventChanges)
+def list_event_changes(
+    request: Request,
+    response: Response,
+    since: Optional[str] = None,
+    limit: int = Query(EVENTS_CHANGES_MAX, ge=1, le=EVENTS_CHANGES_MAX),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Делта синхронизация: събитията, променени или изтрити след since.
+
+    Без since - всички живи събития и token за следващия път. Клиентът пази
+    next_since и го подава при следващата заявка; при has_more=True повтаря
+    веднага. Синхронизиран клиент получава 304 по ETag-а, без заявка към events."""
+    etag = calendar_etag(current_user, request.query_params)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+    response.headers.update(cache_headers)
+
+    try:
+        upserts, deleted, next_since, has_more = changes_since(db, current_user.id, since, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Невалиден since token")
+    return {"upserts": upserts, "deleted": [event.id for event in deleted],
+            "next_since": next_since, "has_more": has_more}
 
 @app.put("/events/{event_id}", response_model=schemas.EventOut)
 def update_event(
@@ -398,10 +558,7 @@ def update_event(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    event = db.query(models.Event).filter(
-        models.Event.id == event_id,
-        models.Event.owner_id == current_user.id
-    ).first()
+    event = live_events(db, current_user.id).filter(models.Event.id == event_id).first()
     if event is None:
         raise HTTPException(status_code=404, detail="Събитието не е намерено")
     
@@ -434,6 +591,8 @@ def update_event(
             event.end = datetime.fromisoformat(end_str)
         print(f"📅 Updated end to: {event.end}")
     
+    event.updated_at = change_stamp(db, current_user.id)
+    note_event_spans(db, current_user.id, [(event.start, event.end)])
     db.commit()
     db.refresh(event)
     return event
@@ -444,12 +603,11 @@ def delete_event(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    event = db.query(models.Event).filter(
-        models.Event.id == event_id,
-        models.Event.owner_id == current_user.id
-    ).first()
+    event = live_events(db, current_user.id).filter(models.Event.id == event_id).first()
     if event is None:
         raise HTTPException(status_code=404, detail="Събитието не е намерено")
-    db.delete(event)
+    # Soft delete - tombstone-ът казва на /events/changes кои събития да махнат клиентите
+    event.deleted_at = event.updated_at = change_stamp(db, current_user.id)
     db.commit()
+    db.refresh(event)
     return event
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -12,18 +14,33 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), nullable=False)
     profile_picture = Column(String(500), nullable=True)  # URL to profile picture
+    # Bumped on every event create/update/delete; the ETag of GET /events is built from it
+    calendar_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Longest end - start (seconds) among the user's events; bounds the start index scan of
+    # /events?from= (see event_queries.events_in_range). Only grows - deletes do not lower it
+    max_event_seconds = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationship to events
     events = relationship("Event", back_populates="owner")
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # Range queries on /events: owner_id equality + start range (see migrate_events.py)
+        Index("ix_events_owner_start", "owner_id", "start"),
+        # Delta sync (GET /events/changes): owner_id equality + updated_at range
+        Index("ix_events_owner_updated", "owner_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
     start = Column(DateTime(timezone=True), nullable=False)
     end = Column(DateTime(timezone=True), nullable=True)
     raw_text = Column(Text, nullable=True)
+    # Set on every create/update/delete (see event_queries.change_stamp)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    # Tombstone: deleted events stay in the table so /events/changes can report them
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     
     # Foreign key to user
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
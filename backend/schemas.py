@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, field_serializer
+from pydantic import BaseModel, EmailStr, Field, field_serializer
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
 
 # User schemas
 class UserBase(BaseModel):
@@ -48,10 +48,11 @@ class EventOut(BaseModel):
     end: Optional[datetime] = None
     raw_text: Optional[str] = None
     owner_id: int
+    updated_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
     
-    @field_serializer('start', 'end')
+    @field_serializer('start', 'end', 'updated_at')
     def serialize_datetime(self, dt: Optional[datetime], _info):
         if dt is None:
             return None
@@ -59,4 +60,57 @@ class EventOut(BaseModel):
         # If dt has timezone, convert to naive by removing tzinfo
         if dt.tzinfo is not None:
             dt = dt.replace(tzinfo=None)
-        return dt.isoformat()
\ No newline at end of file
+        return dt.isoformat()
+
+class EventPage(BaseModel):
+    events: list[EventOut]
+    # Подава се като ?cursor= за следващата страница; None - няма повече събития
+    next_cursor: Optional[str] = None
+
+class EventChanges(BaseModel):
+    upserts: list[EventOut]
+    # id-та на изтритите събития (tombstone-и)
+    deleted: list[int]
+    # Подава се като ?since= при следващата синхронизация
+    next_since: Optional[str] = None
+    # True - има още промени след next_since, заявката трябва да се повтори веднага
+    has_more: bool = False
+
+# Batch операции (POST /events/batch) - различават се по полето "op"
+class EventCreateOp(BaseModel):
+    op: Literal["create"]
+    title: str = Field(min_length=1, max_length=255)
+    start: datetime
+    end: Optional[datetime] = None
+    raw_text: Optional[str] = None
+
+class EventUpdateOp(BaseModel):
+    op: Literal["update"]
+    id: int
+    title: Optional[str] = Field(None, min_length=1, max_length=255)
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+
+class EventDeleteOp(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+EventOperation = Annotated[Union[EventCreateOp, EventUpdateOp, EventDeleteOp], Field(discriminator="op")]
+
+class EventBatch(BaseModel):
+    operations: list[EventOperation] = Field(min_length=1)
+    # True - при грешка в някоя операция не се прилага нищо
+    atomic: bool = False
+
+class EventBatchItem(BaseModel):
+    index: int
+    op: str
+    # HTTP статус на операцията: 201 създадено, 200 променено/изтрито, 4xx грешка
+    status: int
+    event: Optional[EventOut] = None
+    error: Optional[str] = None
+
+class EventBatchResult(BaseModel):
+    results: list[EventBatchItem]
+    applied: int
+    failed: int
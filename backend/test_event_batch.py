@@ -0,0 +1,72 @@
+# backend/test_event_batch.py
+
+
+def _create(client, headers, title: str, start: str = "2026-03-05T10:00:00", end: str = "2026-03-05T11:00:00") -> int:
+    response = client.post("/events", json={"title": title, "start": start, "end": end}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _batch(client, headers, operations: list, atomic: bool = False) -> dict:
+    response = client.post("/events/batch", json={"operations": operations, "atomic": atomic}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _titles(client, headers) -> list[str]:
+    return sorted(event["title"] for event in client.get("/events", headers=headers).json())
+
+
+def _mixed_operations(existing: int) -> list:
+    return [
+        {"op": "create", "title": "Нова", "start": "2026-03-06T10:00:00"},
+        {"op": "update", "id": 999999, "title": "Няма я"},
+        {"op": "create", "title": "Обратна", "start": "2026-03-06T10:00:00", "end": "2026-03-06T09:00:00"},
+        {"op": "delete", "id": existing},
+    ]
+
+
+def test_results_follow_operation_order_with_partial_success(client, auth_headers):
+    existing = _create(client, auth_headers, "Стара")
+    body = _batch(client, auth_headers, _mixed_operations(existing))
+    assert [(r["index"], r["op"], r["status"]) for r in body["results"]] == [
+        (0, "create", 201), (1, "update", 404), (2, "create", 400), (3, "delete", 200),
+    ]
+    assert (body["applied"], body["failed"]) == (2, 2)
+    assert body["results"][0]["event"]["title"] == "Нова"
+    assert body["results"][1]["event"] is None and body["results"][1]["error"]
+    assert _titles(client, auth_headers) == ["Нова"]
+
+
+def test_atomic_batch_with_error_applies_nothing(client, auth_headers):
+    existing = _create(client, auth_headers, "Стара")
+    etag = client.get("/events", headers=auth_headers).headers["ETag"]
+    body = _batch(client, auth_headers, _mixed_operations(existing), atomic=True)
+    assert [r["status"] for r in body["results"]] == [424, 404, 400, 424]
+    assert (body["applied"], body["failed"]) == (0, 4)
+    assert _titles(client, auth_headers) == ["Стара"]
+    assert client.get("/events", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+
+def test_update_with_null_end_clears_end(client, auth_headers):
+    event_id = _create(client, auth_headers, "С край")
+    body = _batch(client, auth_headers, [{"op": "update", "id": event_id, "end": None}])
+    assert body["results"][0]["event"]["end"] is None
+    [event] = client.get("/events", headers=auth_headers).json()
+    assert event["end"] is None
+
+    body = _batch(client, auth_headers, [{"op": "update", "id": event_id, "start": None}])
+    assert body["results"][0]["status"] == 400
+
+
+def test_repeated_updates_report_final_state(client, auth_headers):
+    event_id = _create(client, auth_headers, "Първо")
+    body = _batch(client, auth_headers, [
+        {"op": "update", "id": event_id, "title": "Второ"},
+        {"op": "update", "id": event_id, "end": "2026-03-05T12:00:00"},
+    ])
+    first, second = (result["event"] for result in body["results"])
+    assert first == second
+    assert first["title"] == "Второ" and first["end"].startswith("2026-03-05T12:00:00")
+    [event] = client.get("/events", headers=auth_headers).json()
+    assert event["updated_at"] == first["updated_at"]
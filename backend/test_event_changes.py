@@ -0,0 +1,70 @@
+# backend/test_event_changes.py
+from datetime import datetime
+
+from backend import event_queries
+
+
+def _create(client, headers, title: str, start: str = "2026-03-05T10:00:00") -> int:
+    response = client.post("/events", json={"title": title, "start": start}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _changes(client, headers, **params) -> dict:
+    response = client.get("/events/changes", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_delete_leaves_tombstone_for_sync(client, auth_headers):
+    kept = _create(client, auth_headers, "Остава")
+    gone = _create(client, auth_headers, "Изтрито")
+    since = _changes(client, auth_headers)["next_since"]
+
+    assert client.delete(f"/events/{gone}", headers=auth_headers).status_code == 200
+    changes = _changes(client, auth_headers, since=since)
+    assert changes["deleted"] == [gone]
+    assert changes["upserts"] == []
+    # Първоначалната синхронизация не връща tombstone-и
+    initial = _changes(client, auth_headers)
+    assert [event["id"] for event in initial["upserts"]] == [kept]
+    assert initial["deleted"] == []
+    # Без нови промени token-ът не се мени
+    assert _changes(client, auth_headers, since=changes["next_since"]) == {
+        "upserts": [], "deleted": [], "next_since": changes["next_since"], "has_more": False,
+    }
+
+
+def test_changes_page_with_has_more_and_next_since(client, auth_headers):
+    ids = [_create(client, auth_headers, f"Среща {i}") for i in range(5)]
+    seen, since, pages = [], None, 0
+    while True:
+        changes = _changes(client, auth_headers, limit=2, **({"since": since} if since else {}))
+        seen += [event["id"] for event in changes["upserts"]]
+        since = changes["next_since"]
+        pages += 1
+        if not changes["has_more"]:
+            break
+    assert seen == ids
+    assert pages == 3
+
+    assert client.put(f"/events/{ids[0]}", json={"title": "Променена"}, headers=auth_headers).status_code == 200
+    changes = _changes(client, auth_headers, since=since)
+    assert [event["title"] for event in changes["upserts"]] == ["Променена"]
+    assert changes["has_more"] is False
+
+
+def test_stamps_increase_within_one_clock_tick(client, auth_headers, monkeypatch):
+    class FrozenClock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2026, 3, 1, 12, 0, 0)
+
+    monkeypatch.setattr(event_queries, "datetime", FrozenClock)
+    ids = [_create(client, auth_headers, f"Среща {i}") for i in range(3)]
+    assert client.put(f"/events/{ids[0]}", json={"title": "Пак"}, headers=auth_headers).status_code == 200
+
+    upserts = _changes(client, auth_headers)["upserts"]
+    stamps = [datetime.fromisoformat(event["updated_at"]) for event in upserts]
+    assert [event["id"] for event in upserts] == [ids[1], ids[2], ids[0]]
+    assert all(a < b for a, b in zip(stamps, stamps[1:]))
@@ -0,0 +1,56 @@
+# backend/test_event_etag.py
+
+
+def _etag(client, headers, **params) -> str:
+    response = client.get("/events", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def _create(client, headers, title: str = "Среща") -> int:
+    response = client.post("/events", json={"title": title, "start": "2026-03-05T10:00:00"}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_matching_if_none_match_returns_304(client, auth_headers):
+    _create(client, auth_headers)
+    etag = _etag(client, auth_headers)
+    response = client.get("/events", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+    # Други параметри - друг ETag
+    response = client.get("/events", params={"limit": 5}, headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_etag_changes_after_every_write(client, auth_headers):
+    seen = [_etag(client, auth_headers)]
+    event_id = _create(client, auth_headers)
+    seen.append(_etag(client, auth_headers))
+    assert client.put(f"/events/{event_id}", json={"title": "Нова"}, headers=auth_headers).status_code == 200
+    seen.append(_etag(client, auth_headers))
+    assert client.delete(f"/events/{event_id}", headers=auth_headers).status_code == 200
+    seen.append(_etag(client, auth_headers))
+    response = client.post("/events/batch", json={"operations": [
+        {"op": "create", "title": "Пакет", "start": "2026-03-06T10:00:00"},
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    seen.append(_etag(client, auth_headers))
+    assert len(set(seen)) == len(seen)
+
+    response = client.get("/events", headers={**auth_headers, "If-None-Match": seen[0]})
+    assert response.status_code == 200
+
+
+def test_etag_is_per_user(client, auth_headers, other_auth_headers):
+    mine = _etag(client, auth_headers)
+    theirs = _etag(client, other_auth_headers)
+    assert mine != theirs
+    # Чужд ETag не дава 304, а записите на другия потребител не пипат моя
+    response = client.get("/events", headers={**auth_headers, "If-None-Match": theirs})
+    assert response.status_code == 200
+    _create(client, other_auth_headers)
+    assert _etag(client, auth_headers) == mine
+    assert client.get("/events", headers={**auth_headers, "If-None-Match": mine}).status_code == 304
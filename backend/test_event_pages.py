@@ -0,0 +1,66 @@
+# backend/test_event_pages.py
+import base64
+import json
+
+import pytest
+
+
+def _create(client, headers, title: str, start: str) -> int:
+    response = client.post("/events", json={"title": title, "start": start}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _page(client, headers, **params) -> dict:
+    response = client.get("/events", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_pages_order_ties_by_id_and_end_with_no_cursor(client, auth_headers):
+    later = _create(client, auth_headers, "По-късно", "2026-03-06T10:00:00")
+    # Еднакъв start - редът между тях идва от id
+    tied = [_create(client, auth_headers, f"Едновременно {i}", "2026-03-05T10:00:00") for i in range(3)]
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = _page(client, auth_headers, limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += [event["id"] for event in page["events"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(tied) + [later]
+    assert pages == 2
+    # 4 събития по 2 - последната страница е пълна, но next_cursor е None
+    assert len(page["events"]) == 2
+
+
+def test_cursor_is_stable(client, auth_headers):
+    for i in range(4):
+        _create(client, auth_headers, f"Среща {i}", f"2026-03-0{i + 1}T10:00:00")
+    first = _page(client, auth_headers, limit=1)
+    again = _page(client, auth_headers, limit=1)
+    assert first["next_cursor"] == again["next_cursor"]
+    second = _page(client, auth_headers, limit=1, cursor=first["next_cursor"])
+    assert second == _page(client, auth_headers, limit=1, cursor=first["next_cursor"])
+    assert second["events"][0]["id"] != first["events"][0]["id"]
+
+
+def _token(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "не-е-base64",
+    "%%%",
+    _token({"start": "2026-03-01T10:00:00", "id": 1}),
+    _token(["не е дата", 1]),
+    _token(["2026-03-01T10:00:00", "abc"]),
+    _token([1, 2]),
+    _token(None),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+])
+def test_rejects_malformed_or_tampered_cursor(client, auth_headers, cursor):
+    response = client.get("/events", params={"limit": 2, "cursor": cursor}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,28 @@
+# backend/test_event_range.py
+
+
+def _create(client, headers, title: str, start: str, end: str) -> int:
+    response = client.post("/events", json={"title": title, "start": start, "end": end}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_range_includes_long_event_started_before_from(client, auth_headers):
+    # 60 дни: започва 45 дни преди from и продължава в периода
+    long_id = _create(client, auth_headers, "Дълго", "2026-01-15T09:00:00", "2026-03-16T09:00:00")
+    inside_id = _create(client, auth_headers, "Вътре", "2026-03-05T10:00:00", "2026-03-05T11:00:00")
+    _create(client, auth_headers, "Преди", "2026-02-20T10:00:00", "2026-02-20T11:00:00")
+    _create(client, auth_headers, "След", "2026-04-01T10:00:00", "2026-04-01T11:00:00")
+    # Свършва точно в from - [from, to) е полуотворен, не се припокрива
+    _create(client, auth_headers, "До from", "2026-02-28T23:00:00", "2026-03-01T00:00:00")
+
+    response = client.get("/events", params={"from": "2026-03-01T00:00:00", "to": "2026-04-01T00:00:00"},
+                          headers=auth_headers)
+    assert response.status_code == 200
+    assert [event["id"] for event in response.json()] == [long_id, inside_id]
+
+
+def test_range_rejects_from_after_to(client, auth_headers):
+    response = client.get("/events", params={"from": "2026-04-01T00:00:00", "to": "2026-03-01T00:00:00"},
+                          headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,74 @@
+# backend/test_parse_bulk.py
+import json
+
+TEXTS = ["Среща утре от 10", "Футбол в неделя от 19", "Вечеря в петък от 20"]
+
+
+def _lines(response) -> list[dict]:
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines() if line.strip()]
+
+
+def test_parse_bulk_ndjson(client):
+    body = "\n".join(json.dumps({"text": text, "id": i}, ensure_ascii=False) for i, text in enumerate(TEXTS))
+    response = client.post("/parse/bulk", content=body.encode(), headers={"Content-Type": "application/x-ndjson"})
+    results = _lines(response)
+    assert sorted(result["id"] for result in results) == list(range(len(TEXTS)))
+    assert sorted(result["line"] for result in results) == [1, 2, 3]
+
+
+def test_parse_bulk_json_array(client):
+    body = json.dumps([{"text": TEXTS[0], "id": "a"}, TEXTS[1], {"text": TEXTS[2]}], ensure_ascii=False)
+    response = client.post("/parse/bulk", content=body.encode(), headers={"Content-Type": "application/json"})
+    results = _lines(response)
+    assert sorted(result["line"] for result in results) == [1, 2, 3]
+    assert next(result for result in results if result["line"] == 1)["id"] == "a"
+
+
+def test_parse_bulk_plain_lines(client):
+    body = "\n".join(TEXTS) + "\n\n" + "x" * 3000
+    response = client.post("/parse/bulk", content=body.encode(), headers={"Content-Type": "text/plain"})
+    results = {result["line"]: result for result in _lines(response)}
+    # Празният ред 4 се пропуска, твърде дългият ред 5 е грешка на мястото си
+    assert sorted(results) == [1, 2, 3, 5]
+    assert "error" in results[5]
+
+
+def test_stream_bulk_parse_chunks_lines():
+    import asyncio
+
+    from ml.bulk_parse import split_bulk_body, stream_bulk_parse
+
+    calls = []
+
+    async def parse_chunk(texts):
+        calls.append(texts)
+        return [{"title": text} for text in texts]
+
+    async def collect():
+        items = split_bulk_body("\n".join(f"ред {i}" for i in range(10)).encode(), ndjson=False)
+        return [json.loads(line) async for line in stream_bulk_parse(items, parse_chunk, chunk_size=4, max_in_flight=8)]
+
+    results = asyncio.run(collect())
+    assert [len(texts) for texts in calls] == [4, 4, 2]
+    assert sorted(result["line"] for result in results) == list(range(1, 11))
+    assert all(result["title"] == f"ред {result['line'] - 1}" for result in results)
+
+
+def test_parse_bulk_sends_one_space_request_per_chunk(client, monkeypatch):
+    from ml import nlp_parser_ml
+
+    calls = []
+
+    def post_bulk(texts):
+        calls.append(texts)
+        return [{"title": text, "start": "2030-01-01T10:00:00", "tokens": [], "labels": []} for text in texts]
+
+    monkeypatch.setattr(nlp_parser_ml, "USE_HF_SPACE", True)
+    monkeypatch.setattr(nlp_parser_ml, "ML_AVAILABLE", True)
+    monkeypatch.setattr(nlp_parser_ml, "_post_hf_space_bulk", post_bulk)
+    texts = [f"Задача номер {i} без шаблон" for i in range(5)]
+    response = client.post("/parse/bulk", content="\n".join(texts).encode(), headers={"Content-Type": "text/plain"})
+    results = _lines(response)
+    assert calls == [texts]
+    assert sorted(result["title"] for result in results) == sorted(texts)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Builds the Hugging Face Space bundle for app.py.
+
+app.py imports helper modules from ml/ (micro-batcher, parse cache, word
+encoder, label spans, day resolver, bulk parsing), so the Space needs them next
+to app.py. The module list is read from the imports in app.py (and in the
+modules it pulls in), so it cannot drift from the code.
+
+    python build_space.py                 # -> dist/space/
+    python build_space.py --output /path/to/space-repo
+
+The output directory contains app.py, ml/<module>.py and requirements.txt
+(from requirements-space.txt); copy it over the Space repository and push.
+"""
+import argparse
+import ast
+import os
+import shutil
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def ml_imports(path: str) -> set[str]:
+    """Names of the ml.* modules imported by the file at path."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module and node.module.startswith("ml."):
+            modules.add(node.module.split(".")[1])
+        elif isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[1] for alias in node.names if alias.name.startswith("ml."))
+    return modules
+
+
+def space_modules(entry: str = "app.py") -> list[str]:
+    """The ml modules entry needs, including their own ml imports."""
+    pending, found = set(ml_imports(os.path.join(ROOT, entry))), set()
+    while pending:
+        module = pending.pop()
+        found.add(module)
+        pending |= ml_imports(os.path.join(ROOT, "ml", f"{module}.py")) - found
+    return sorted(found)
+
+
+def build(output: str) -> list[str]:
+    os.makedirs(os.path.join(output, "ml"), exist_ok=True)
+    files = ["app.py"] + [f"ml/{module}.py" for module in space_modules()]
+    for name in files:
+        shutil.copy2(os.path.join(ROOT, name), os.path.join(output, name))
+    shutil.copy2(os.path.join(ROOT, "requirements-space.txt"), os.path.join(output, "requirements.txt"))
+    return files + ["requirements.txt"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Hugging Face Space bundle for app.py")
+    parser.add_argument("--output", default=os.path.join(ROOT, "dist", "space"))
+    args = parser.parse_args()
+
+    print(f"📦 Building Space bundle in {args.output}...")
+    for name in build(args.output):
+        print(f"   {name}")
+    print("✅ Space bundle ready")
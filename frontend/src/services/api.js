@@ -14,11 +14,29 @@ export async function createEvent(payload) {
   return data // saved event
 }
 
-export async function listEvents() {
-  const { data } = await api.get('/events')
+// params: { from, to } (ISO strings) - only events overlapping that range
+export async function listEvents(params = {}) {
+  const { data } = await api.get('/events', { params })
   return data // array of events
 }
 
+// params: { limit, cursor, from, to } - one page in (start, id) order
+export async function listEventsPage(params = {}) {
+  const { data } = await api.get('/events', { params })
+  return data // { events, next_cursor } - pass next_cursor back as cursor for the next page
+}
+
+export async function listEventChanges(since) {
+  const { data } = await api.get('/events/changes', { params: since ? { since } : {} })
+  return data // { upserts, deleted, next_since, has_more } - keep next_since for the next sync
+}
+
+export async function batchEvents(operations, atomic = false) {
+  // operations: [{ op: 'create' | 'update' | 'delete', ... }] - one result per operation, in order
+  const { data } = await api.post('/events/batch', { operations, atomic })
+  return data // { results, applied, failed }
+}
+
 export async function deleteEvent(eventId) {
   const { data } = await api.delete(`/events/${eventId}`)
   return data
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Database migration for the events and users tables (SQLite and PostgreSQL).
+Safe to run more than once - every step checks what already exists.
+
+    python migrate_events.py
+    DATABASE_URL=postgresql://... python migrate_events.py
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from backend.database import engine
+
+# (table, column, DDL type) - columns added to existing tables
+COLUMNS = [
+    ("users", "calendar_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("events", "updated_at", "TIMESTAMP WITH TIME ZONE"),
+    ("events", "deleted_at", "TIMESTAMP WITH TIME ZONE"),
+    ("users", "max_event_seconds", "INTEGER NOT NULL DEFAULT 0"),
+]
+# Event length in seconds per dialect - {duration} in BACKFILL
+DURATION_SQL = {
+    "postgresql": 'EXTRACT(EPOCH FROM ("end" - start))',
+    "sqlite": '(julianday("end") - julianday(start)) * 86400',
+}
+_LONGEST_EVENT = ('(SELECT CAST(MAX({duration}) AS INTEGER) + 1 FROM events '
+                  'WHERE events.owner_id = users.id AND "end" > start)')
+# Statements that fill newly added columns for existing rows. :now is bound to a naive UTC
+# datetime.utcnow(), the same kind of value the app writes (see event_queries.change_stamp) -
+# CURRENT_TIMESTAMP would be the database server's time zone
+BACKFILL = [
+    "UPDATE events SET updated_at = :now WHERE updated_at IS NULL",
+    # max_event_seconds only grows, so re-running after the app has written events is safe
+    f"UPDATE users SET max_event_seconds = {_LONGEST_EVENT} WHERE max_event_seconds < {_LONGEST_EVENT}",
+]
+# (index name, columns) - must match __table_args__ in backend/models.py
+INDEXES = [
+    ("ix_events_owner_start", ["owner_id", "start"]),
+    ("ix_events_owner_updated", ["owner_id", "updated_at"]),
+]
+
+
+def _create_index(name: str, columns: list[str]):
+    quoted = ", ".join(f'"{column}"' for column in columns)
+    if engine.dialect.name == "postgresql":
+        # CONCURRENTLY does not lock writes, but cannot run inside a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON events ({quoted})"))
+    else:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON events ({quoted})"))
+
+
+def _add_columns(inspector):
+    for table, column, ddl in COLUMNS:
+        if column in {c["name"] for c in inspector.get_columns(table)}:
+            print(f"✅ Column '{table}.{column}' already exists")
+            continue
+        with engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE {table} ADD COLUMN "{column}" {ddl}'))
+        print(f"✅ Added column '{table}.{column}'")
+
+
+def migrate():
+    inspector = inspect(engine)
+    if "events" not in inspector.get_table_names():
+        print("⚠️ Table 'events' does not exist yet - it will be created with all indexes on startup")
+        return
+
+    _add_columns(inspector)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for statement in BACKFILL:
+            conn.execute(text(statement.format(duration=DURATION_SQL[engine.dialect.name])), {"now": now})
+
+    existing = {index["name"] for index in inspector.get_indexes("events")}
+    for name, columns in INDEXES:
+        if name in existing:
+            print(f"✅ Index '{name}' already exists")
+            continue
+        print(f"📝 Creating index '{name}' on events ({', '.join(columns)})...")
+        _create_index(name, columns)
+        print(f"✅ Created index '{name}'")
+
+
+if __name__ == "__main__":
+    print("🔄 Starting events migration...")
+    migrate()
+    print("✅ Migration complete!")
@@ -1,8 +1,11 @@
 # ml/backend_api.py
 
-from fastapi import FastAPI
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from ml.nlp_parser_ml import parse_calendar_event
+from ml.nlp_parser_ml import parse_text_async, parse_batcher, parse_stats, model_status, parser_registry
 import uvicorn
 
 # -----------------------------
@@ -15,20 +18,38 @@ app = FastAPI(title="Calendar NER API", description="API за извличане
 # -----------------------------
 class TextInput(BaseModel):
     text: str
+    # "fastest", "cheapest" или име на backend; None = PARSER_POLICY
+    backend: Optional[str] = None
 
 # -----------------------------
 # POST endpoint за inference
 # -----------------------------
 @app.post("/parse/")
-def parse_event(payload: TextInput):
+async def parse_event(payload: TextInput):
     """
     Взима JSON с ключ "text" и връща токени + предсказани етикети
     """
     text = payload.text
-    return parse_calendar_event(text)
+    if payload.backend and not parser_registry.accepts(payload.backend):
+        raise HTTPException(status_code=400, detail=f"Unknown parser backend: {payload.backend}")
+    return await parse_text_async(text, payload.backend)
+
+@app.get("/parse/stats")
+def parse_stats_endpoint():
+    return parse_stats()
+
+@app.get("/ready")
+def readiness_check():
+    status_info = model_status()
+    return JSONResponse(status_code=200 if status_info["ready"] else 503, content=status_info)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await parse_batcher.stop()
 
 # -----------------------------
 # Стартиране на локален сървър
+# (за няколко процеса с общи тегла: python -m ml.serve_workers --workers 4)
 # -----------------------------
 if __name__ == "__main__":
     uvicorn.run("ml.backend_api:app", host="0.0.0.0", port=8000, reload=True)
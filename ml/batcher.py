@@ -0,0 +1,128 @@
+# ml/batcher.py
+import asyncio
+import os
+import time
+from typing import Callable, Optional
+
+# Колко дълго чакаме да се съберат още заявки и колко най-много пускаме наведнъж
+PARSE_BATCH_WINDOW_MS = float(os.getenv("PARSE_BATCH_WINDOW_MS", "5"))
+PARSE_MAX_BATCH_SIZE = int(os.getenv("PARSE_MAX_BATCH_SIZE", "32"))
+
+
+class MicroBatcher:
+    """Събира заявките, пристигнали в рамките на кратък прозорец, и ги изпълнява
+    като един batch. batch_fn получава списък от входове и връща списък от
+    резултати в същия ред; всеки извикващ получава своя резултат."""
+
+    def __init__(
+        self,
+        batch_fn: Callable[[list], list],
+        window_ms: float = PARSE_BATCH_WINDOW_MS,
+        max_batch_size: int = PARSE_MAX_BATCH_SIZE,
+    ):
+        self.batch_fn = batch_fn
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Метрики
+        self.requests = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.largest_batch = 0
+        self.total_queue_wait = 0.0
+        self.total_batch_time = 0.0
+
+    def start(self):
+        """Стартира фоновия worker в текущия event loop (ако още не работи)."""
+        loop = asyncio.get_running_loop()
+        if self._worker is not None and not self._worker.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._worker = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        # Заявките, които са останали в опашката, получават грешка вместо да висят
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("batcher stopped"))
+
+    async def submit(self, item):
+        self.start()
+        future = self._loop.create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.window_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - self._loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Каквото вече чака в опашката, влиза в batch-а без допълнително чакане
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Заявки, чийто клиент вече се е отказал, не минават през модела
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            items = [item for item, _, _ in batch]
+            try:
+                results = await asyncio.to_thread(self.batch_fn, items)
+            except Exception as e:
+                print(f"❌ Batch of {len(items)} failed: {e}")
+                self.failed_batches += 1
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            finished = time.perf_counter()
+
+            self.requests += len(batch)
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.total_queue_wait += sum(started - queued_at for _, _, queued_at in batch)
+            self.total_batch_time += finished - started
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._worker is not None and not self._worker.done(),
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "avg_queue_wait_ms": round(1000 * self.total_queue_wait / self.requests, 2) if self.requests else 0.0,
+            "avg_batch_ms": round(1000 * self.total_batch_time / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,39 @@
+# ml/bench_utils.py
+"""Общи помощни функции за benchmark скриптовете в ml/."""
+import json
+import os
+
+
+def load_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, pct):
+    """Percentile с линейна интерполация (като numpy.percentile)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def latency_summary(seconds):
+    """p50/p95/p99/mean в милисекунди за списък от латентности в секунди."""
+    ms = [s * 1000 for s in seconds]
+    return {
+        "count": len(ms),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+def rss_mb(pid=None):
+    """Resident memory на процеса в MB (psutil)."""
+    import psutil
+
+    return round(psutil.Process(pid or os.getpid()).memory_info().rss / 2**20, 1)
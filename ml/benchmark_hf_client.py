@@ -0,0 +1,123 @@
+# ml/benchmark_hf_client.py
+"""
+Сравнява клиентите към HF Space срещу локалния заместител (ml/fake_hf_space.py):
+
+  - unpooled: нова връзка за всяка заявка в thread pool (старото поведение с requests.post)
+  - pooled:   споделен httpx.Client (keep-alive) в thread pool - query_hf_space
+  - async:    споделен httpx.AsyncClient + семафор - query_hf_space_async
+
+    python -m ml.benchmark_hf_client --requests 400 --concurrency 32 --latency-ms 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from ml.bench_utils import latency_summary
+
+TEXTS = [
+    "Йога клас утре сутринта",
+    "Обяд от 15 събота с Иван",
+    "Вечеря с Гери в Неделя от 18",
+    "Среща в офиса в петък 14:45",
+]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_fake_space(latency_ms: float) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ, FAKE_SPACE_LATENCY_MS=str(latency_ms))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ml.fake_hf_space:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(url, timeout=1)
+            return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("fake HF Space did not start")
+
+def run_threaded(call, n_requests: int, concurrency: int) -> dict:
+    latencies = []
+
+    def timed(i):
+        started = time.perf_counter()
+        ok = call(TEXTS[i % len(TEXTS)]) is not None
+        latencies.append(time.perf_counter() - started)
+        return ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        ok = sum(pool.map(timed, range(n_requests)))
+    elapsed = time.perf_counter() - started
+    return {"ok": ok, "throughput_rps": round(n_requests / elapsed, 1), "latency": latency_summary(latencies)}
+
+def run_async(call, n_requests: int, concurrency: int) -> dict:
+    latencies = []
+
+    async def main():
+        limiter = asyncio.Semaphore(concurrency)
+
+        async def timed(i):
+            async with limiter:
+                started = time.perf_counter()
+                result = await call(TEXTS[i % len(TEXTS)])
+                latencies.append(time.perf_counter() - started)
+                return result is not None
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(timed(i) for i in range(n_requests)))
+        return sum(results), time.perf_counter() - started
+
+    ok, elapsed = asyncio.run(main())
+    return {"ok": ok, "throughput_rps": round(n_requests / elapsed, 1), "latency": latency_summary(latencies)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HF Space clients against a local fake Space")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    proc, url = start_fake_space(args.latency_ms)
+    os.environ["HF_SPACE_URL"] = url
+    os.environ["USE_HF_SPACE"] = "true"
+    os.environ.setdefault("HF_SPACE_MAX_CONCURRENCY", str(args.concurrency))
+    os.environ.setdefault("HF_SPACE_MAX_CONNECTIONS", str(args.concurrency))
+    from ml import nlp_parser_ml as parser_ml
+
+    def unpooled(text):
+        response = httpx.post(f"{url}/api/parse", json={"text": text}, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        results = {
+            "unpooled": run_threaded(unpooled, args.requests, args.concurrency),
+            "pooled": run_threaded(parser_ml.query_hf_space, args.requests, args.concurrency),
+            "async": run_async(parser_ml.query_hf_space_async, args.requests, args.concurrency),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    report = {"requests": args.requests, "concurrency": args.concurrency, "space_latency_ms": args.latency_ms, "results": results}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
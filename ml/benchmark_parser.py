@@ -0,0 +1,213 @@
+# ml/benchmark_parser.py
+"""
+Повторяем benchmark на парсера върху етикетирания корпус (ml/data/test.jsonl)
+и по-голям синтетичен набор (ml/generate_synthetic.py):
+
+  - fallback           parse_fallback(text)
+  - time_tokens        _parse_time_from_tokens(WHEN_START токените от златните етикети)
+  - day_tokens         _parse_day_from_tokens(WHEN_DAY токените от златните етикети)
+  - local_model        parse_with_local_model(text) - по едно изречение
+  - local_model_batch  parse_with_local_model_batch(ML_BATCH_SIZE изречения)
+  - remote             query_hf_space(text) срещу локален ml/fake_hf_space.py
+
+Всяка цел се пуска в отделен процес (флаговете на nlp_parser_ml са import-time,
+а пиковата памет трябва да е само нейната). За всяка цел се отчитат throughput
+(изречения/s), p50/p95/p99 латентност на извикване, peak RSS на процеса и пикът
+на Python алокациите (tracemalloc; без паметта на torch/onnx).
+
+    python -m ml.benchmark_parser --synthetic 2000 --output bench/parser.json
+    python -m ml.benchmark_parser --targets fallback day_tokens --compare bench/parser.json
+
+JSON-ът е стабилен (сортирани ключове), за да се сравнява между версии.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from ml.bench_utils import latency_summary, load_jsonl
+
+WARMUP_RUNS = 5
+# Без модел: тежките библиотеки не се импортират и не влизат в паметта на чистите функции
+_NO_MODEL = {"USE_HF_SPACE": "false", "ENABLE_ML_MODEL": "false"}
+_LOCAL_MODEL = {"USE_HF_SPACE": "false", "ENABLE_ML_MODEL": "true", "ML_EAGER_LOAD": "false"}
+TARGETS = {
+    "fallback": {"env": _NO_MODEL, "repeatable": True},
+    "time_tokens": {"env": _NO_MODEL, "repeatable": True},
+    "day_tokens": {"env": _NO_MODEL, "repeatable": True},
+    "local_model": {"env": _LOCAL_MODEL, "repeatable": False},
+    "local_model_batch": {"env": _LOCAL_MODEL, "repeatable": False},
+    "remote": {"env": {"USE_HF_SPACE": "true", "HF_BREAKER_SLOW_MS": "1e9"}, "repeatable": False},
+}
+
+def load_corpus(paths: list[str], synthetic: int, seed: int) -> list[dict]:
+    from ml.generate_synthetic import generate_examples
+
+    examples = [ex for path in paths for ex in load_jsonl(path)]
+    return examples + generate_examples(synthetic, random.Random(seed))
+
+def _workload(parser, target: str, examples: list[dict]) -> tuple:
+    """(входове, извикване, брой изречения във вход) за целта."""
+    texts = [" ".join(ex["tokens"]) for ex in examples]
+    one = lambda item: 1  # noqa: E731
+    if target == "fallback":
+        return texts, parser.parse_fallback, one
+    if target in ("time_tokens", "day_tokens"):
+        from ml.label_spans import decode_spans
+
+        decoded = [decode_spans(ex["tokens"], ex["labels"], parser.WEEKDAYS) for ex in examples]
+        if target == "time_tokens":
+            inputs = [d.time_tokens() for d in decoded]
+            return [tokens for tokens in inputs if tokens], parser._parse_time_from_tokens, one
+        now = datetime.now()
+        inputs = [d.day_tokens() for d in decoded]
+        return [tokens for tokens in inputs if tokens], lambda tokens: parser._parse_day_from_tokens(tokens, now), one
+    if target == "local_model":
+        return texts, parser.parse_with_local_model, one
+    if target == "local_model_batch":
+        size = parser.ML_BATCH_SIZE
+        return [texts[i:i + size] for i in range(0, len(texts), size)], parser.parse_with_local_model_batch, len
+    if target == "remote":
+        return texts, parser.query_hf_space, one
+    raise ValueError(f"Unknown target: {target}")
+
+def _child_run(target: str, paths: list[str], synthetic: int, seed: int, repeat: int) -> dict:
+    from ml import nlp_parser_ml as parser
+
+    if target.startswith("local_model") and not parser.ensure_model_loaded():
+        raise RuntimeError(parser.model_status().get("error") or "model failed to load")
+    items, call, size = _workload(parser, target, load_corpus(paths, synthetic, seed))
+    if not TARGETS[target]["repeatable"]:
+        repeat = 1
+    for item in items[:WARMUP_RUNS]:
+        call(item)
+
+    latencies, sentences = [], 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            call_started = time.perf_counter()
+            call(item)
+            latencies.append(time.perf_counter() - call_started)
+            sentences += size(item)
+    elapsed = time.perf_counter() - started
+
+    # Отделно минаване с tracemalloc - той забавя извикванията и не бива да влиза в латентността
+    tracemalloc.start()
+    for item in items:
+        call(item)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "calls": len(latencies),
+        "sentences": sentences,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(sentences / elapsed, 1) if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+        # ru_maxrss е в KB на Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "traced_peak_mb": round(traced_peak / 2**20, 3),
+    }
+
+def run_target(target: str, args, space_url: str = "") -> dict:
+    env = dict(os.environ, **TARGETS[target]["env"])
+    if space_url:
+        env["HF_SPACE_URL"] = space_url
+    cmd = [sys.executable, "-m", "ml.benchmark_parser", "_child", target,
+           "--synthetic", str(args.synthetic), "--seed", str(args.seed), "--repeat", str(args.repeat),
+           "--data", *args.data]
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+def run(args) -> dict:
+    results = {}
+    for target in args.targets:
+        print(f"⏱️ Benchmarking {target}...", file=sys.stderr)
+        if target == "remote":
+            from ml.benchmark_hf_client import start_fake_space
+
+            space, url = start_fake_space(args.space_latency_ms)
+            try:
+                results[target] = run_target(target, args, url)
+            finally:
+                space.terminate()
+                space.wait()
+        else:
+            results[target] = run_target(target, args)
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "data": args.data,
+            "synthetic": args.synthetic,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "space_latency_ms": args.space_latency_ms,
+        },
+        "results": results,
+    }
+
+def compare(baseline: dict, report: dict) -> dict:
+    """Промяна спрямо предишен отчет: throughput и p95 като отношение new/old."""
+    changes = {}
+    for target, new in report["results"].items():
+        old = baseline.get("results", {}).get(target)
+        if not old or "error" in old or "error" in new:
+            continue
+        changes[target] = {
+            "throughput_ratio": round(new["throughput_per_s"] / old["throughput_per_s"], 3) if old["throughput_per_s"] else None,
+            "p95_ratio": round(new["latency"]["p95_ms"] / old["latency"]["p95_ms"], 3) if old["latency"]["p95_ms"] else None,
+            "peak_rss_delta_mb": round(new["peak_rss_mb"] - old["peak_rss_mb"], 1),
+        }
+    return changes
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "_child":
+        child = argparse.ArgumentParser()
+        child.add_argument("target", choices=list(TARGETS))
+        child.add_argument("--data", nargs="+", default=[])
+        child.add_argument("--synthetic", type=int, default=0)
+        child.add_argument("--seed", type=int, default=42)
+        child.add_argument("--repeat", type=int, default=1)
+        cargs = child.parse_args(sys.argv[2:])
+        print(json.dumps(_child_run(cargs.target, cargs.data, cargs.synthetic, cargs.seed, cargs.repeat)))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Parser throughput, latency and memory over the labelled corpus")
+    parser.add_argument("--data", nargs="+", default=["ml/data/test.jsonl"])
+    parser.add_argument("--synthetic", type=int, default=2000, help="Extra examples from ml/generate_synthetic.py")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the corpus for the pure-Python targets")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--space-latency-ms", type=float, default=20, help="Artificial latency of the fake Space")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            report["compare"] = compare(json.load(f), report)
+    print(json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True))
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
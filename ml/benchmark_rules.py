@@ -0,0 +1,75 @@
+# ml/benchmark_rules.py
+"""
+Колко от изреченията минават по бързия път на шаблоните (ml/rule_parser.py) и
+колко време спестяват спрямо модела:
+
+  - bypass_rate: дял на изреченията, етикетирани без модела
+  - agreement:   съвпадение на етикетите от шаблоните със златните етикети
+  - latency:     шаблони vs forward pass на модела за същите изречения
+
+    python -m ml.benchmark_rules --data ml/data/test.jsonl ml/data/dev.jsonl
+
+Без --with-model се измерват само шаблоните (не е нужен torch).
+"""
+import argparse
+import json
+import os
+import time
+
+from ml.bench_utils import latency_summary, load_jsonl
+
+WARMUP_RUNS = 5
+
+def run(paths: list[str], with_model: bool) -> dict:
+    if with_model:
+        os.environ.update(USE_HF_SPACE="false", ENABLE_ML_MODEL="true")
+    from ml import nlp_parser_ml as parser
+
+    examples = [ex for path in paths for ex in load_jsonl(path)]
+    rule_latencies, matched = [], []
+    agree = 0
+    for ex in examples:
+        started = time.perf_counter()
+        labels = parser.rule_parser.label(ex["tokens"])
+        rule_latencies.append(time.perf_counter() - started)
+        if labels is not None:
+            matched.append(ex)
+            agree += labels == ex["labels"]
+
+    report = {
+        "examples": len(examples),
+        "bypassed": len(matched),
+        "bypass_rate": round(len(matched) / len(examples), 4) if examples else 0.0,
+        "agreement": round(agree / len(matched), 4) if matched else 0.0,
+        "rules": parser.rule_parser.stats(),
+        "rule_latency": latency_summary(rule_latencies),
+    }
+
+    if with_model:
+        if not parser.ensure_model_loaded():
+            raise RuntimeError("model failed to load")
+        for ex in matched[:WARMUP_RUNS]:
+            parser._predict_labels_batch([ex["tokens"]])
+        model_latencies = []
+        for ex in matched:
+            started = time.perf_counter()
+            parser._predict_labels_batch([ex["tokens"]])
+            model_latencies.append(time.perf_counter() - started)
+        report["model_latency"] = latency_summary(model_latencies)
+        report["saved_ms_per_bypassed"] = round(
+            report["model_latency"]["mean_ms"] - report["rule_latency"]["mean_ms"], 3
+        )
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rule fast path coverage and latency report")
+    parser.add_argument("--data", nargs="+", default=["ml/data/test.jsonl"])
+    parser.add_argument("--with-model", action="store_true", help="Also time the local model on the bypassed examples")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args.data, args.with_model)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,71 @@
+# ml/benchmark_tokenizer.py
+"""
+Micro-benchmark: tokenizer(words, is_split_into_words=True, ...) срещу WordPieceCache
+(ml/word_encoder.py) върху изреченията от ml/data/*.jsonl, за единични изречения
+и за batch-ове. Преди измерването проверява, че двата пътя дават еднакви
+input_ids, attention_mask и word_ids.
+
+    python -m ml.benchmark_tokenizer --batch-sizes 1 32 --rounds 20
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from transformers import BertTokenizerFast
+
+from ml.bench_utils import latency_summary, load_jsonl
+from ml.word_encoder import WordPieceCache
+
+MODEL_NAME = os.getenv("ML_MODEL_NAME", "dex7er999/NLPCalendar")
+DATA_PATHS = ["ml/data/train.jsonl", "ml/data/dev.jsonl", "ml/data/test.jsonl"]
+
+def stock_encode(tokenizer, words_batch):
+    return tokenizer(words_batch, is_split_into_words=True, return_tensors="np", truncation=True, padding=True)
+
+def check_parity(tokenizer, cache, sentences, batch_size):
+    for offset in range(0, len(sentences), batch_size):
+        batch = sentences[offset:offset + batch_size]
+        expected = stock_encode(tokenizer, batch)
+        actual = cache.encode(batch)
+        assert np.array_equal(expected["input_ids"], actual["input_ids"]), f"input_ids differ for {batch}"
+        assert np.array_equal(expected["attention_mask"], actual["attention_mask"]), f"attention_mask differs for {batch}"
+        for row in range(len(batch)):
+            assert expected.word_ids(batch_index=row) == actual.word_ids(batch_index=row), f"word_ids differ for {batch[row]}"
+
+def time_batches(encode, sentences, batch_size, rounds):
+    latencies = []
+    for _ in range(rounds):
+        for offset in range(0, len(sentences), batch_size):
+            batch = sentences[offset:offset + batch_size]
+            started = time.perf_counter()
+            encode(batch)
+            latencies.append(time.perf_counter() - started)
+    return latency_summary(latencies)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stock tokenizer vs cached WordPiece encoding")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 32])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    tokenizer = BertTokenizerFast.from_pretrained(MODEL_NAME)
+    sentences = [ex["tokens"] for path in DATA_PATHS for ex in load_jsonl(path)]
+
+    report = {"sentences": len(sentences), "rounds": args.rounds, "results": {}}
+    for batch_size in args.batch_sizes:
+        cache = WordPieceCache(tokenizer)
+        check_parity(tokenizer, cache, sentences, batch_size)
+        # Кешът вече е топъл от проверката - това е стационарното състояние при заявки
+        report["results"][f"batch_{batch_size}"] = {
+            "stock": time_batches(lambda b: stock_encode(tokenizer, b), sentences, batch_size, args.rounds),
+            "cached": time_batches(cache.encode, sentences, batch_size, args.rounds),
+            "cache": cache.stats(),
+        }
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
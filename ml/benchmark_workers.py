@@ -0,0 +1,107 @@
+# ml/benchmark_workers.py
+"""
+RSS/PSS и throughput на ml/serve_workers.py спрямо броя worker-и.
+
+За всеки брой worker-и пуска сървъра, изчаква всички да са готови и праща
+--requests заявки към /parse/ с --concurrency паралелни клиента. PSS (proportional
+set size) разпределя споделените страници между процесите, затова сумата
+е реалната памет; сумата от RSS брои споделените тегла във всеки процес.
+
+    python -m ml.benchmark_workers --workers 1 2 4 --requests 400 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import psutil
+
+from ml.bench_utils import latency_summary
+
+TEXTS = [
+    "Вечеря с Гери в Неделя от 18",
+    "Среща в офиса в петък 14:45",
+    "Онлайн лекция по програмиране в понеделник от 10 до 12",
+    "тренировка с тате с колелета в събота в 9",
+]
+
+def _memory_mb(parent: psutil.Process) -> dict:
+    procs = [parent] + parent.children(recursive=True)
+    rss = pss = 0
+    for proc in procs:
+        try:
+            info = proc.memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        rss += info.rss
+        pss += getattr(info, "pss", info.rss)
+    return {"processes": len(procs), "rss_sum_mb": round(rss / 2**20, 1), "pss_sum_mb": round(pss / 2**20, 1)}
+
+def _wait_ready(url: str, workers: int, timeout: float = 300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            # Всеки отговор идва от произволен worker - искаме няколко поредни "ready"
+            if all(httpx.get(f"{url}/ready", timeout=5).status_code == 200 for _ in range(workers * 4)):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(1)
+    raise RuntimeError("workers did not become ready")
+
+async def _load(url: str, n_requests: int, concurrency: int) -> dict:
+    latencies = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        limiter = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            async with limiter:
+                started = time.perf_counter()
+                response = await client.post("/parse/", json={"text": TEXTS[i % len(TEXTS)]})
+                latencies.append(time.perf_counter() - started)
+                return response.status_code == 200
+
+        started = time.perf_counter()
+        ok = sum(await asyncio.gather(*(one(i) for i in range(n_requests))))
+        elapsed = time.perf_counter() - started
+    return {"ok": ok, "throughput_rps": round(n_requests / elapsed, 1), "latency": latency_summary(latencies)}
+
+def run(workers: int, port: int, n_requests: int, concurrency: int) -> dict:
+    env = dict(os.environ, USE_HF_SPACE="false", ENABLE_ML_MODEL="true", PARSE_RULES_ENABLED="false", PARSE_CACHE_SIZE="0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "ml.serve_workers", "--workers", str(workers), "--port", str(port)], env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(url, workers)
+        parent = psutil.Process(proc.pid)
+        memory_idle = _memory_mb(parent)
+        load = asyncio.run(_load(url, n_requests, concurrency))
+        return {"workers": workers, "memory_idle": memory_idle, "memory_after_load": _memory_mb(parent), **load}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork workers: memory and throughput vs worker count")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.workers:
+        print(f"⏱️ Benchmarking {n} worker(s)...")
+        results.append(run(n, args.port, args.requests, args.concurrency))
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
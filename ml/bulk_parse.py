@@ -0,0 +1,132 @@
+# ml/bulk_parse.py
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Awaitable, Callable
+
+# Колко реда се парсират едновременно - ограничава паметта и дава на batcher-а пълни batch-ове
+PARSE_BULK_MAX_IN_FLIGHT = int(os.getenv("PARSE_BULK_MAX_IN_FLIGHT", "64"))
+# Колко реда отиват в едно извикване на parse_texts (при HF Space - една заявка)
+PARSE_BULK_CHUNK_SIZE = int(os.getenv("PARSE_BULK_CHUNK_SIZE", "16"))
+# По-дълги редове не се парсират - връщаме грешка за тях
+PARSE_BULK_MAX_LINE_CHARS = int(os.getenv("PARSE_BULK_MAX_LINE_CHARS", "2000"))
+# Тялото се чете цялото преди отговора - по-голямо връща 413
+PARSE_BULK_MAX_BODY_BYTES = int(os.getenv("PARSE_BULK_MAX_BODY_BYTES", str(10 * 2**20)))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _decode_line(line_no: int, line: str, ndjson: bool) -> dict:
+    """Един входен ред -> {"line", "text"[, "id"]} или {"line", "error"}."""
+    line = line.strip()
+    if not (ndjson or line.startswith("{")):
+        return {"line": line_no, "text": line}
+    try:
+        obj = json.loads(line)
+    except json.JSONDecodeError as e:
+        return {"line": line_no, "error": f"Невалиден JSON: {e.msg}"}
+    return _decode_item(line_no, obj)
+
+
+def _decode_item(line_no: int, obj) -> dict:
+    if not isinstance(obj, dict) or not isinstance(obj.get("text"), str):
+        return {"line": line_no, "error": "Очаква се обект с поле \"text\"."}
+    item = {"line": line_no, "text": obj["text"]}
+    if "id" in obj:
+        item["id"] = obj["id"]
+    return item
+
+
+async def read_body(chunks: AsyncIterator[bytes], max_bytes: int = PARSE_BULK_MAX_BODY_BYTES) -> bytes:
+    """Цялото тяло на заявката, прочетено преди да започне отговорът.
+
+    StreamingResponse слуша за disconnect през същия receive() и поглъща
+    частите на тялото, ако то се чете лениво от генератора на отговора.
+    ValueError, ако тялото е по-голямо от max_bytes."""
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > max_bytes:
+            raise ValueError(f"Request body is larger than {max_bytes} bytes")
+    return bytes(body)
+
+
+def split_bulk_body(
+    body: bytes,
+    ndjson: bool,
+    max_line_chars: int = PARSE_BULK_MAX_LINE_CHARS,
+) -> list[dict]:
+    """Редовете на вече прочетено тяло. Празните редове се пропускат, но номерацията
+    (от 1) следва входа. JSON масив ([{"text": ...}, "текст", ...]) се приема като
+    JSON заявка; "line" тогава е позицията в масива (от 1)."""
+    too_long = f"Редът е по-дълъг от {max_line_chars} символа."
+    if ndjson and body.lstrip().startswith(b"["):
+        try:
+            objs = json.loads(body.decode("utf-8", errors="replace"))
+        except json.JSONDecodeError as e:
+            return [{"line": 1, "error": f"Невалиден JSON: {e.msg}"}]
+        items = []
+        for line_no, obj in enumerate(objs, start=1):
+            text = obj if isinstance(obj, str) else obj.get("text") if isinstance(obj, dict) else None
+            if isinstance(text, str) and len(text) > max_line_chars:
+                items.append({"line": line_no, "error": too_long})
+            else:
+                items.append(_decode_item(line_no, {"text": obj} if isinstance(obj, str) else obj))
+        return items
+
+    items = []
+    for line_no, line in enumerate(body.decode("utf-8", errors="replace").split("\n"), start=1):
+        if len(line) > max_line_chars:
+            items.append({"line": line_no, "error": too_long})
+        elif line.strip():
+            items.append(_decode_line(line_no, line, ndjson))
+    return items
+
+
+async def stream_bulk_parse(
+    items: list[dict],
+    parse_chunk: Callable[[list[str]], Awaitable[list[dict]]],
+    chunk_size: int = PARSE_BULK_CHUNK_SIZE,
+    max_in_flight: int = PARSE_BULK_MAX_IN_FLIGHT,
+) -> AsyncIterator[str]:
+    """Парсира редовете на парчета по chunk_size текста (едно извикване на parse_chunk
+    на парче), с до max_in_flight реда едновременно, и връща NDJSON редове по реда на
+    завършване на парчетата. Грешка в парче се връща на мястото на редовете му."""
+
+    async def run(chunk: list[dict]) -> list[dict]:
+        heads = [{key: item[key] for key in ("line", "id") if key in item} for item in chunk]
+        try:
+            results = await parse_chunk([item["text"] for item in chunk])
+        except Exception as e:
+            print(f"❌ Bulk parse failed on lines {chunk[0]['line']}-{chunk[-1]['line']}: {e}")
+            return [{**head, "error": "Вътрешна грешка при парсиране.", "debug": {"exception": str(e)}}
+                    for head in heads]
+        return [{**head, **result} for head, result in zip(heads, results)]
+
+    def dump(result: dict) -> str:
+        return json.dumps(result, ensure_ascii=False, default=str) + "\n"
+
+    for item in items:
+        if "error" in item:
+            yield dump(item)
+    texts = [item for item in items if "error" not in item]
+    chunks = iter([texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)])
+    max_chunks = max(1, max_in_flight // chunk_size)
+    pending = set()
+    try:
+        while True:
+            # Пускаме нови парчета само докато има свободни слотове
+            for chunk in chunks:
+                pending.add(asyncio.ensure_future(run(chunk)))
+                if len(pending) >= max_chunks:
+                    break
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                for result in task.result():
+                    yield dump(result)
+    finally:
+        # Клиентът е прекъснал връзката - не парсираме останалото
+        for task in pending:
+            task.cancel()
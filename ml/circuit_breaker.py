@@ -0,0 +1,129 @@
+# ml/circuit_breaker.py
+import os
+import threading
+import time
+
+# Колко поредни неуспешни (или твърде бавни) извиквания отварят веригата
+HF_BREAKER_FAILURES = int(os.getenv("HF_BREAKER_FAILURES", "3"))
+# Извикване, по-бавно от този праг, се брои за неуспех, въпреки че отговорът се ползва
+HF_BREAKER_SLOW_MS = float(os.getenv("HF_BREAKER_SLOW_MS", "5000"))
+# След колко секунди отворена верига пускаме една пробна заявка (half-open)
+HF_BREAKER_RESET_SECONDS = float(os.getenv("HF_BREAKER_RESET_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit breaker за отдалечен backend (thread-safe).
+
+    closed    - заявките минават; failure_threshold поредни неуспеха отварят веригата.
+    open      - заявките не стигат до backend-а, докато не изтече reset_seconds.
+    half_open - пуска се точно една пробна заявка; успех затваря веригата,
+                неуспех я отваря отново за нови reset_seconds."""
+
+    def __init__(
+        self,
+        failure_threshold: int = HF_BREAKER_FAILURES,
+        slow_call_ms: float = HF_BREAKER_SLOW_MS,
+        reset_seconds: float = HF_BREAKER_RESET_SECONDS,
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.slow_call_ms = slow_call_ms
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started_at = 0.0
+        self.consecutive_failures = 0
+
+        # Метрики
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.trips = 0
+        self.last_error = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Дали да извикаме backend-а; при False извикващият минава директно към fallback."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                self.calls += 1
+                return True
+            # Проба, която не е докладвала резултат (напр. отказана заявка), не блокира веригата завинаги
+            probe_stale = time.monotonic() - self._probe_started_at >= self.reset_seconds
+            if state == HALF_OPEN and (not self._probe_in_flight or probe_stale):
+                self._probe_in_flight = True
+                self._probe_started_at = time.monotonic()
+                self.calls += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, elapsed_seconds: float):
+        with self._lock:
+            if elapsed_seconds * 1000 > self.slow_call_ms:
+                self.slow_calls += 1
+                self._on_failure(f"slow call: {elapsed_seconds * 1000:.0f} ms")
+                return
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            self._state = CLOSED
+
+    def record_failure(self, error: str = ""):
+        with self._lock:
+            self.failures += 1
+            self._on_failure(error)
+
+    def _on_failure(self, error: str):
+        self.last_error = error or None
+        self.consecutive_failures += 1
+        if self._state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != OPEN:
+                self.trips += 1
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._probe_in_flight = False
+            self.consecutive_failures = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = self.reset_seconds - (time.monotonic() - self._opened_at) if state == OPEN else 0.0
+            return {
+                "state": state,
+                "failure_threshold": self.failure_threshold,
+                "slow_call_ms": self.slow_call_ms,
+                "reset_seconds": self.reset_seconds,
+                "retry_in_seconds": round(max(0.0, retry_in), 2),
+                "consecutive_failures": self.consecutive_failures,
+                "calls": self.calls,
+                "successes": self.successes,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "rejected": self.rejected,
+                "trips": self.trips,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,107 @@
+# ml/day_resolver.py
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+# Приоритет при няколко WHEN_DAY токена: относителна дума > ден от седмицата > дата
+_RELATIVE, _WEEKDAY, _ORDINAL = 0, 1, 2
+# "20", "20ти", "20-ти", "20.", "20ти." ...
+_ORDINAL_SUFFIXES = ["", "ви", "ри", "ти", "ми", "-ви", "-ри", "-ти", "-ми"]
+# Таблици за няколко референтни дати: днешната + заявки с изрично подаден "now"
+DAY_TABLE_CACHE_SIZE = 4
+
+
+def next_weekday(today: date, target_weekday: int) -> date:
+    """Връща следващата дата за даден ден от седмицата (>= утре)."""
+    days_ahead = target_weekday - today.weekday()
+    if days_ahead <= 0:
+        days_ahead += 7
+    return today + timedelta(days=days_ahead)
+
+
+def resolve_ordinal_day(day: int, today: date) -> Optional[date]:
+    """"20ти" -> 20-о число на този месец, или на следващия, ако вече е минало."""
+    y, mth = today.year, today.month
+    try:
+        candidate = date(y, mth, day)
+    except ValueError:
+        try:
+            candidate = date(y + 1, 1, day) if mth == 12 else date(y, mth + 1, day)
+        except ValueError:
+            return None
+    if candidate < today:
+        if candidate.month == 12:
+            candidate = date(candidate.year + 1, 1, candidate.day)
+        else:
+            for i in range(1, 3):
+                try:
+                    candidate = date(y + (mth + i - 1) // 12, ((mth + i - 1) % 12) + 1, day)
+                    break
+                except ValueError:
+                    continue
+    return candidate
+
+
+class DayResolver:
+    """WHEN_DAY токени -> дата чрез таблица, построена веднъж за референтния ден.
+
+    Таблицата съдържа всички поддържани изрази (дни от седмицата, RELATIVE и
+    числата 1-31 с и без "ви/ри/ти/ми" и точка), с ключ в lowercase. Построява
+    се при първата заявка за нов ден (т.е. веднъж след полунощ) и се споделя от
+    всички заявки, така че resolve е само dict lookup за всеки токен."""
+
+    def __init__(self, weekdays: dict, relative: dict, max_tables: int = DAY_TABLE_CACHE_SIZE):
+        self.weekdays = weekdays
+        self.relative = relative
+        self.max_tables = max(1, max_tables)
+        self._tables: "OrderedDict[date, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def _build(self, today: date) -> dict:
+        table = {}
+        for number in list(range(1, 32)) + [f"0{d}" for d in range(1, 10)]:
+            resolved = resolve_ordinal_day(int(number), today)
+            if resolved is None:
+                continue
+            for suffix in _ORDINAL_SUFFIXES:
+                table[f"{number}{suffix}"] = table[f"{number}{suffix}."] = (_ORDINAL, resolved)
+        for word, weekday in self.weekdays.items():
+            table[word.lower()] = (_WEEKDAY, next_weekday(today, weekday))
+        for word, offset in self.relative.items():
+            table[word.lower()] = (_RELATIVE, today + timedelta(days=offset))
+        return table
+
+    def table(self, today: date) -> dict:
+        with self._lock:
+            table = self._tables.get(today)
+            if table is not None:
+                self._tables.move_to_end(today)
+                return table
+            table = self._build(today)
+            self.builds += 1
+            self._tables[today] = table
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+            return table
+
+    def resolve(self, day_tokens: list[str], now: datetime) -> Optional[date]:
+        if not day_tokens:
+            return None
+        table = self.table(now.date() if isinstance(now, datetime) else now)
+        best = None
+        for token in day_tokens:
+            entry = table.get(token.lower())
+            if entry is not None and (best is None or entry[0] < best[0]):
+                best = entry
+                if best[0] == _RELATIVE:
+                    break
+        return best[1] if best else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tables_built": self.builds,
+                "reference_dates": [day.isoformat() for day in self._tables],
+            }
@@ -0,0 +1,240 @@
+# ml/distill_student.py
+"""
+Дестилация на малък student модел (по подразбиране 4 слоя) от текущия
+BertForTokenClassification teacher:
+
+    python -m ml.distill_student --teacher dex7er999/NLPCalendar --synthetic 2000
+
+Student-ът започва от teacher-а: копират се embedding-ите, класификаторът и
+равномерно подбрани слоеве (при 12 -> 4: 0, 4, 7, 11), така че езиковото знание
+на многоезичния BERT не се губи. С --init random и различен --hidden student-ът
+тръгва от случайни тегла (тогава научава само шаблоните от ml/generate_synthetic.py).
+
+После учи от меките етикети на teacher-а (KL при температура T) плюс
+златните етикети (cross-entropy) върху ml/data/train.jsonl и нови синтетични
+примери от ml/generate_synthetic.py. Dev/test са от същите шаблони, затова
+накрая и двата модела се мерят и върху ml/data/heldout.jsonl - ръчно написани
+изречения с други заглавия, имена, места и словоред. Резултатът в ml/model_student е
+самостоятелна папка с модел, токенизатор и id2label - зарежда се с
+
+    ML_MODEL_NAME=ml/model_student uvicorn backend.main:app
+
+Сравнение на F1 и CPU латентността с teacher-а:
+
+    python -m ml.evaluate_quantization --modes torch-fp32 student-fp32 student-int8
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+
+import torch
+import torch.nn.functional as F
+from datasets import Dataset
+import evaluate
+from transformers import BertConfig, BertForTokenClassification, BertTokenizerFast, Trainer, TrainingArguments
+
+from ml.bench_utils import load_jsonl
+from ml.generate_synthetic import generate_examples
+
+# --- Настройки ---
+TEACHER_NAME = "dex7er999/NLPCalendar"
+DATA_DIR = Path("ml/data")
+# Ръчно написани примери извън шаблоните на generate_synthetic.py
+HELDOUT_PATH = DATA_DIR / "heldout.jsonl"
+OUTPUT_DIR = Path("ml/model_student")
+BATCH_SIZE = 16
+EPOCHS = 10
+LEARNING_RATE = 1e-4
+MAX_LENGTH = 64
+TEMPERATURE = 2.0
+# Тегло на KL към teacher-а; останалото е cross-entropy към златните етикети
+ALPHA = 0.7
+
+
+class DistillationTrainer(Trainer):
+    """Trainer, който смесва KL към logits на teacher-а с обичайния loss на student-а."""
+
+    def __init__(self, *args, teacher=None, temperature=TEMPERATURE, alpha=ALPHA, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Trainer мести само student-а; teacher-ът трябва да е на същото устройство (CUDA/MPS)
+        self.teacher = teacher.to(self.args.device).eval()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        outputs = model(**inputs)
+        with torch.no_grad():
+            teacher_logits = self.teacher(
+                input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"]
+            ).logits.to(outputs.logits.device)
+
+        # KL само върху позициите с етикет (без [CLS]/[SEP]/padding)
+        mask = inputs["labels"] != -100
+        t = self.temperature
+        kl = F.kl_div(
+            F.log_softmax(outputs.logits[mask] / t, dim=-1),
+            F.softmax(teacher_logits[mask] / t, dim=-1),
+            reduction="batchmean",
+        ) * t * t
+        loss = self.alpha * kl + (1 - self.alpha) * outputs.loss
+        return (loss, outputs) if return_outputs else loss
+
+
+def student_config(teacher, layers: int, hidden: int) -> BertConfig:
+    # Речникът и етикетите са на teacher-а, за да е student-ът заменим без промени в кода
+    same_width = hidden == teacher.config.hidden_size
+    return BertConfig(
+        vocab_size=teacher.config.vocab_size,
+        hidden_size=hidden,
+        num_hidden_layers=layers,
+        num_attention_heads=teacher.config.num_attention_heads if same_width else 12,
+        intermediate_size=teacher.config.intermediate_size if same_width else hidden * 4,
+        max_position_embeddings=teacher.config.max_position_embeddings,
+        type_vocab_size=teacher.config.type_vocab_size,
+        num_labels=teacher.config.num_labels,
+        id2label=teacher.config.id2label,
+        label2id=teacher.config.label2id,
+    )
+
+
+def teacher_layers(teacher_count: int, student_count: int) -> list[int]:
+    """Равномерно подбрани слоеве на teacher-а, винаги с първия и последния."""
+    if student_count == 1:
+        return [teacher_count - 1]
+    return [round(i * (teacher_count - 1) / (student_count - 1)) for i in range(student_count)]
+
+
+def init_from_teacher(student, teacher) -> list[int]:
+    """Копира embedding-ите, избраните слоеве и класификатора на teacher-а в student-а."""
+    layer_ids = teacher_layers(teacher.config.num_hidden_layers, student.config.num_hidden_layers)
+    student.bert.embeddings.load_state_dict(teacher.bert.embeddings.state_dict())
+    for student_layer, teacher_id in zip(student.bert.encoder.layer, layer_ids):
+        student_layer.load_state_dict(teacher.bert.encoder.layer[teacher_id].state_dict())
+    student.classifier.load_state_dict(teacher.classifier.state_dict())
+    return layer_ids
+
+
+def convert_to_dataset(tokenizer, examples: list[dict], label2id: dict) -> Dataset:
+    def encode(batch):
+        tokenized = tokenizer(batch["tokens"], is_split_into_words=True, truncation=True,
+                              padding="max_length", max_length=MAX_LENGTH)
+        all_labels = []
+        for i, labels in enumerate(batch["labels"]):
+            all_labels.append([-100 if wid is None else label2id[labels[wid]]
+                               for wid in tokenized.word_ids(batch_index=i)])
+        tokenized["labels"] = all_labels
+        return tokenized
+
+    ds = Dataset.from_dict({"tokens": [ex["tokens"] for ex in examples],
+                            "labels": [ex["labels"] for ex in examples]})
+    return ds.map(encode, batched=True, remove_columns=["tokens"])
+
+
+def main(args):
+    tokenizer = BertTokenizerFast.from_pretrained(args.teacher)
+    teacher = BertForTokenClassification.from_pretrained(args.teacher)
+    label2id = {label: int(i) for label, i in teacher.config.label2id.items()}
+    id2label = {int(i): label for i, label in teacher.config.id2label.items()}
+
+    train_data = load_jsonl(DATA_DIR / "train.jsonl")
+    train_data += generate_examples(args.synthetic, random.Random(args.seed))
+    dev_data = load_jsonl(DATA_DIR / "dev.jsonl")
+    print(f"📚 Training on {len(train_data)} examples ({args.synthetic} fresh synthetic)")
+
+    hidden = args.hidden or teacher.config.hidden_size
+    if args.init == "teacher" and hidden != teacher.config.hidden_size:
+        raise SystemExit(f"❌ --init teacher needs --hidden {teacher.config.hidden_size} (teacher width); use --init random")
+    student = BertForTokenClassification(student_config(teacher, args.layers, hidden))
+    layer_ids = None
+    if args.init == "teacher":
+        layer_ids = init_from_teacher(student, teacher)
+        print(f"🧬 Student initialised from teacher layers {layer_ids}")
+    n_teacher = sum(p.numel() for p in teacher.parameters())
+    n_student = sum(p.numel() for p in student.parameters())
+    print(f"🎓 Teacher: {n_teacher / 1e6:.1f}M params, student: {n_student / 1e6:.1f}M params")
+
+    metric = evaluate.load("seqeval")
+
+    def compute_metrics(p):
+        predictions, labels = p
+        predictions = predictions.argmax(axis=-1)
+        true_labels = [[id2label[l] for l in label if l != -100] for label in labels]
+        true_preds = [[id2label[p] for (p, l) in zip(pred, label) if l != -100] for pred, label in zip(predictions, labels)]
+        results = metric.compute(predictions=true_preds, references=true_labels)
+        return {"precision": results["overall_precision"], "recall": results["overall_recall"],
+                "f1": results["overall_f1"], "accuracy": results["overall_accuracy"]}
+
+    training_args = TrainingArguments(
+        output_dir=str(args.output / "checkpoints"),
+        per_device_train_batch_size=BATCH_SIZE,
+        per_device_eval_batch_size=BATCH_SIZE,
+        num_train_epochs=args.epochs,
+        learning_rate=LEARNING_RATE,
+        weight_decay=0.01,
+        logging_steps=20,
+        save_strategy="no",
+        seed=args.seed,
+    )
+    trainer = DistillationTrainer(
+        model=student,
+        args=training_args,
+        train_dataset=convert_to_dataset(tokenizer, train_data, label2id),
+        eval_dataset=convert_to_dataset(tokenizer, dev_data, label2id),
+        compute_metrics=compute_metrics,
+        teacher=teacher,
+        temperature=args.temperature,
+        alpha=args.alpha,
+    )
+    trainer.train()
+    dev_metrics = trainer.evaluate()
+    print(f"✅ Student dev F1: {dev_metrics['eval_f1']:.4f}")
+
+    # --- Held-out: изречения извън шаблоните, за student-а и за teacher-а ---
+    heldout_data = load_jsonl(HELDOUT_PATH)
+    heldout_ds = convert_to_dataset(tokenizer, heldout_data, label2id)
+    heldout = {
+        "student": trainer.evaluate(eval_dataset=heldout_ds, metric_key_prefix="heldout"),
+        "teacher": Trainer(model=teacher, args=training_args, compute_metrics=compute_metrics)
+        .evaluate(eval_dataset=heldout_ds, metric_key_prefix="heldout"),
+    }
+    print(f"🧪 Held-out ({len(heldout_data)} examples):")
+    for name, metrics in heldout.items():
+        print(f"   {name}: accuracy {metrics['heldout_accuracy']:.4f}, F1 {metrics['heldout_f1']:.4f}")
+
+    # --- Запазване: същата структура като папката на teacher-а ---
+    trainer.save_model(str(args.output))
+    tokenizer.save_pretrained(str(args.output))
+    with open(args.output / "distillation.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "teacher": args.teacher,
+            "layers": args.layers,
+            "hidden": hidden,
+            "init": args.init,
+            "teacher_layers": layer_ids,
+            "temperature": args.temperature,
+            "alpha": args.alpha,
+            "train_examples": len(train_data),
+            "teacher_params": n_teacher,
+            "student_params": n_student,
+            "dev": {k: round(v, 4) for k, v in dev_metrics.items() if isinstance(v, float)},
+            "heldout": {name: {k: round(v, 4) for k, v in metrics.items() if isinstance(v, float)}
+                        for name, metrics in heldout.items()},
+        }, f, ensure_ascii=False, indent=2)
+    print(f"💾 Saved student to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill a small token classifier from the BERT teacher")
+    parser.add_argument("--teacher", default=TEACHER_NAME)
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden", type=int, default=None, help="Default: teacher width (needed for --init teacher)")
+    parser.add_argument("--init", choices=["teacher", "random"], default="teacher",
+                        help="Copy embeddings and strided layers from the teacher, or start from random weights")
+    parser.add_argument("--synthetic", type=int, default=2000, help="Fresh synthetic examples added to train.jsonl")
+    parser.add_argument("--epochs", type=float, default=EPOCHS)
+    parser.add_argument("--temperature", type=float, default=TEMPERATURE)
+    parser.add_argument("--alpha", type=float, default=ALPHA)
+    parser.add_argument("--seed", type=int, default=42)
+    main(parser.parse_args())
@@ -0,0 +1,132 @@
+# ml/early_exit.py
+import os
+import threading
+from types import SimpleNamespace
+
+import torch
+from torch import nn
+
+# Минимална увереност (softmax) на всеки токен, при която спираме преди последния слой; 0 = изключено
+ML_EARLY_EXIT_THRESHOLD = float(os.getenv("ML_EARLY_EXIT_THRESHOLD", "0"))
+# Главите, тренирани с ml/train_early_exit.py
+ML_EARLY_EXIT_HEADS = os.getenv("ML_EARLY_EXIT_HEADS", "ml/model_early_exit/heads.pt")
+
+
+class EarlyExitHeads(nn.Module):
+    """Линейни класификатори върху изхода на междинни слоеве на BERT (номерата са от 1)."""
+
+    def __init__(self, layers: list[int], hidden_size: int, num_labels: int, dropout: float = 0.1):
+        super().__init__()
+        self.layers = sorted(layers)
+        self.dropout = nn.Dropout(dropout)
+        self.heads = nn.ModuleDict({str(layer): nn.Linear(hidden_size, num_labels) for layer in self.layers})
+
+    def forward(self, layer: int, hidden_states: torch.Tensor) -> torch.Tensor:
+        return self.heads[str(layer)](self.dropout(hidden_states))
+
+    def save(self, path: str, base_model: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        head = next(iter(self.heads.values()))
+        torch.save({
+            "layers": self.layers,
+            "hidden_size": head.in_features,
+            "num_labels": head.out_features,
+            "base_model": base_model,
+            "state_dict": self.state_dict(),
+        }, path)
+
+    @classmethod
+    def load(cls, path: str) -> "EarlyExitHeads":
+        checkpoint = torch.load(path, map_location="cpu")
+        heads = cls(checkpoint["layers"], checkpoint["hidden_size"], checkpoint["num_labels"])
+        heads.load_state_dict(checkpoint["state_dict"])
+        return heads.eval()
+
+
+class EarlyExitClassifier(nn.Module):
+    """Обвива BertForTokenClassification: пуска encoder-а слой по слой и връща
+    предсказанията на първата глава, при която всички токени на реда (без
+    [CLS]/[SEP]/padding) имат увереност >= threshold. Редовете, които са
+    приключили, се махат от batch-а, така че останалите слоеве смятат само
+    трудните изречения. Извиква се като модела: model(input_ids=..., attention_mask=...).logits"""
+
+    def __init__(self, model, heads: EarlyExitHeads, threshold: float, special_token_ids: set):
+        super().__init__()
+        self.model = model
+        self.heads = heads
+        self.threshold = threshold
+        self.special_token_ids = sorted(special_token_ids)
+        self.num_layers = model.config.num_hidden_layers
+        self._lock = threading.Lock()
+        self.exit_histogram = {layer: 0 for layer in heads.layers + [self.num_layers]}
+        self.rows = 0
+
+    def _exit_layers(self) -> set:
+        return {layer for layer in self.heads.layers if layer < self.num_layers}
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor):
+        bert = self.model.bert
+        hidden = bert.embeddings(input_ids=input_ids)
+        extended_mask = bert.get_extended_attention_mask(attention_mask, input_ids.shape)
+        # Позициите, чиято увереност има значение (реалните subword-и)
+        scored = attention_mask.bool() & ~torch.isin(input_ids, torch.tensor(self.special_token_ids))
+
+        logits = torch.zeros(*input_ids.shape, self.model.config.num_labels)
+        active = torch.arange(input_ids.shape[0])
+        exits = [self.num_layers] * input_ids.shape[0]
+        exit_layers = self._exit_layers()
+
+        for number, layer in enumerate(bert.encoder.layer, start=1):
+            out = layer(hidden, attention_mask=extended_mask)
+            hidden = out[0] if isinstance(out, tuple) else out
+            if number == self.num_layers:
+                logits[active] = self.model.classifier(self.model.dropout(hidden))
+                break
+            if number not in exit_layers:
+                continue
+
+            head_logits = self.heads(number, hidden)
+            confidence = head_logits.softmax(dim=-1).max(dim=-1).values
+            # Неоценяваните позиции не пречат на изхода
+            confidence = confidence.masked_fill(~scored[active], 1.0)
+            done = confidence.min(dim=-1).values >= self.threshold
+            if done.any():
+                logits[active[done]] = head_logits[done]
+                for row in active[done].tolist():
+                    exits[row] = number
+                keep = ~done
+                if not keep.any():
+                    break
+                active, hidden, extended_mask = active[keep], hidden[keep], extended_mask[keep]
+
+        with self._lock:
+            self.rows += len(exits)
+            for number in exits:
+                self.exit_histogram[number] += 1
+        return SimpleNamespace(logits=logits)
+
+    def stats(self) -> dict:
+        with self._lock:
+            layers_used = sum(layer * count for layer, count in self.exit_histogram.items())
+            avg_layers = layers_used / self.rows if self.rows else 0.0
+            return {
+                "threshold": self.threshold,
+                "exit_layers": self.heads.layers,
+                "rows": self.rows,
+                "exit_histogram": {str(layer): count for layer, count in self.exit_histogram.items()},
+                "avg_layers": round(avg_layers, 2),
+                "layer_speedup": round(self.num_layers / avg_layers, 2) if avg_layers else 0.0,
+            }
+
+
+def wrap_early_exit(model, tokenizer, heads_path: str = ML_EARLY_EXIT_HEADS, threshold: float = ML_EARLY_EXIT_THRESHOLD):
+    """Връща EarlyExitClassifier около model или самия model, ако режимът е изключен/няма глави."""
+    if threshold <= 0:
+        return model
+    if not os.path.isfile(heads_path):
+        print(f"⚠️ Early exit requested but {heads_path} is missing - using all layers")
+        return model
+    heads = EarlyExitHeads.load(heads_path)
+    special = {tokenizer.cls_token_id, tokenizer.sep_token_id, tokenizer.pad_token_id}
+    print(f"⚡ Early exit enabled: layers {heads.layers}, threshold {threshold}")
+    return EarlyExitClassifier(model, heads, threshold, special).eval()
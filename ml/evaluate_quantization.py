@@ -0,0 +1,115 @@
+# ml/evaluate_quantization.py
+"""
+Сравнява fp32 и int8 (динамична квантизация) варианти на модела върху ml/data/test.jsonl:
+seqeval F1, p50/p99 латентност за едно изречение и resident memory, заета от
+импорта на runtime-а и зареждането на модела.
+
+    python -m ml.evaluate_quantization --modes torch-fp32 torch-int8 onnx-fp32 onnx-int8
+
+Всеки вариант се пуска в отделен процес, за да не се смесва паметта им. ONNX
+вариантите изискват експорт с `python -m ml.export_onnx --quantize`, а student
+вариантите - модел от `python -m ml.distill_student`.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+TEST_DATA_PATH = "ml/data/test.jsonl"
+WARMUP_RUNS = 5
+MODES = {
+    "torch-fp32": {"ML_RUNTIME": "torch", "ML_QUANTIZE": ""},
+    "torch-int8": {"ML_RUNTIME": "torch", "ML_QUANTIZE": "int8"},
+    "onnx-fp32": {"ML_RUNTIME": "onnx", "ML_QUANTIZE": ""},
+    "onnx-int8": {"ML_RUNTIME": "onnx", "ML_QUANTIZE": "int8"},
+    # Дестилираният student от ml/distill_student.py
+    "student-fp32": {"ML_RUNTIME": "torch", "ML_QUANTIZE": "", "ML_MODEL_NAME": "ml/model_student"},
+    "student-int8": {"ML_RUNTIME": "torch", "ML_QUANTIZE": "int8", "ML_MODEL_NAME": "ml/model_student"},
+}
+
+def evaluate_current_mode() -> dict:
+    """Изпълнява се в дъщерния процес; режимът идва от ML_RUNTIME/ML_QUANTIZE."""
+    from seqeval.metrics import f1_score, precision_score, recall_score
+    from ml.bench_utils import latency_summary, load_jsonl, rss_mb
+
+    rss_before = rss_mb()
+    load_started = time.perf_counter()
+    from ml import nlp_parser_ml as parser
+    if not parser.ensure_model_loaded():
+        raise RuntimeError("model failed to load")
+    load_seconds = time.perf_counter() - load_started
+    rss_loaded = rss_mb()
+
+    examples = load_jsonl(TEST_DATA_PATH)
+    for ex in examples[:WARMUP_RUNS]:
+        parser._predict_labels_batch([ex["tokens"]])
+
+    references, predictions, latencies = [], [], []
+    for ex in examples:
+        started = time.perf_counter()
+        labels = parser._predict_labels_batch([ex["tokens"]])[0]
+        latencies.append(time.perf_counter() - started)
+        references.append(ex["labels"])
+        predictions.append(labels)
+
+    return {
+        "f1": round(f1_score(references, predictions), 4),
+        "precision": round(precision_score(references, predictions), 4),
+        "recall": round(recall_score(references, predictions), 4),
+        "latency": latency_summary(latencies),
+        "load_seconds": round(load_seconds, 2),
+        "rss_load_mb": round(rss_loaded - rss_before, 1),
+        "rss_after_eval_mb": rss_mb(),
+    }
+
+def run_mode(mode: str) -> dict:
+    env = dict(os.environ, USE_HF_SPACE="false", ENABLE_ML_MODEL="true", **MODES[mode])
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result_path = f.name
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-m", "ml.evaluate_quantization", "--child", result_path],
+            env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        with open(result_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    finally:
+        os.unlink(result_path)
+
+def print_report(results: dict):
+    print(f"{'mode':<12} {'F1':>7} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8}")
+    for mode, res in results.items():
+        if "error" in res:
+            print(f"{mode:<12} ❌ {res['error']}")
+            continue
+        print(f"{mode:<12} {res['f1']:>7.4f} {res['latency']['p50_ms']:>8.2f} "
+              f"{res['latency']['p99_ms']:>8.2f} {res['rss_load_mb']:>8.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="fp32 vs int8 accuracy/latency/memory report")
+    parser.add_argument("--modes", nargs="+", default=["torch-fp32", "torch-int8"], choices=list(MODES))
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.child, "w", encoding="utf-8") as f:
+            json.dump(evaluate_current_mode(), f)
+        sys.exit(0)
+
+    results = {}
+    for mode in args.modes:
+        print(f"⏱️ Evaluating {mode}...")
+        results[mode] = run_mode(mode)
+
+    print("\n=== Quantization report ===")
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Saved to {args.output}")
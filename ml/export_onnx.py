@@ -0,0 +1,103 @@
+# ml/export_onnx.py
+"""
+Експорт на BertForTokenClassification модела към ONNX за CPU inference с onnxruntime.
+
+    python -m ml.export_onnx --model dex7er999/NLPCalendar --output ml/model_onnx [--quantize]
+
+В изходната папка се записват model.onnx, токенизаторът и config.json (с id2label),
+така че ML_RUNTIME=onnx може да работи без torch. С --quantize се записва и
+model.int8.onnx (динамична int8 квантизация), който се зарежда с ML_QUANTIZE=int8.
+"""
+import argparse
+import inspect
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import BertTokenizerFast, BertForTokenClassification
+
+DEFAULT_MODEL = "dex7er999/NLPCalendar"
+DEFAULT_OUTPUT = "ml/model_onnx"
+OPSET = 17
+
+def export(model_name: str, output_dir: Path) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    onnx_path = output_dir / "model.onnx"
+
+    print(f"📥 Loading model: {model_name}")
+    tokenizer = BertTokenizerFast.from_pretrained(model_name)
+    model = BertForTokenClassification.from_pretrained(model_name)
+    model.eval()
+
+    # Примерен вход - размерите на batch и дължина са динамични
+    sample = tokenizer([["Обяд", "от", "15", "събота"]], is_split_into_words=True, return_tensors="pt")
+
+    # Новите версии на torch по подразбиране ползват dynamo exporter-а; тук искаме TorchScript
+    export_kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+
+    print(f"📦 Exporting to {onnx_path}")
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        str(onnx_path),
+        input_names=["input_ids", "attention_mask"],
+        output_names=["logits"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "logits": {0: "batch", 1: "sequence"},
+        },
+        opset_version=OPSET,
+        **export_kwargs,
+    )
+
+    tokenizer.save_pretrained(str(output_dir))
+    model.config.save_pretrained(str(output_dir))
+
+    verify(model, tokenizer, onnx_path)
+    return onnx_path
+
+def quantize(onnx_path: Path) -> Path:
+    """Динамична int8 квантизация на теглата (активациите се квантизират по време на inference)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    int8_path = onnx_path.with_name("model.int8.onnx")
+    print(f"📦 Quantizing to {int8_path}")
+    quantize_dynamic(str(onnx_path), str(int8_path), weight_type=QuantType.QInt8)
+    print(f"✅ int8 model: {int8_path.stat().st_size / 2**20:.1f} MB (fp32: {onnx_path.stat().st_size / 2**20:.1f} MB)")
+    return int8_path
+
+def verify(model, tokenizer, onnx_path: Path):
+    """Сравнява logits от torch и onnxruntime върху batch с padding."""
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"])
+    words_batch = [
+        ["Йога", "клас", "утре", "сутринта"],
+        ["Футбол", "неделя", "от", "19", "до", "21"],
+    ]
+    encoding = tokenizer(words_batch, is_split_into_words=True, return_tensors="pt", padding=True)
+
+    with torch.no_grad():
+        expected = model(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"]).logits.numpy()
+    actual = session.run(["logits"], {
+        "input_ids": encoding["input_ids"].numpy(),
+        "attention_mask": encoding["attention_mask"].numpy(),
+    })[0]
+
+    max_diff = float(np.abs(expected - actual).max())
+    print(f"🔍 Max logit difference torch vs onnx: {max_diff:.2e}")
+    if max_diff > 1e-3:
+        raise RuntimeError(f"ONNX export differs from torch (max diff {max_diff})")
+    print("✅ ONNX export verified")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the token classifier to ONNX")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Hub name or local directory")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output directory")
+    parser.add_argument("--quantize", action="store_true", help="Also write an int8 model.int8.onnx")
+    args = parser.parse_args()
+
+    path = export(args.model, Path(args.output))
+    if args.quantize:
+        quantize(path)
@@ -0,0 +1,51 @@
+# ml/fake_hf_space.py
+"""
+Локален заместител на HF Space API-то (POST /api/parse) за benchmark-и и тестове.
+
+    FAKE_SPACE_LATENCY_MS=200 uvicorn ml.fake_hf_space:app --port 7860
+    HF_SPACE_URL=http://127.0.0.1:7860 uvicorn backend.main:app
+
+Отговаря със същата структура като app.py след изкуствено забавяне, без модел.
+"""
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+FAKE_SPACE_LATENCY_MS = float(os.getenv("FAKE_SPACE_LATENCY_MS", "100"))
+# Процент заявки, на които връщаме 503 (за проверка на fallback/circuit breaker)
+FAKE_SPACE_ERROR_RATE = float(os.getenv("FAKE_SPACE_ERROR_RATE", "0"))
+
+app = FastAPI(title="Fake HF Space", version="0.1.0")
+stats = {"requests": 0, "errors": 0}
+
+@app.get("/")
+def read_root():
+    return {"status": "ok", "latency_ms": FAKE_SPACE_LATENCY_MS, **stats}
+
+@app.post("/api/parse")
+async def parse_event(payload: dict):
+    stats["requests"] += 1
+    await asyncio.sleep(FAKE_SPACE_LATENCY_MS / 1000)
+
+    if FAKE_SPACE_ERROR_RATE and random.random() < FAKE_SPACE_ERROR_RATE:
+        stats["errors"] += 1
+        return JSONResponse(status_code=503, content={"error": "fake space unavailable"})
+
+    text = payload.get("text", "")
+    if not text:
+        return {"error": "Не е подаден текст."}
+
+    tokens = text.split()
+    start = (datetime.now() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+    return {
+        "title": text.strip(),
+        "start": start.isoformat(),
+        "end": (start + timedelta(hours=1)).isoformat(),
+        "tokens": tokens,
+        "labels": ["O"] * len(tokens),
+        "debug": {"model_name": "fake", "note": "fake space"},
+    }
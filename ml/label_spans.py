@@ -0,0 +1,94 @@
+# ml/label_spans.py
+from typing import NamedTuple, Optional
+
+# Думи, които са част от заглавието, дори моделът да ги е пропуснал
+TITLE_WORDS = {"клас", "колелета", "тате", "офис", "мол"}
+# Етикетите, които отбелязват началото/края на заглавието
+TITLE_ANCHORS = {"TITLE", "PERSON", "PLACE"}
+# Времеви маркери и свързващи думи, които не влизат в заглавието
+TITLE_SKIP_WORDS = {"сутринта", "вечерта", "следобед", "утре", "днес", "вдругиден", "на", "от", "до"}
+FALLBACK_SKIP_WORDS = {"на", "в", "с", "от", "до"}
+WHEN_LABELS = {"WHEN_DAY", "WHEN_START"}
+
+
+class LabelSpan(NamedTuple):
+    label: str  # без B-/I- префикса: "WHEN_DAY", "WHEN_START", "TITLE", ...
+    start: int  # индекс на първата дума
+    end: int    # индекс след последната дума
+
+
+class DecodedLabels:
+    """Поправените етикети и span-овете на едно изречение; заглавието, денят и
+    часът се четат оттук вместо с отделно обхождане на (дума, етикет) двойките."""
+
+    def __init__(self, words: list[str], labels: list[str], spans: list[LabelSpan],
+                 title_range: Optional[tuple[int, int]], weekdays: dict):
+        self.words = words
+        self.labels = labels
+        self.spans = spans
+        self.title_range = title_range
+        self.weekdays = weekdays
+
+    def tokens(self, label: str) -> list[str]:
+        return [word for span in self.spans if span.label == label for word in self.words[span.start:span.end]]
+
+    def day_tokens(self) -> list[str]:
+        return self.tokens("WHEN_DAY")
+
+    def time_tokens(self) -> list[str]:
+        """Всеки WHEN_START заедно със свързващите думи след него ("от 10 до 12")
+        до началото на следващия span, който не е WHEN_START."""
+        section, stop = [], 0
+        for i, span in enumerate(self.spans):
+            if span.label != "WHEN_START" or span.start < stop:
+                continue
+            stop = next((s.start for s in self.spans[i + 1:] if s.label != "WHEN_START"), len(self.labels))
+            section.extend(self.words[span.start:stop])
+        return section
+
+    def title(self) -> str:
+        if self.title_range is None:
+            return " ".join(self.tokens("TITLE")).strip()
+        first, last = self.title_range
+        return " ".join(
+            word for word in self.words[first:last + 1]
+            if word.lower() not in TITLE_SKIP_WORDS and word not in self.weekdays and word.lower() not in self.weekdays
+        ).strip()
+
+    def fallback_title(self) -> str:
+        """Всички думи извън WHEN span-овете - ако не е намерено заглавие."""
+        when = {i for span in self.spans if span.label in WHEN_LABELS for i in range(span.start, span.end)}
+        return " ".join(
+            self.words[i] for i in range(len(self.labels))
+            if i not in when and self.words[i].lower() not in FALLBACK_SKIP_WORDS
+        ).strip()
+
+
+def decode_spans(words: list[str], labels: list[str], weekdays: dict) -> DecodedLabels:
+    """Едно минаване по етикетите: поправя пропуснатите дни от седмицата,
+    групира B-/I- етикетите в span-ове и намира първия и последния токен на заглавието."""
+    fixed, spans = [], []
+    first = last = -1
+    for i, (word, label) in enumerate(zip(words, labels)):
+        if label == "O" and word.lower() in weekdays:
+            label = "B-WHEN_DAY"
+        fixed.append(label)
+
+        name = None
+        if label != "O":
+            prefix, sep, name = label.partition("-")
+            if not sep:
+                prefix, name = "B", label
+            if prefix == "I" and spans and spans[-1].label == name and spans[-1].end == i:
+                spans[-1] = spans[-1]._replace(end=i + 1)
+            else:
+                spans.append(LabelSpan(name, i, i + 1))
+
+        if (name in TITLE_ANCHORS or word.lower() in TITLE_WORDS or
+                (i > 0 and words[i - 1].lower() == "с" and word not in weekdays and not word.isdigit())):
+            if first == -1:
+                first = i
+            last = i
+
+    title_range = (first, last) if first != -1 else None
+    return DecodedLabels(words, fixed, spans, title_range, weekdays)
@@ -0,0 +1,173 @@
+# ml/model_artifact.py
+"""
+Локален (offline) артефакт на модела: папка с model.safetensors, config.json,
+токенизатора и manifest.json с sha256 и размер на всеки файл.
+
+    python -m ml.model_artifact export --model dex7er999/NLPCalendar --output ml/model_local
+    python -m ml.model_artifact verify --dir ml/model_local --level full
+    python -m ml.model_artifact bench --dir ml/model_local
+
+Сървърът го ползва с ML_MODEL_DIR=ml/model_local: не се обръща към Hub-а, теглата
+се четат от safetensors чрез mmap (без случайна инициализация на параметрите),
+а manifest-ът се проверява преди зареждане (ML_ARTIFACT_VERIFY):
+
+  full - sha256 на всички файлове (при deploy; ~1 s на GB тегла)
+  fast - размерите на всички файлове, sha256 на всичко освен теглата и на
+         safetensors header-а (имена, dtype-ове и offset-и на тензорите)
+  off  - без проверка
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+WEIGHTS_NAME = "model.safetensors"
+DEFAULT_OUTPUT = "ml/model_local"
+HASH_CHUNK_BYTES = 4 * 2**20
+
+
+class ArtifactError(RuntimeError):
+    """Артефактът липсва, непълен е или не съвпада с manifest-а."""
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _safetensors_header_sha256(path: Path) -> str:
+    # Форматът е: 8 байта little-endian дължина N, после N байта JSON header
+    with open(path, "rb") as f:
+        (length,) = struct.unpack("<Q", f.read(8))
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def write_manifest(artifact_dir: Path) -> dict:
+    files = {}
+    for path in sorted(artifact_dir.iterdir()):
+        if path.is_file() and path.name != MANIFEST_NAME:
+            files[path.name] = {"size": path.stat().st_size, "sha256": _sha256(path)}
+    manifest = {"files": files, "weights_header_sha256": _safetensors_header_sha256(artifact_dir / WEIGHTS_NAME)}
+    with open(artifact_dir / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def verify_artifact(artifact_dir, level: str = "fast") -> float:
+    """Проверява папката срещу manifest.json; връща времето в секунди или хвърля ArtifactError."""
+    started = time.perf_counter()
+    if level == "off":
+        return 0.0
+    artifact_dir = Path(artifact_dir)
+    manifest_path = artifact_dir / MANIFEST_NAME
+    if not manifest_path.is_file():
+        raise ArtifactError(f"{manifest_path} is missing - run `python -m ml.model_artifact export` first")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    for name, expected in manifest["files"].items():
+        path = artifact_dir / name
+        if not path.is_file():
+            raise ArtifactError(f"{name} is missing from {artifact_dir}")
+        if path.stat().st_size != expected["size"]:
+            raise ArtifactError(f"{name}: size {path.stat().st_size} != {expected['size']}")
+        if level == "full" or name != WEIGHTS_NAME:
+            if _sha256(path) != expected["sha256"]:
+                raise ArtifactError(f"{name}: sha256 mismatch")
+    if level == "fast" and _safetensors_header_sha256(artifact_dir / WEIGHTS_NAME) != manifest["weights_header_sha256"]:
+        raise ArtifactError(f"{WEIGHTS_NAME}: header sha256 mismatch")
+    return time.perf_counter() - started
+
+
+def export(model_name: str, output_dir: Path) -> dict:
+    from transformers import BertTokenizerFast, BertForTokenClassification
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    print(f"📥 Loading model: {model_name}")
+    tokenizer = BertTokenizerFast.from_pretrained(model_name)
+    model = BertForTokenClassification.from_pretrained(model_name)
+    model.save_pretrained(output_dir, safe_serialization=True)
+    tokenizer.save_pretrained(output_dir)
+    manifest = write_manifest(output_dir)
+    print(f"📦 Wrote {len(manifest['files'])} files and {MANIFEST_NAME} to {output_dir}")
+    return manifest
+
+
+# --- Startup benchmark: всеки режим в отделен процес, за да не се ползва кеш от предишния ---
+BENCH_MODES = {
+    "hub": {"ML_MODEL_DIR": ""},
+    "local-off": {"ML_ARTIFACT_VERIFY": "off"},
+    "local-fast": {"ML_ARTIFACT_VERIFY": "fast"},
+    "local-full": {"ML_ARTIFACT_VERIFY": "full"},
+}
+
+
+def _child_startup() -> dict:
+    started = time.perf_counter()
+    from ml import nlp_parser_ml as parser
+    imported = time.perf_counter()
+    if not parser.ensure_model_loaded(warmup=False):
+        raise RuntimeError(parser.model_status().get("error") or "model failed to load")
+    return {
+        "import_seconds": round(imported - started, 3),
+        "verify_seconds": parser.model_status().get("verify_seconds"),
+        "load_seconds": round(time.perf_counter() - imported, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def bench(artifact_dir: str, modes: list[str]) -> dict:
+    results = {}
+    for mode in modes:
+        env = dict(os.environ, USE_HF_SPACE="false", ENABLE_ML_MODEL="true", ML_RUNTIME="torch", ML_MODEL_DIR=artifact_dir)
+        env.update(BENCH_MODES[mode])
+        proc = subprocess.run([sys.executable, "-m", "ml.model_artifact", "_child"], env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            results[mode] = {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        else:
+            results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"⏱️ {mode}: {results[mode]}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline model artifact: export, verify, startup benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="Download the model and write a safetensors artifact with a manifest")
+    p_export.add_argument("--model", default="dex7er999/NLPCalendar", help="Hub name or local directory")
+    p_export.add_argument("--output", default=DEFAULT_OUTPUT)
+    p_verify = sub.add_parser("verify", help="Check an artifact against its manifest")
+    p_verify.add_argument("--dir", default=DEFAULT_OUTPUT)
+    p_verify.add_argument("--level", choices=["fast", "full"], default="full")
+    p_bench = sub.add_parser("bench", help="Report startup time of each loading mode")
+    p_bench.add_argument("--dir", default=DEFAULT_OUTPUT)
+    p_bench.add_argument("--modes", nargs="+", choices=list(BENCH_MODES), default=list(BENCH_MODES))
+    p_bench.add_argument("--output", help="Write the JSON report to this file")
+    sub.add_parser("_child")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export(args.model, Path(args.output))
+    elif args.command == "verify":
+        try:
+            seconds = verify_artifact(args.dir, args.level)
+        except ArtifactError as e:
+            sys.exit(f"❌ {e}")
+        print(f"✅ {args.dir} matches {MANIFEST_NAME} ({args.level}, {seconds:.2f}s)")
+    elif args.command == "bench":
+        report = bench(args.dir, args.modes)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(_child_startup()))
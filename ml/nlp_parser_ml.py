@@ -4,23 +4,71 @@ import json
 from datetime import datetime, timedelta, time, date
 from typing import Optional, Tuple
 import os
-import requests
+import asyncio
+import importlib.util
+import threading
+import time as _time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import httpx
+from ml.batcher import MicroBatcher
+from ml.parse_cache import ParseCache
+from ml.circuit_breaker import CircuitBreaker, OPEN
+from ml.rule_parser import RuleParser
+from ml.word_encoder import WordPieceCache
+from ml.model_artifact import verify_artifact
+from ml.segmenter import Segment, split_segments
+from ml.label_spans import decode_spans
+from ml.day_resolver import DayResolver
+from ml.parser_backends import ParserBackend, ParserRegistry
 
 # Configuration for ML model loading
 ENABLE_ML_MODEL = os.getenv("ENABLE_ML_MODEL", "true").lower() == "true"
 USE_HF_SPACE = os.getenv("USE_HF_SPACE", "true").lower() == "true"
 HF_SPACE_URL = os.getenv("HF_SPACE_URL", "https://dex7er999-calendar-nlp-api.hf.space")
+# Pooled HTTP клиенти към HF Space: timeout, брой keep-alive връзки и паралелни заявки
+HF_SPACE_TIMEOUT = float(os.getenv("HF_SPACE_TIMEOUT", "30"))
+HF_SPACE_MAX_CONNECTIONS = int(os.getenv("HF_SPACE_MAX_CONNECTIONS", "20"))
+HF_SPACE_MAX_CONCURRENCY = int(os.getenv("HF_SPACE_MAX_CONCURRENCY", "16"))
+# Общ бюджет (wall clock) за едно извикване на Space-а, вкл. чакането за свободен слот;
+# след него - локален fallback. HF_SPACE_TIMEOUT е отделно - за всяка мрежова операция поотделно
+HF_SPACE_DEADLINE = float(os.getenv("HF_SPACE_DEADLINE", "8"))
+# Максимален брой изречения в един forward pass на локалния модел
+ML_BATCH_SIZE = int(os.getenv("ML_BATCH_SIZE", "32"))
+# Runtime за локалния модел: "torch" или "onnx" (onnxruntime на CPU, без torch)
+ML_RUNTIME = os.getenv("ML_RUNTIME", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "ml/model_onnx")
+# "int8" включва динамична int8 квантизация (Linear слоевете при torch, model.int8.onnx при onnx)
+ML_QUANTIZE = os.getenv("ML_QUANTIZE", "").lower()
+# Зареждане на модела във фонов thread при стартиране на API-то (иначе - при първа заявка)
+ML_EAGER_LOAD = os.getenv("ML_EAGER_LOAD", "true").lower() == "true"
+# Локален артефакт от ml/model_artifact.py (safetensors + manifest); ако е зададен, Hub-ът не се ползва
+ML_MODEL_DIR = os.getenv("ML_MODEL_DIR", "")
+# Проверка на артефакта срещу manifest-а: "full", "fast" или "off"
+ML_ARTIFACT_VERIFY = os.getenv("ML_ARTIFACT_VERIFY", "fast").lower()
+
+if ML_MODEL_DIR:
+    # Преди импорта на transformers - без нито една мрежова заявка към Hub-а
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
 
 print(f"🤖 ML Model enabled: {ENABLE_ML_MODEL}")
 print(f"🚀 Using HF Space: {USE_HF_SPACE}")
 if USE_HF_SPACE:
     print(f"🌐 HF Space URL: {HF_SPACE_URL}")
+else:
+    print(f"⚙️ ML runtime: {ML_RUNTIME}" + (f" ({ML_QUANTIZE})" if ML_QUANTIZE else ""))
 
 # Import ML libraries only if not using HF Space
 if ENABLE_ML_MODEL and not USE_HF_SPACE:
     try:
-        import torch
-        from transformers import BertTokenizerFast, BertForTokenClassification
+        if ML_RUNTIME == "onnx":
+            import numpy as np
+            import onnxruntime as ort
+            from transformers import BertTokenizerFast
+        else:
+            import torch
+            from transformers import BertTokenizerFast, BertForTokenClassification
+            from ml.early_exit import wrap_early_exit
         ML_AVAILABLE = True
         print("🤖 ML libraries loaded successfully")
     except ImportError as e:
@@ -34,32 +82,161 @@ else:
         print("🚫 ML model loading disabled")
         ML_AVAILABLE = False
 
-# Load model from Hugging Face Hub
-MODEL_NAME = "dex7er999/NLPCalendar"
+# Load model from Hugging Face Hub (or a local directory with the same layout)
+MODEL_NAME = os.getenv("ML_MODEL_NAME", "dex7er999/NLPCalendar")
 
 # Initialize model variables
 tokenizer = None
 model = None
+# Кеш дума -> subword id-та пред tokenizer-а (създава се заедно с модела)
+word_encoder: Optional[WordPieceCache] = None
 LABELS = ["O", "B-TITLE", "I-TITLE", "B-TIME", "I-TIME", "B-DATE", "I-DATE", "B-DURATION", "I-DURATION"]
 
-# Only try to load local model if not using HF Space and ML is enabled
-if ENABLE_ML_MODEL and not USE_HF_SPACE and ML_AVAILABLE:
+def _labels_from_id2label(id2label: dict) -> list[str]:
+    # Етикетите идват от конфигурацията на модела (в реда на id-тата)
+    return [label for _, label in sorted(id2label.items(), key=lambda x: int(x[0]))]
+
+def load_torch_model(model_name: str, quantize: str = "", local: bool = False):
+    """Зарежда токенизатор и BertForTokenClassification; при quantize="int8" Linear слоевете стават int8.
+
+    local=True чете само от папката: safetensors през mmap, параметрите се създават
+    на meta device и се пълнят директно от файла (без случайна инициализация)."""
+    if local:
+        tok = BertTokenizerFast.from_pretrained(model_name, local_files_only=True)
+        mdl = BertForTokenClassification.from_pretrained(
+            model_name, local_files_only=True, use_safetensors=True, low_cpu_mem_usage=True,
+        )
+    else:
+        tok = BertTokenizerFast.from_pretrained(model_name)
+        mdl = BertForTokenClassification.from_pretrained(model_name)
+    mdl.eval()
+    if quantize == "int8":
+        mdl = torch.ao.quantization.quantize_dynamic(mdl, {torch.nn.Linear}, dtype=torch.qint8)
+    return tok, mdl, _labels_from_id2label(mdl.config.id2label)
+
+def load_onnx_model(model_dir: str, quantize: str = ""):
+    """Зарежда ONNX модела, експортиран с ml/export_onnx.py, заедно с токенизатора и етикетите."""
+    tok = BertTokenizerFast.from_pretrained(model_dir)
+    filename = "model.int8.onnx" if quantize == "int8" else "model.onnx"
+    session = ort.InferenceSession(os.path.join(model_dir, filename), providers=["CPUExecutionProvider"])
+    with open(os.path.join(model_dir, "config.json"), "r", encoding="utf-8") as f:
+        id2label = json.load(f)["id2label"]
+    return tok, session, _labels_from_id2label(id2label)
+
+# Моделът не се зарежда при import, а при първа употреба (ensure_model_loaded)
+# или във фонов thread от startup hook-а (start_background_load)
+_model_lock = threading.Lock()
+_model_status = {"state": "cold", "load_seconds": None, "verify_seconds": None, "warmup_seconds": None, "error": None}
+
+# Изречения с различна дължина за загряване на kernel-ите и токенизатора
+WARMUP_TEXTS = [
+    "Йога клас утре сутринта",
+    "Обяд от 15 събота с Иван",
+    "Онлайн лекция по програмиране в понеделник от 10 до 12",
+]
+
+def _local_model_enabled() -> bool:
+    return ENABLE_ML_MODEL and not USE_HF_SPACE and ML_AVAILABLE
+
+def ensure_model_loaded(warmup: bool = True) -> bool:
+    """Зарежда и загрява локалния модел при първо извикване (thread-safe). Връща дали е наличен.
+
+    warmup=False само зарежда теглата (pre-fork режим - загряването е в worker-ите)."""
+    global tokenizer, model, LABELS, ML_AVAILABLE, word_encoder
+    if model is not None:
+        return True
+    if not _local_model_enabled():
+        return False
+
+    with _model_lock:
+        if model is not None:
+            return True
+        if _model_status["state"] == "failed":
+            return False
+
+        _model_status["state"] = "loading"
+        started = _time.perf_counter()
+        try:
+            if ML_RUNTIME == "onnx":
+                print(f"📥 Loading ONNX model from: {ONNX_MODEL_DIR}")
+                tok, mdl, labels = load_onnx_model(ONNX_MODEL_DIR, ML_QUANTIZE)
+            elif ML_MODEL_DIR:
+                print(f"📥 Loading local model artifact from: {ML_MODEL_DIR}")
+                _model_status["verify_seconds"] = round(verify_artifact(ML_MODEL_DIR, ML_ARTIFACT_VERIFY), 3)
+                tok, mdl, labels = load_torch_model(ML_MODEL_DIR, ML_QUANTIZE, local=True)
+            else:
+                print(f"📥 Loading model from Hugging Face: {MODEL_NAME}")
+                tok, mdl, labels = load_torch_model(MODEL_NAME, ML_QUANTIZE)
+            if ML_RUNTIME != "onnx":
+                # ML_EARLY_EXIT_THRESHOLD > 0: спиране на междинен слой при уверени предсказания
+                mdl = wrap_early_exit(mdl, tok)
+        except Exception as e:
+            print(f"❌ Failed to load model: {e}")
+            _model_status.update(state="failed", error=str(e))
+            ML_AVAILABLE = False
+            return False
+        _model_status["load_seconds"] = round(_time.perf_counter() - started, 3)
+        print(f"✅ Model loaded in {_model_status['load_seconds']}s")
+
+        tokenizer, LABELS, model = tok, labels, mdl
+        word_encoder = WordPieceCache(tok)
+        if warmup:
+            warm_up_model()
+        else:
+            _model_status["state"] = "loaded"
+        return True
+
+def warm_up_model():
+    """Загрява вече заредения модел и го маркира като готов."""
+    if model is None:
+        return
+    _model_status["state"] = "warming"
+    _warmup()
+    _model_status["state"] = "ready"
+
+def _warmup():
+    started = _time.perf_counter()
     try:
-        print(f"📥 Loading model from Hugging Face: {MODEL_NAME}")
-        # Try to load the model from Hugging Face
-        tokenizer = BertTokenizerFast.from_pretrained(MODEL_NAME)
-        model = BertForTokenClassification.from_pretrained(MODEL_NAME)
-        model.eval()
-        print(f"✅ Successfully loaded model from Hugging Face: {MODEL_NAME}")
+        # Един batch и едно самостоятелно изречение - двата shape-а, които виждаме при заявки
+        _predict_labels_batch([text.split() for text in WARMUP_TEXTS])
+        _predict_labels_batch([WARMUP_TEXTS[0].split()])
     except Exception as e:
-        print(f"❌ Failed to load model from Hugging Face: {e}")
-        ML_AVAILABLE = False
-elif USE_HF_SPACE:
+        print(f"⚠️ Model warm-up failed: {e}")
+    _model_status["warmup_seconds"] = round(_time.perf_counter() - started, 3)
+    print(f"🔥 Model warm-up done in {_model_status['warmup_seconds']}s")
+
+def start_background_load() -> Optional[threading.Thread]:
+    """Стартира зареждането на модела във фонов thread (извиква се от FastAPI startup)."""
+    if not _local_model_enabled() or model is not None:
+        return None
+    thread = threading.Thread(target=ensure_model_loaded, name="ml-model-loader", daemon=True)
+    thread.start()
+    return thread
+
+def model_status() -> dict:
+    """Състояние на модела за readiness endpoint-а."""
+    if USE_HF_SPACE and ML_AVAILABLE:
+        return {"mode": "hf_space", "ready": True, "state": "remote", "url": HF_SPACE_URL}
+    if not _local_model_enabled():
+        return {"mode": "fallback", "ready": True, "state": "disabled", "error": _model_status["error"]}
+    return {
+        "mode": "local",
+        "ready": _model_status["state"] == "ready",
+        "runtime": ML_RUNTIME,
+        "quantize": ML_QUANTIZE or None,
+        "model_name": ONNX_MODEL_DIR if ML_RUNTIME == "onnx" else (ML_MODEL_DIR or MODEL_NAME),
+        "source": "local" if ML_RUNTIME == "onnx" or ML_MODEL_DIR else "hub",
+        **_model_status,
+    }
+
+if USE_HF_SPACE:
     print("🚀 Using HF Space - skipping local model loading")
 elif not ENABLE_ML_MODEL:
     print("🚫 ML model loading disabled")
-else:
+elif not ML_AVAILABLE:
     print("⚠️ ML libraries not available")
+else:
+    print("💤 Local model will be loaded on first use")
 
 print(f"🤖 ML Model available: {ML_AVAILABLE}")
 
@@ -101,78 +278,12 @@ DAYTIME_HINTS = {
     "вечер": time(19, 0)
 }
 
-def _next_weekday(from_date: date, target_weekday: int) -> date:
-    """Връща следващата дата за даден ден от седмицата (>= утре)."""
-    # Convert datetime to date if needed
-    current_date = from_date.date() if isinstance(from_date, datetime) else from_date
-    
-    # Get current weekday (0=Monday through 6=Sunday)
-    current_weekday = current_date.weekday()
-    
-    # Calculate days until target
-    days_ahead = target_weekday - current_weekday
-    
-    # If we have passed the target day this week or it's today,
-    # we need to wait for next week
-    if days_ahead <= 0:
-        days_ahead += 7
-    
-    next_date = current_date + timedelta(days=days_ahead)
-    
-    # Verify we got the right weekday
-    assert next_date.weekday() == target_weekday, f"Expected weekday {target_weekday}, got {next_date.weekday()}"
-    
-    return next_date
+# Всички поддържани изрази за ден -> дата, по една таблица за референтния ден
+day_resolver = DayResolver(WEEKDAYS, RELATIVE)
 
 def _parse_day_from_tokens(day_tokens: list[str], now: datetime) -> Optional[date]:
     """Опитва да извлече дата (ден/дата) от токените с WHEN_DAY."""
-    if not day_tokens:
-        return None
-
-    # Convert to lowercase and search in WEEKDAYS dictionary as is
-    toks = day_tokens
-
-    # 1) относителни думи (днес/утре/вдругиден)
-    for t in toks:
-        if t.lower() in RELATIVE:
-            return (now + timedelta(days=RELATIVE[t.lower()])).date()
-
-    # 2) ден от седмицата - search with original case first, then try lowercase
-    for t in toks:
-        weekday_val = WEEKDAYS.get(t)  # Try exact match first
-        if weekday_val is None:
-            weekday_val = WEEKDAYS.get(t.lower())  # Try lowercase as fallback
-        if weekday_val is not None:
-            return _next_weekday(now, weekday_val)
-
-    # 3) дата от типа "20ти", "1ви", "2ри", "7ми", "20", "20."
-    for t in toks:
-        m = re.match(r"^(\d{1,2})(?:-?(ви|ри|ти|ми))?\.?$", t)
-        if m:
-            day = int(m.group(1))
-            y, mth = now.year, now.month
-            try:
-                candidate = date(y, mth, day)
-            except ValueError:
-                if mth == 12:
-                    candidate = date(y + 1, 1, day)
-                else:
-                    candidate = date(y, mth + 1, day)
-            if candidate < now.date():
-                if candidate.month == 12:
-                    candidate = date(candidate.year + 1, 1, candidate.day)
-                else:
-                    for i in range(1, 3):
-                        try:
-                            candidate = date(y + (mth + i - 1) // 12,
-                                             ((mth + i - 1) % 12) + 1,
-                                             day)
-                            break
-                        except ValueError:
-                            continue
-            return candidate
-
-    return None
+    return day_resolver.resolve(day_tokens, now)
 
 def _parse_time_from_tokens(time_tokens: list[str]) -> Tuple[Optional[time], Optional[time]]:
     """Опитва да извлече начален и краен час от WHEN_START токени."""
@@ -219,74 +330,351 @@ def _parse_time_from_tokens(time_tokens: list[str]) -> Tuple[Optional[time], Opt
     
     return None, None
 
-def _find_daytime_hint(tokens: list[str], labels: list[str]) -> Optional[time]:
+def _find_daytime_hint(day_tokens: list[str]) -> Optional[time]:
     """Ако няма WHEN_START, търсим думи като 'сутринта', 'следобед', 'вечерта' в WHEN_DAY токени."""
-    for tok, lab in zip(tokens, labels):
-        if lab in ("B-WHEN_DAY", "I-WHEN_DAY"):
-            if tok.lower() in DAYTIME_HINTS:
-                return DAYTIME_HINTS[tok.lower()]
+    for tok in day_tokens:
+        if tok.lower() in DAYTIME_HINTS:
+            return DAYTIME_HINTS[tok.lower()]
     return None
 
-def query_hf_space(text: str) -> dict:
+# Споделени клиенти - една TLS връзка се преизползва между заявките (keep-alive)
+_hf_client: Optional[httpx.Client] = None
+_hf_async_client: Optional[httpx.AsyncClient] = None
+_hf_executor: Optional[ThreadPoolExecutor] = None
+_hf_semaphore: Optional[asyncio.Semaphore] = None
+_hf_client_lock = threading.Lock()
+
+def _hf_client_options() -> dict:
+    try:
+        import h2  # noqa: F401 - HTTP/2 само ако е инсталиран httpx[http2]
+        http2 = True
+    except ImportError:
+        http2 = False
+    return {
+        "base_url": HF_SPACE_URL,
+        "http2": http2,
+        "timeout": HF_SPACE_TIMEOUT,
+        "limits": httpx.Limits(
+            max_connections=HF_SPACE_MAX_CONNECTIONS,
+            max_keepalive_connections=HF_SPACE_MAX_CONNECTIONS,
+            keepalive_expiry=60,
+        ),
+        "headers": {"Content-Type": "application/json"},
+    }
+
+def _get_hf_client() -> httpx.Client:
+    global _hf_client
+    with _hf_client_lock:
+        if _hf_client is None or _hf_client.is_closed:
+            _hf_client = httpx.Client(**_hf_client_options())
+        return _hf_client
+
+def _get_hf_executor() -> ThreadPoolExecutor:
+    """Нишки за sync заявките - извикващият чака най-много HF_SPACE_DEADLINE, а httpx
+    timeout-ът важи за всяка операция поотделно и не ограничава бавно капещ отговор."""
+    global _hf_executor
+    with _hf_client_lock:
+        if _hf_executor is None:
+            _hf_executor = ThreadPoolExecutor(max_workers=HF_SPACE_MAX_CONCURRENCY, thread_name_prefix="hf-space")
+        return _hf_executor
+
+def _get_hf_async_client() -> httpx.AsyncClient:
+    global _hf_async_client, _hf_semaphore
+    if _hf_async_client is None or _hf_async_client.is_closed:
+        _hf_async_client = httpx.AsyncClient(**_hf_client_options())
+        _hf_semaphore = asyncio.Semaphore(HF_SPACE_MAX_CONCURRENCY)
+    return _hf_async_client
+
+async def close_hf_clients():
+    """Затваря pooled клиентите (извиква се при shutdown на API-то)."""
+    global _hf_client, _hf_async_client, _hf_executor
+    if _hf_async_client is not None:
+        await _hf_async_client.aclose()
+        _hf_async_client = None
+    if _hf_executor is not None:
+        _hf_executor.shutdown(wait=False, cancel_futures=True)
+        _hf_executor = None
+    if _hf_client is not None:
+        _hf_client.close()
+        _hf_client = None
+
+def _check_hf_response(text: str, result: dict) -> Optional[dict]:
+    print(f"✅ HF Space API call successful for text: '{text}'")
+
+    # Check if there's an error in the response
+    if "error" in result:
+        print(f"⚠️ HF Space returned error: {result['error']}")
+        return None
+
+    # Ensure the response has the expected structure
+    if "title" in result and ("start" in result or "datetime" in result):
+        # Add backward compatibility field
+        if "start" in result and "datetime" not in result:
+            result["datetime"] = result["start"]
+        elif "datetime" in result and "start" not in result:
+            result["start"] = result["datetime"]
+
+        return result
+    else:
+        print(f"⚠️ HF Space response missing required fields: {result}")
+        return None
+
+def _validated_hf_result(text: str, result, started: float) -> Optional[dict]:
+    """Проверява отговора и чак тогава го отчита в breaker-а: success само за използваем резултат."""
+    try:
+        checked = _check_hf_response(text, result)
+    except Exception as e:
+        print(f"❌ Invalid HF Space response: {e}")
+        hf_breaker.record_failure(f"invalid response: {e}")
+        return None
+    if checked is None:
+        hf_breaker.record_failure("unusable response")
+        return None
+    hf_breaker.record_success(_time.perf_counter() - started)
+    return checked
+
+# Докато Space-ът е студен или недостъпен, заявките отиват директно към локалното парсиране
+hf_breaker = CircuitBreaker()
+
+def _hf_circuit_open() -> bool:
+    if hf_breaker.allow_request():
+        return False
+    print("⚡ HF Space circuit is open, skipping remote call")
+    return True
+
+def _post_hf_space(text: str) -> dict:
+    response = _get_hf_client().post("/api/parse", json={"text": text}, timeout=HF_SPACE_DEADLINE)
+    response.raise_for_status()
+    return response.json()
+
+def query_hf_space(text: str) -> Optional[dict]:
     """Query the Hugging Face Space API for ML inference"""
+    if _hf_circuit_open():
+        return None
+    started = _time.perf_counter()
+    future = _get_hf_executor().submit(_post_hf_space, text)
     try:
-        # Make API call to your HF Space
-        response = requests.post(
-            f"{HF_SPACE_URL}/api/parse",
-            json={"text": text},
-            timeout=30,
-            headers={"Content-Type": "application/json"}
-        )
-        response.raise_for_status()
-        result = response.json()
-        
-        print(f"✅ HF Space API call successful for text: '{text}'")
-        
-        # Check if there's an error in the response
-        if "error" in result:
-            print(f"⚠️ HF Space returned error: {result['error']}")
-            return None
-            
-        # Ensure the response has the expected structure
-        if "title" in result and ("start" in result or "datetime" in result):
-            # Add backward compatibility field
-            if "start" in result and "datetime" not in result:
-                result["datetime"] = result["start"]
-            elif "datetime" in result and "start" not in result:
-                result["start"] = result["datetime"]
-                
-            return result
-        else:
-            print(f"⚠️ HF Space response missing required fields: {result}")
-            return None
-        
-    except requests.exceptions.RequestException as e:
+        result = future.result(timeout=HF_SPACE_DEADLINE)
+    except FutureTimeoutError:
+        # Заявката довършва във фона (до httpx timeout-а), но извикващият не я чака
+        future.cancel()
+        print(f"❌ HF Space API error: no response within {HF_SPACE_DEADLINE}s")
+        hf_breaker.record_failure("deadline exceeded")
+        return None
+    except httpx.HTTPError as e:
+        print(f"❌ HF Space API error: {e}")
+        hf_breaker.record_failure(str(e) or type(e).__name__)
+        return None
+    except Exception as e:
+        print(f"❌ Unexpected error calling HF Space: {e}")
+        hf_breaker.record_failure(str(e))
+        return None
+    return _validated_hf_result(text, result, started)
+
+async def _post_hf_space_async(text: str) -> dict:
+    client = _get_hf_async_client()
+    async with _hf_semaphore:
+        response = await client.post("/api/parse", json={"text": text})
+    response.raise_for_status()
+    return response.json()
+
+async def query_hf_space_async(text: str) -> Optional[dict]:
+    """Async вариант на query_hf_space - не заема thread докато чака Space-а."""
+    if _hf_circuit_open():
+        return None
+    started = _time.perf_counter()
+    try:
+        result = await asyncio.wait_for(_post_hf_space_async(text), HF_SPACE_DEADLINE)
+    except asyncio.TimeoutError:
+        print(f"❌ HF Space API error: no response within {HF_SPACE_DEADLINE}s")
+        hf_breaker.record_failure("deadline exceeded")
+        return None
+    except httpx.HTTPError as e:
         print(f"❌ HF Space API error: {e}")
+        hf_breaker.record_failure(str(e) or type(e).__name__)
         return None
     except Exception as e:
         print(f"❌ Unexpected error calling HF Space: {e}")
+        hf_breaker.record_failure(str(e))
         return None
+    return _validated_hf_result(text, result, started)
+
+def _post_hf_space_bulk(texts: list[str]) -> list[Optional[dict]]:
+    items = [{"text": text, "id": i} for i, text in enumerate(texts)]
+    response = _get_hf_client().post("/api/parse/bulk", json=items, timeout=HF_SPACE_DEADLINE)
+    response.raise_for_status()
+    # NDJSON по реда на завършване - подреждаме обратно по id
+    results: list[Optional[dict]] = [None] * len(texts)
+    for line in response.text.splitlines():
+        if not line.strip():
+            continue
+        result = json.loads(line)
+        index = result.pop("id", None)
+        result.pop("line", None)
+        if isinstance(index, int) and 0 <= index < len(texts):
+            results[index] = result
+    return results
+
+def query_hf_space_batch(texts: list[str]) -> list[Optional[dict]]:
+    """Всички texts с една заявка към /api/parse/bulk на Space-а; None за ред без резултат."""
+    if _hf_circuit_open():
+        return [None] * len(texts)
+    started = _time.perf_counter()
+    future = _get_hf_executor().submit(_post_hf_space_bulk, texts)
+    try:
+        raw = future.result(timeout=HF_SPACE_DEADLINE)
+    except FutureTimeoutError:
+        future.cancel()
+        print(f"❌ HF Space API error: no response within {HF_SPACE_DEADLINE}s")
+        hf_breaker.record_failure("deadline exceeded")
+        return [None] * len(texts)
+    except httpx.HTTPError as e:
+        print(f"❌ HF Space API error: {e}")
+        hf_breaker.record_failure(str(e) or type(e).__name__)
+        return [None] * len(texts)
+    except Exception as e:
+        print(f"❌ Unexpected error calling HF Space: {e}")
+        hf_breaker.record_failure(str(e))
+        return [None] * len(texts)
+    try:
+        results = [None if result is None else _check_hf_response(text, result) for text, result in zip(texts, raw)]
+    except Exception as e:
+        print(f"❌ Invalid HF Space response: {e}")
+        hf_breaker.record_failure(f"invalid response: {e}")
+        return [None] * len(texts)
+    if any(result is not None for result in results):
+        hf_breaker.record_success(_time.perf_counter() - started)
+    else:
+        hf_breaker.record_failure("no usable result in bulk response")
+    return results
+
+def hf_space_status() -> dict:
+    return {"enabled": USE_HF_SPACE, "url": HF_SPACE_URL, "deadline_seconds": HF_SPACE_DEADLINE,
+            "breaker": hf_breaker.stats()}
+
+# Кеш на етикетите за често повтарящи се фрази
+parse_cache = ParseCache()
+# Изреченията по известните шаблони се етикетират без модела
+rule_parser = RuleParser(WEEKDAYS, RELATIVE, DAYTIME_HINTS)
 
 def parse_text(text: str) -> dict:
+    return parse_texts([text])[0]
+
+def _cached_result(text: str, now: datetime) -> Optional[dict]:
+    cached = parse_cache.get(text)
+    if cached is None:
+        return None
+    tokens, labels = cached
+    result = _build_result(tokens, labels, now)
+    result["debug"]["cache"] = "hit"
+    return result
+
+def _rule_result(text: str, now: datetime) -> Optional[dict]:
+    words = text.split()
+    labels = rule_parser.label(words)
+    if labels is None:
+        return None
+    result = _build_result(words, labels, now)
+    result["debug"]["engine"] = "rules"
+    return result
+
+def parse_texts(texts: list[str], lookup_cache: bool = True, backend: Optional[str] = None) -> list[dict]:
+    """Парсира списък от текстове; backend е политика ("fastest", "cheapest") или име на backend."""
+    results = [None] * len(texts)
+    pending = []
+    now = datetime.now()
+
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            results[i] = {"title": "", "datetime": None, "tokens": [], "labels": [], "debug": {"note": "empty text"}}
+            continue
+
+        if lookup_cache:
+            results[i] = _cached_result(text, now) or _rule_result(text, now)
+            if results[i] is not None:
+                continue
+        pending.append(i)
+
+    if pending:
+        # Локалният модел обработва всички pending текстове на batch-ове
+        for i, result in zip(pending, parser_registry.parse_batch([texts[i] for i in pending], backend)):
+            results[i] = result
+    return results
+
+def _cache_labels(text: str, result: Optional[dict]) -> Optional[dict]:
+    if result is not None:
+        parse_cache.put(text, result.get("tokens") or [], result.get("labels") or [])
+    return result
+
+def _parse_space_batch(texts: list[str]) -> list[Optional[dict]]:
+    if len(texts) == 1:
+        return [_cache_labels(texts[0], query_hf_space(texts[0]))]
+    return [_cache_labels(text, result) for text, result in zip(texts, query_hf_space_batch(texts))]
+
+async def _parse_space_async(text: str) -> Optional[dict]:
+    return _cache_labels(text, await query_hf_space_async(text))
+
+def _parse_local_batch(texts: list[str]) -> list[Optional[dict]]:
+    if not ensure_model_loaded():
+        return [None] * len(texts)
+    return [_cache_labels(text, result) for text, result in zip(texts, parse_with_local_model_batch(texts))]
+
+def _space_available() -> bool:
+    return USE_HF_SPACE and ML_AVAILABLE and hf_breaker.state != OPEN
+
+# Конкурентните заявки към локалния модел се обединяват в общи forward pass-ове.
+# Кешът и шаблоните се проверяват преди registry-то, затова batcher-ът не ги проверява повторно.
+parse_batcher = MicroBatcher(_parse_local_batch)
+
+async def parse_text_async(text: str, backend: Optional[str] = None) -> dict:
+    """Async вариант на parse_text за FastAPI: HF Space през async клиента,
+    локалният модел през micro-batcher-а."""
     if not text or not text.strip():
-        return {"title": "", "datetime": None, "tokens": [], "labels": [], "debug": {"note": "empty text"}}
-    
-    # Try HF Space API first if enabled
-    if USE_HF_SPACE and ML_AVAILABLE:
-        print("🚀 Using Hugging Face Space for parsing")
-        hf_result = query_hf_space(text)
-        if hf_result:
-            return hf_result
-        else:
-            print("⚠️ HF Space failed, falling back to local processing")
-    
-    # Local ML model processing (if available)
-    if not USE_HF_SPACE and ML_AVAILABLE and model is not None and tokenizer is not None:
-        return parse_with_local_model(text)
-    
-    # Fallback parsing
-    print("⚠️ Using simple fallback parsing")
-    return parse_fallback(text)
+        return parse_text(text)
+
+    now = datetime.now()
+    quick = _cached_result(text, now) or _rule_result(text, now)
+    if quick is not None:
+        return quick
+    return await parser_registry.parse_async(text, backend)
+
+def _collect_events(segments: list[Segment], results: list[dict]) -> dict:
+    """Събития с източник (span в оригиналния текст); сегментите без дата/час отиват в "unparsed"."""
+    events, unparsed, seen = [], [], set()
+    for segment, result in zip(segments, results):
+        start = result.get("datetime") or result.get("start")
+        if not start:
+            unparsed.append({"span": [segment.start, segment.end], "text": segment.text})
+            continue
+        # Припокриващите се прозорци могат да намерят едно и също събитие два пъти
+        key = (result.get("title"), str(start))
+        if key in seen:
+            continue
+        seen.add(key)
+        events.append({**result, "span": [segment.start, segment.end], "text": segment.text})
+    return {"events": events, "segments": len(segments), "unparsed": unparsed}
+
+def parse_events(text: str) -> dict:
+    """Извлича всички събития от дълъг текст (напр. график за седмицата) - сегментите минават като един batch."""
+    segments = split_segments(text or "")
+    return _collect_events(segments, parse_texts([segment.text for segment in segments]))
+
+async def parse_events_async(text: str) -> dict:
+    """Async вариант на parse_events; сегментите влизат заедно в micro-batcher-а."""
+    segments = split_segments(text or "")
+    results = await asyncio.gather(*(parse_text_async(segment.text) for segment in segments))
+    return _collect_events(segments, list(results))
+
+def parse_stats() -> dict:
+    return {
+        "batcher": parse_batcher.stats(),
+        "cache": parse_cache.stats(),
+        "rules": rule_parser.stats(),
+        "day_table": day_resolver.stats(),
+        "backends": parser_registry.stats(),
+        "wordpiece": word_encoder.stats() if word_encoder is not None else None,
+        "early_exit": model.stats() if hasattr(model, "exit_histogram") else None,
+    }
 
 def parse_fallback(text: str) -> dict:
     """Simple fallback parsing when ML model is not available"""
@@ -320,103 +708,104 @@ def parse_fallback(text: str) -> dict:
 
 def parse_with_local_model(text: str) -> dict:
     """Parse text using locally loaded ML model"""
-    if not model or not tokenizer:
+    return parse_with_local_model_batch([text])[0]
+
+def parse_with_local_model_batch(texts: list[str]) -> list[dict]:
+    """Parse a batch of texts with the local model, ML_BATCH_SIZE rows per forward pass"""
+    if not ensure_model_loaded():
         print("⚠️ Local model not available, using fallback")
-        return parse_fallback(text)
-        
-    now = datetime.now()
+        return [parse_fallback(text) for text in texts]
 
+    now = datetime.now()
+    results = []
+    for offset in range(0, len(texts), ML_BATCH_SIZE):
+        words_batch = [text.split() for text in texts[offset:offset + ML_BATCH_SIZE]]
+        # Празните редове не минават през модела
+        non_empty = [words for words in words_batch if words]
+        predicted = iter(_predict_labels_batch(non_empty) if non_empty else [])
+        for words in words_batch:
+            labels = next(predicted) if words else []
+            results.append(_build_result(words, labels, now))
+    return results
+
+def parse_with_dateparser(text: str) -> Optional[dict]:
+    """backend/nlp_parser.py (dateparser) в същия формат като parse_fallback.
+
+    Без намерена дата връща None, за да мине registry-то към regex backend-а."""
+    from backend.nlp_parser import parse_event_text
+
+    title, start_dt = parse_event_text(text)
+    if start_dt is None:
+        return None
     words = text.split()
-    encoding = tokenizer(words, is_split_into_words=True, return_tensors="pt", truncation=True, padding=True)
+    return {
+        "title": title or text.strip(),
+        "datetime": start_dt,
+        "start": start_dt,
+        "end_datetime": None,
+        "tokens": words,
+        "labels": ["O"] * len(words),
+        "debug": {"note": "dateparser"}
+    }
 
-    with torch.no_grad():
-        outputs = model(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"])
-    logits = outputs.logits
-    pred_ids = torch.argmax(logits, dim=-1).squeeze().tolist()
+async def _parse_fallback_async(text: str) -> dict:
+    return parse_fallback(text)
 
-    word_ids = encoding.word_ids(batch_index=0)
-    labels = []
-    current = None
-    
-    # First pass - get model predictions
-    for idx, wid in enumerate(word_ids):
-        if wid is None:
-            continue
-        if wid != current:
-            current = wid
-            label_id = pred_ids[idx]
-            labels.append(LABELS[label_id])
-    
-    # Second pass - fix weekday labels if model missed them
-    fixed_labels = []
-    for word, label in zip(words, labels):
-        if label == "O" and word.lower() in WEEKDAYS:
-            # If it's a weekday but was labeled as Other, fix it
-            fixed_labels.append("B-WHEN_DAY")
-        else:
-            fixed_labels.append(label)
-    
-    labels = fixed_labels
+# Backend-ите за парсиране; USE_HF_SPACE/ENABLE_ML_MODEL определят кои са налични,
+# а PARSER_POLICY (или "backend" в заявката) - кой от наличните се ползва.
+# Цената е относителна: CPU време на този процес + отдалечени извиквания.
+_DATEPARSER_INSTALLED = importlib.util.find_spec("dateparser") is not None
+parser_registry = ParserRegistry()
+parser_registry.register(ParserBackend(
+    "space", _parse_space_batch, _parse_space_async, available=_space_available, cost=1.0,
+))
+parser_registry.register(ParserBackend(
+    "local", _parse_local_batch, parse_batcher.submit, available=_local_model_enabled, cost=2.0,
+))
+parser_registry.register(ParserBackend(
+    "dateparser", lambda texts: [parse_with_dateparser(text) for text in texts],
+    available=lambda: _DATEPARSER_INSTALLED, cost=0.5, fallback=True,
+))
+parser_registry.register(ParserBackend(
+    "regex", lambda texts: [parse_fallback(text) for text in texts], _parse_fallback_async, cost=0.1, fallback=True,
+))
+
+def _forward_pred_ids(encoding):
+    """Forward pass през torch модела или ONNX сесията; връща [batch, seq] масив с argmax id за всеки subword."""
+    if ML_RUNTIME == "onnx":
+        logits = model.run(["logits"], {
+            "input_ids": encoding["input_ids"].astype(np.int64),
+            "attention_mask": encoding["attention_mask"].astype(np.int64),
+        })[0]
+        return logits.argmax(axis=-1)
 
+    with torch.no_grad():
+        outputs = model(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"])
+    return torch.argmax(outputs.logits, dim=-1).numpy()
+
+def _predict_labels_batch(words_batch: list[list[str]]) -> list[list[str]]:
+    """Един forward pass за целия batch (dynamic padding до най-дългия ред)."""
+    return_tensors = "np" if ML_RUNTIME == "onnx" else "pt"
+    encoding = word_encoder.encode(words_batch, return_tensors)
+    # Етикетът на всяка дума е предсказанието за първия ѝ subword
+    return encoding.word_labels(_forward_pred_ids(encoding), LABELS)
+
+def _build_result(words: list[str], labels: list[str], now: datetime) -> dict:
+    """Сглобява заглавие и дата/час от думите и span-овете на предсказаните етикети."""
+    decoded = decode_spans(words, labels, WEEKDAYS)
+    labels = decoded.labels
     tokens = words
-    
-    # Намираме индексите на първия и последния значим токен
-    first_index = -1
-    last_index = -1
-    for i, (token, label) in enumerate(zip(tokens, labels)):
-        # Създаваме списък от думи, които са част от заглавието
-        title_words = ["клас", "колелета", "тате", "офис", "мол"]  # добавете още думи при нужда
-        
-        if (label in ["B-TITLE", "B-PERSON", "B-PLACE"] or 
-            token.lower() in title_words or 
-            (i > 0 and tokens[i-1].lower() == "с" and token not in WEEKDAYS and not token.isdigit())):
-            if first_index == -1:
-                first_index = i
-            last_index = i
-    
-    if first_index == -1:
-        # Ако не сме намерили значими токени, вземаме само B-TITLE
-        title_tokens = [t for t, lab in zip(tokens, labels) if lab == "B-TITLE"]
-        title = " ".join(title_tokens).strip()
-    else:
-        # Вземаме всички токени между първия и последния значим токен
-        title_tokens = tokens[first_index:last_index + 1]
-        
-        # Филтрираме само нежеланите свързващи думи и времеви маркери
-        filtered_tokens = []
-        for i, token in enumerate(title_tokens):
-            # Проверяваме дали думата е времеви маркер или нежелана свързваща дума
-            is_time_marker = token.lower() in ["сутринта", "вечерта", "следобед", "утре", "днес", "вдругиден"]
-            is_weekday = token in WEEKDAYS or token.lower() in WEEKDAYS
-            is_unwanted_connector = token.lower() in ["на", "от", "до"]
-            
-            if not is_time_marker and not is_weekday and not is_unwanted_connector:
-                filtered_tokens.append(token)
-        
-        title = " ".join(filtered_tokens).strip()
 
-    day_tokens = [t for t, lab in zip(tokens, labels) if lab in ("B-WHEN_DAY", "I-WHEN_DAY")]
-    
-    # Събираме всички времеви токени заедно със свързващите думи между тях
-    time_section = []
-    in_time_section = False
-    for t, lab in zip(tokens, labels):
-        if lab == "B-WHEN_START":
-            in_time_section = True
-            time_section.append(t)
-        elif in_time_section and (lab == "O" or lab == "B-WHEN_START"):
-            time_section.append(t)
-        elif in_time_section:
-            in_time_section = False
-    
-    start_tokens = time_section if time_section else []
+    title = decoded.title()
+    day_tokens = decoded.day_tokens()
+    # Времевите токени заедно със свързващите думи между тях
+    start_tokens = decoded.time_tokens()
 
-    now = datetime.now()
     the_date = _parse_day_from_tokens(day_tokens, now)
     start_time, end_time = _parse_time_from_tokens(start_tokens) if start_tokens else (None, None)
 
     if start_time is None:
-        start_time = _find_daytime_hint(tokens, labels)
+        start_time = _find_daytime_hint(day_tokens)
 
     start_dt = None
     end_dt = None
@@ -441,9 +830,7 @@ def parse_with_local_model(text: str) -> dict:
                 end_dt += timedelta(days=1)
 
     if not title:
-        non_when = [t for t, lab in zip(tokens, labels) if lab not in ("B-WHEN_DAY", "I-WHEN_DAY", "B-WHEN_START")]
-        filtered = [t for t in non_when if t.lower() not in {"на", "в", "с", "от", "до"}]
-        title = " ".join(filtered).strip()
+        title = decoded.fallback_title()
 
     return {
         "title": title,
@@ -483,10 +870,10 @@ if __name__ == "__main__":
         print("-" * 80)
 
     print("\nИнформация за модела:")
-    if ML_AVAILABLE and tokenizer and model:
-        print("Зареден от: Hugging Face Hub")
+    if ensure_model_loaded():
+        print("Зареден от:", ONNX_MODEL_DIR if ML_RUNTIME == "onnx" else "Hugging Face Hub")
         print("Размер на речника:", tokenizer.vocab_size)
-        print("Брой етикети:", model.config.num_labels)
+        print("Брой етикети:", len(LABELS))
         print("Налични етикети:", LABELS)
     else:
         print("ML модел не е зареден - използва се fallback парсер")
\ No newline at end of file
@@ -0,0 +1,79 @@
+# ml/parse_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+PARSE_CACHE_SIZE = int(os.getenv("PARSE_CACHE_SIZE", "2048"))
+PARSE_CACHE_TTL = float(os.getenv("PARSE_CACHE_TTL", "86400"))
+
+
+class ParseCache:
+    """Bounded LRU + TTL кеш: нормализиран текст -> (tokens, labels).
+
+    Пазим само етикетите от модела - те не зависят от момента на заявката.
+    Датите ("утре", "в събота", "от 19") се изчисляват наново спрямо текущото
+    време при всяко попадение, което струва микросекунди."""
+
+    def __init__(self, maxsize: int = PARSE_CACHE_SIZE, ttl_seconds: float = PARSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        # Моделът е case-sensitive, затова нормализираме само празните места
+        return " ".join(text.split())
+
+    def get(self, text: str) -> Optional[Tuple[list[str], list[str]]]:
+        if self.maxsize <= 0:
+            return None
+        key = self.normalize(text)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            tokens, labels, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return list(tokens), list(labels)
+
+    def put(self, text: str, tokens: list[str], labels: list[str]):
+        if self.maxsize <= 0 or not tokens or len(tokens) != len(labels):
+            return
+        key = self.normalize(text)
+        with self._lock:
+            self._data[key] = (tuple(tokens), tuple(labels), time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,217 @@
+# ml/parser_backends.py
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+# Политика по подразбиране: "fastest", "cheapest" или името на конкретен backend
+PARSER_POLICY = os.getenv("PARSER_POLICY", "fastest").lower()
+# Статистиката е за последните N извиквания, но не по-стари от PARSER_STATS_SECONDS,
+# така че backend с много грешки отново получава трафик, след като те остареят
+PARSER_STATS_WINDOW = int(os.getenv("PARSER_STATS_WINDOW", "200"))
+PARSER_STATS_SECONDS = float(os.getenv("PARSER_STATS_SECONDS", "300"))
+# Backend с по-голям дял грешки (при поне PARSER_MIN_SAMPLES извиквания) се пропуска
+PARSER_MAX_ERROR_RATE = float(os.getenv("PARSER_MAX_ERROR_RATE", "0.5"))
+PARSER_MIN_SAMPLES = int(os.getenv("PARSER_MIN_SAMPLES", "5"))
+
+POLICIES = ("fastest", "cheapest")
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class BackendStats:
+    """Плъзгащ се прозорец от (момент, латентност, успех) за един backend (thread-safe)."""
+
+    def __init__(self, window: int = PARSER_STATS_WINDOW, max_age: float = PARSER_STATS_SECONDS):
+        self.max_age = max_age
+        self._samples: deque = deque(maxlen=max(1, window))
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self.calls += 1
+            self.errors += not ok
+            self._samples.append((time.monotonic(), seconds, ok))
+
+    def _recent(self) -> list:
+        cutoff = time.monotonic() - self.max_age
+        while self._samples and self._samples[0][0] < cutoff:
+            self._samples.popleft()
+        return list(self._samples)
+
+    def summary(self) -> dict:
+        with self._lock:
+            recent = self._recent()
+            calls, errors = self.calls, self.errors
+        latencies = [seconds for _, seconds, ok in recent if ok]
+        return {
+            "samples": len(recent),
+            "error_rate": round(sum(not ok for _, _, ok in recent) / len(recent), 3) if recent else 0.0,
+            "p50_ms": round(_percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+            "p95_ms": round(_percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            "calls": calls,
+            "errors": errors,
+        }
+
+
+class ParserBackend:
+    """Един начин за парсиране на текст.
+
+    parse_batch получава списък от текстове и връща по един резултат за всеки
+    (None = неуспех - registry-то опитва следващия backend). parse_async е
+    async вариантът за един текст; ако липсва, parse_batch се пуска в thread.
+    fallback=True backend-ите се ползват само когато основните не са дали резултат."""
+
+    def __init__(
+        self,
+        name: str,
+        parse_batch: Callable[[list[str]], list[Optional[dict]]],
+        parse_async: Optional[Callable[[str], Awaitable[Optional[dict]]]] = None,
+        available: Optional[Callable[[], bool]] = None,
+        cost: float = 1.0,
+        fallback: bool = False,
+    ):
+        self.name = name
+        self.parse_batch = parse_batch
+        self._parse_async = parse_async
+        self._available = available
+        self.cost = cost
+        self.fallback = fallback
+        self.stats = BackendStats()
+
+    def available(self) -> bool:
+        return self._available() if self._available is not None else True
+
+    async def parse_async(self, text: str) -> Optional[dict]:
+        if self._parse_async is not None:
+            return await self._parse_async(text)
+        return (await asyncio.to_thread(self.parse_batch, [text]))[0]
+
+
+class ParserRegistry:
+    """Регистър на backend-ите за парсиране и избор между тях по политика.
+
+    fastest  - здравият основен backend с най-ниска p50 латентност; докато някой
+               от групата няма данни, групата се подрежда по цена
+    cheapest - здравият основен backend с най-ниска цена
+    <име>    - точно този backend
+
+    След избрания се пробват останалите по реда на политиката, накрая fallback-ите."""
+
+    def __init__(
+        self,
+        policy: str = PARSER_POLICY,
+        max_error_rate: float = PARSER_MAX_ERROR_RATE,
+        min_samples: int = PARSER_MIN_SAMPLES,
+    ):
+        self.policy = policy
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.backends: dict[str, ParserBackend] = {}
+
+    def register(self, backend: ParserBackend) -> ParserBackend:
+        self.backends[backend.name] = backend
+        return backend
+
+    def accepts(self, policy: str) -> bool:
+        return policy.lower() in POLICIES or policy.lower() in self.backends
+
+    def healthy(self, backend: ParserBackend) -> bool:
+        if not backend.available():
+            return False
+        summary = backend.stats.summary()
+        return summary["samples"] < self.min_samples or summary["error_rate"] <= self.max_error_rate
+
+    def order(self, policy: Optional[str] = None) -> list[ParserBackend]:
+        """Backend-ите в реда, в който ще бъдат пробвани."""
+        policy = (policy or self.policy).lower()
+        if not self.accepts(policy):
+            raise ValueError(f"Unknown parser backend or policy: {policy}")
+
+        def ranked(backends) -> list[ParserBackend]:
+            backends = list(backends)
+            p50 = {backend.name: backend.stats.summary()["p50_ms"] for backend in backends}
+            # По p50 само когато всички в групата имат данни - иначе по цена, за да не
+            # се разменя редът според това кой backend случайно вече е бил извикан
+            if policy == "cheapest" or any(value is None for value in p50.values()):
+                return sorted(backends, key=lambda b: (b.cost, p50[b.name] or 0.0))
+            return sorted(backends, key=lambda b: (p50[b.name], b.cost))
+
+        primary = ranked(b for b in self.backends.values() if not b.fallback and self.healthy(b))
+        # Fallback-ите не се изключват заради грешки - последният от тях трябва винаги да отговори
+        fallbacks = ranked(b for b in self.backends.values() if b.fallback and b.available())
+        if policy in self.backends:
+            chosen = self.backends[policy]
+            rest = fallbacks if chosen.fallback else [b for b in primary if b is not chosen] + fallbacks
+            return ([chosen] if chosen.available() else []) + [b for b in rest if b is not chosen]
+        return primary + fallbacks
+
+    def _accept(self, backend: ParserBackend, result: Optional[dict], seconds: float) -> Optional[dict]:
+        backend.stats.record(seconds, result is not None)
+        if result is None:
+            return None
+        result["debug"] = {**(result.get("debug") or {}), "backend": backend.name}
+        return result
+
+    def parse_batch(self, texts: list[str], policy: Optional[str] = None) -> list[dict]:
+        results: list[Optional[dict]] = [None] * len(texts)
+        pending = list(range(len(texts)))
+        for backend in self.order(policy):
+            if not pending:
+                break
+            started = time.perf_counter()
+            try:
+                batch = backend.parse_batch([texts[i] for i in pending])
+            except Exception as e:
+                print(f"❌ Parser backend {backend.name} failed: {e}")
+                batch = [None] * len(pending)
+            per_text = (time.perf_counter() - started) / len(pending)
+
+            failed = []
+            for i, result in zip(pending, batch):
+                results[i] = self._accept(backend, result, per_text)
+                if results[i] is None:
+                    failed.append(i)
+            if failed:
+                print(f"⚠️ Parser backend {backend.name} failed for {len(failed)} text(s), trying the next one")
+            pending = failed
+        if pending:
+            raise RuntimeError("No parser backend produced a result")
+        return results
+
+    async def parse_async(self, text: str, policy: Optional[str] = None) -> dict:
+        for backend in self.order(policy):
+            started = time.perf_counter()
+            try:
+                result = await backend.parse_async(text)
+            except Exception as e:
+                print(f"❌ Parser backend {backend.name} failed: {e}")
+                result = None
+            result = self._accept(backend, result, time.perf_counter() - started)
+            if result is not None:
+                return result
+            print(f"⚠️ Parser backend {backend.name} failed, trying the next one")
+        raise RuntimeError("No parser backend produced a result")
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "order": [backend.name for backend in self.order()],
+            "backends": {
+                name: {
+                    "cost": backend.cost,
+                    "fallback": backend.fallback,
+                    "available": backend.available(),
+                    "healthy": self.healthy(backend),
+                    **backend.stats.summary(),
+                }
+                for name, backend in self.backends.items()
+            },
+        }
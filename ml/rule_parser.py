@@ -0,0 +1,128 @@
+# ml/rule_parser.py
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+# Изключва бързия път (всичко минава през модела), напр. при сравнение на точността
+PARSE_RULES_ENABLED = os.getenv("PARSE_RULES_ENABLED", "true").lower() == "true"
+
+# Всеки токен се свежда до един символ от "сигнатурата" на изречението:
+#   D - ден от седмицата / относителна дума   N - дата като "20ти"
+#   H - час (18, 14:45, 18ч)                  P - част от деня ("сутринта")
+#   o/d/v/n/s - "от", "до", "в", "на", "с"    T - всяка друга дума (заглавие, човек, място)
+# Неразпознати токени (числа извън диапазона, препинателни знаци) дават "?" и никой шаблон не ги приема.
+_CONNECTORS = {"от": "o", "до": "d", "в": "v", "на": "n", "с": "s"}
+_TIME_RE = re.compile(r"^(\d{1,2})(?:[:\.](\d{1,2}))?(?:ч\.?|часа)?$")
+_ORDINAL_RE = re.compile(r"^(\d{1,2})-?(?:ви|ри|ти|ми)\.?$")
+_WORD_RE = re.compile(r"^[^\W\d_]+(?:-[^\W\d_]+)*$")
+
+# Шаблоните от ml/generate_synthetic.py (+ "<title> утре сутринта"). Именуваните групи
+# получават етикета си от slots: "B-X" се слага на всеки токен в групата, "X" - като B-X, I-X, ...
+# Токените извън именуваните групи получават "O".
+TEMPLATES = [
+    ("title_from_time_day_with_person", r"(?P<title>T+)o(?P<start>H)(?P<day>D)s(?P<person>T)"),
+    ("title_from_time_day_at_place", r"(?P<title>T+)o(?P<start>H)(?P<day>D)v(?P<place>T)"),
+    ("on_day_from_time_title_with_person", r"(?P<day>vD)o(?P<start>H)(?P<title>T+)s(?P<person>T)"),
+    ("on_date_from_time_title", r"n(?P<day>N)o(?P<start>H)(?P<title>T+)"),
+    ("title_day_daytime", r"(?P<title>T+)(?P<day>DP)"),
+]
+SLOTS = {
+    "title": "B-TITLE",
+    "start": "B-WHEN_START",
+    "day": "WHEN_DAY",
+    "person": "B-PERSON",
+    "place": "B-PLACE",
+}
+
+
+class RuleParser:
+    """Детерминиран етикетировач за изреченията, които следват известните шаблони.
+
+    Връща етикети само когато точно един шаблон покрива всички токени - всичко
+    останало (непознати думи, двусмислени числа, друг словоред) отива към модела."""
+
+    def __init__(self, weekdays: dict, relative: dict, daytime_hints: dict, enabled: bool = PARSE_RULES_ENABLED):
+        self.enabled = enabled
+        self.weekdays = {w.lower() for w in weekdays}
+        self.relative = {w.lower() for w in relative}
+        self.daytime_hints = {w.lower() for w in daytime_hints}
+        self.templates = [(name, re.compile(pattern)) for name, pattern in TEMPLATES]
+        self._lock = threading.Lock()
+
+        # Метрики
+        self.attempts = 0
+        self.hits = 0
+        self.ambiguous = 0
+        self.total_seconds = 0.0
+        self.template_hits = {name: 0 for name, _ in TEMPLATES}
+
+    def _token_class(self, token: str) -> str:
+        low = token.lower()
+        if low in _CONNECTORS:
+            return _CONNECTORS[low]
+        if low in self.weekdays or low in self.relative:
+            return "D"
+        if low in self.daytime_hints:
+            return "P"
+        m = _TIME_RE.match(low)
+        if m:
+            hour, minute = int(m.group(1)), int(m.group(2) or 0)
+            return "H" if hour <= 23 and minute <= 59 else "?"
+        m = _ORDINAL_RE.match(low)
+        if m:
+            return "N" if 1 <= int(m.group(1)) <= 31 else "?"
+        return "T" if _WORD_RE.match(token) else "?"
+
+    def signature(self, tokens: list[str]) -> str:
+        return "".join(self._token_class(t) for t in tokens)
+
+    def _labels_for(self, match: re.Match, n_tokens: int) -> list[str]:
+        labels = ["O"] * n_tokens
+        for slot, label in SLOTS.items():
+            if slot not in match.groupdict() or match.group(slot) is None:
+                continue
+            start, end = match.span(slot)
+            for i in range(start, end):
+                if label.startswith("B-"):
+                    labels[i] = label
+                else:
+                    labels[i] = ("B-" if i == start else "I-") + label
+        return labels
+
+    def label(self, tokens: list[str]) -> Optional[list[str]]:
+        """Етикети за tokens или None, ако шаблоните не ги покриват еднозначно."""
+        if not self.enabled or not tokens:
+            return None
+        started = time.perf_counter()
+        sig = self.signature(tokens)
+        candidates = {}
+        for name, pattern in self.templates:
+            match = pattern.fullmatch(sig)
+            if match:
+                candidates.setdefault(tuple(self._labels_for(match, len(tokens))), name)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self.attempts += 1
+            self.total_seconds += elapsed
+            if len(candidates) > 1:
+                self.ambiguous += 1
+            if len(candidates) != 1:
+                return None
+            (labels, name), = candidates.items()
+            self.hits += 1
+            self.template_hits[name] += 1
+        return list(labels)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "ambiguous": self.ambiguous,
+            "bypass_rate": round(self.hits / self.attempts, 4) if self.attempts else 0.0,
+            "avg_rule_ms": round(1000 * self.total_seconds / self.attempts, 4) if self.attempts else 0.0,
+            "templates": dict(self.template_hits),
+        }
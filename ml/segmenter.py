@@ -0,0 +1,59 @@
+# ml/segmenter.py
+import os
+import re
+from typing import NamedTuple
+
+# Сегмент с повече думи се реже на припокриващи се прозорци (моделът е учен на кратки изречения)
+ML_SEGMENT_MAX_WORDS = int(os.getenv("ML_SEGMENT_MAX_WORDS", "48"))
+ML_SEGMENT_OVERLAP_WORDS = int(os.getenv("ML_SEGMENT_OVERLAP_WORDS", "8"))
+
+# Край на изречение: нов ред, ";" или . ! ? последвани от интервал и главна буква/цифра.
+# "14.45", "20. от 21" и "събота. вечер" не се разделят.
+_BOUNDARY_RE = re.compile(r"\n+|;\s*|(?<=[.!?])\s+(?=[^\W_a-zа-я])")
+_WORD_RE = re.compile(r"\S+")
+_TRAILING_PUNCT = ".!?"
+
+
+class Segment(NamedTuple):
+    start: int  # offset на първия символ в оригиналния текст
+    end: int    # offset след последния символ
+    text: str
+
+
+def _segment(text: str, offset: int, start: int, end: int) -> Segment:
+    # Точката в края на изречението не е част от последната дума ("Иван." -> "Иван")
+    while end - start > 1 and text[end - 1] in _TRAILING_PUNCT:
+        end -= 1
+    return Segment(offset + start, offset + end, text[start:end])
+
+
+def _windows(text: str, offset: int, max_words: int, overlap: int) -> list[Segment]:
+    words = list(_WORD_RE.finditer(text))
+    if len(words) <= max_words:
+        return [_segment(text, offset, words[0].start(), words[-1].end())]
+    step = max(1, max_words - overlap)
+    segments = []
+    for first in range(0, len(words), step):
+        chunk = words[first:first + max_words]
+        segments.append(_segment(text, offset, chunk[0].start(), chunk[-1].end()))
+        if first + max_words >= len(words):
+            break
+    return segments
+
+
+def split_segments(
+    text: str,
+    max_words: int = ML_SEGMENT_MAX_WORDS,
+    overlap: int = ML_SEGMENT_OVERLAP_WORDS,
+) -> list[Segment]:
+    """Разделя дълъг текст на изречения/редове; твърде дългите - на прозорци от думи."""
+    segments = []
+    position = 0
+    for boundary in list(_BOUNDARY_RE.finditer(text)) + [None]:
+        end = boundary.start() if boundary else len(text)
+        piece = text[position:end]
+        if piece.strip():
+            segments.extend(_windows(piece, position, max_words, overlap))
+        if boundary:
+            position = boundary.end()
+    return segments
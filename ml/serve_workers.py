@@ -0,0 +1,118 @@
+# ml/serve_workers.py
+"""
+Pre-fork сървър за ml/backend_api.py: теглата на модела се зареждат веднъж в
+родителския процес и N worker-а ги наследяват при fork (copy-on-write), вместо
+всеки uvicorn worker да държи свое копие на mBERT.
+
+    python -m ml.serve_workers --workers 4 --port 8000
+
+Всеки worker ограничава torch до --threads-per-worker нишки (по подразбиране
+ядрата / workers) и загрява модела след fork. Само за Linux/macOS и ML_RUNTIME=torch -
+ONNX Runtime сесия не може да се споделя през fork.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+os.environ.setdefault("USE_HF_SPACE", "false")
+os.environ.setdefault("ML_EAGER_LOAD", "false")
+
+# Ако worker умре, не го рестартираме по-често от веднъж на толкова секунди
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def _run_worker(sock: socket.socket, threads: int):
+    import torch
+    import uvicorn
+    from ml import nlp_parser_ml as parser
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # вече е зададено в този процес
+    parser.warm_up_model()
+
+    from ml.backend_api import app
+    config = uvicorn.Config(app, log_level="warning", timeout_keep_alive=30)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def _spawn(sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            _run_worker(sock, threads)
+        finally:
+            os._exit(0)
+    return pid
+
+def serve(host: str, port: int, workers: int, threads_per_worker: int):
+    from ml import nlp_parser_ml as parser
+
+    if parser.ML_RUNTIME != "torch":
+        sys.exit("❌ serve_workers поддържа само ML_RUNTIME=torch")
+    started = time.perf_counter()
+    if not parser.ensure_model_loaded(warmup=False):
+        sys.exit("❌ Моделът не можа да се зареди")
+    print(f"📦 Model loaded once in {time.perf_counter() - started:.1f}s, forking {workers} workers "
+          f"x {threads_per_worker} threads")
+
+    # Обектите от зареждането не се сканират от GC в worker-ите - иначе GC пише
+    # в страниците им и copy-on-write ги копира във всеки процес
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    children = {_spawn(sock, threads_per_worker) for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"🚀 Serving ml.backend_api on http://{host}:{port} (parent pid {os.getpid()})")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited with status {status}, respawning")
+            time.sleep(RESPAWN_BACKOFF_SECONDS)
+            children.add(_spawn(sock, threads_per_worker))
+    sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-fork inference workers sharing one copy of the model weights")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads-per-worker", type=int, default=0, help="torch threads per worker (0 = cores / workers)")
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    serve(args.host, args.port, args.workers, threads)
@@ -0,0 +1,75 @@
+# ml/test_onnx_parity.py
+"""
+Проверява, че ML_RUNTIME=onnx (ml/export_onnx.py) дава същите етикети и заглавия
+като torch модела върху ml/data/test.jsonl - през parse_with_local_model_batch,
+т.е. заедно със зареждането на сесията, входовете и декодирането на етикетите.
+
+ML_RUNTIME се чете при import на ml.nlp_parser_ml, затова всеки runtime се
+пуска в отделен процес (както в ml/benchmark_parser.py).
+
+    python -m ml.test_onnx_parity
+"""
+import json
+import os
+import subprocess
+import sys
+
+from ml.bench_utils import load_jsonl
+
+MODEL_NAME = os.getenv("PARITY_TORCH_MODEL", "dex7er999/NLPCalendar")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "ml/model_onnx")
+TEST_DATA_PATH = "ml/data/test.jsonl"
+RUNTIME_ENV = {
+    "torch": {"ML_RUNTIME": "torch", "ML_MODEL_NAME": MODEL_NAME, "ML_EARLY_EXIT_THRESHOLD": "0"},
+    "onnx": {"ML_RUNTIME": "onnx", "ONNX_MODEL_DIR": ONNX_MODEL_DIR},
+}
+
+def _child_run(runtime: str) -> list[dict]:
+    from ml import nlp_parser_ml as parser
+
+    if not parser.ensure_model_loaded(warmup=False):
+        raise RuntimeError(parser.model_status().get("error") or f"{runtime} model failed to load")
+    texts = [" ".join(ex["tokens"]) for ex in load_jsonl(TEST_DATA_PATH)]
+    return [{"labels": result["labels"], "title": result["title"]} for result in parser.parse_with_local_model_batch(texts)]
+
+def parse_with_runtime(runtime: str) -> list[dict]:
+    env = dict(os.environ, ENABLE_ML_MODEL="true", USE_HF_SPACE="false", ML_EAGER_LOAD="false",
+               ML_QUANTIZE="", **RUNTIME_ENV[runtime])
+    proc = subprocess.run([sys.executable, "-m", "ml.test_onnx_parity", "_child", runtime],
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{runtime} run failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def test_onnx_matches_torch():
+    import pytest
+
+    for module in ("onnxruntime", "torch", "transformers"):
+        pytest.importorskip(module)
+    if not os.path.exists(os.path.join(ONNX_MODEL_DIR, "model.onnx")):
+        pytest.skip(f"No ONNX model in {ONNX_MODEL_DIR} - run python -m ml.export_onnx first")
+    assert_parity()
+
+def assert_parity():
+    texts = [" ".join(ex["tokens"]) for ex in load_jsonl(TEST_DATA_PATH)]
+    expected, actual = parse_with_runtime("torch"), parse_with_runtime("onnx")
+    mismatches = [(text, e, a) for text, e, a in zip(texts, expected, actual) if e != a]
+
+    print(f"🧪 Compared {len(texts)} examples, mismatches: {len(mismatches)}")
+    for text, e, a in mismatches:
+        print(f"   ❌ {text}")
+        print(f"      torch: {e}")
+        print(f"      onnx:  {a}")
+    assert len(expected) == len(actual) == len(texts)
+    assert not mismatches, f"{len(mismatches)} examples differ between torch and ONNX"
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "_child":
+        print(json.dumps(_child_run(sys.argv[2]), ensure_ascii=False))
+        sys.exit(0)
+    try:
+        assert_parity()
+    except AssertionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("✅ ONNX labels match torch on the test set")
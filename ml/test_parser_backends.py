@@ -0,0 +1,85 @@
+# ml/test_parser_backends.py
+"""
+Редът и fallback веригата на ml/parser_backends.ParserRegistry (без модел и мрежа).
+
+    python -m pytest ml/test_parser_backends.py
+"""
+from ml.parser_backends import ParserBackend, ParserRegistry
+
+
+def _backend(name: str, cost: float, fallback: bool = False, result=None) -> ParserBackend:
+    return ParserBackend(name, lambda texts: [result(text) if result else {"title": text} for text in texts],
+                         cost=cost, fallback=fallback)
+
+
+def _names(registry: ParserRegistry, policy: str = "fastest") -> list[str]:
+    return [backend.name for backend in registry.order(policy)]
+
+
+def test_untried_backends_rank_by_cost():
+    registry = ParserRegistry()
+    registry.register(_backend("local", cost=2.0))
+    registry.register(_backend("space", cost=1.0))
+    registry.register(_backend("dateparser", cost=0.5, fallback=True))
+    registry.register(_backend("regex", cost=0.1, fallback=True))
+    assert _names(registry) == ["space", "local", "regex", "dateparser"]
+
+
+def test_fallback_order_does_not_depend_on_which_has_samples():
+    registry = ParserRegistry()
+    dateparser = registry.register(_backend("dateparser", cost=0.5, fallback=True))
+    regex = registry.register(_backend("regex", cost=0.1, fallback=True))
+    assert _names(registry) == ["regex", "dateparser"]
+    dateparser.stats.record(0.002, True)
+    assert _names(registry) == ["regex", "dateparser"]
+    regex.stats.record(0.004, True)
+    # Едва когато и двата имат данни, решава p50
+    assert _names(registry) == ["dateparser", "regex"]
+
+
+def test_measured_backends_rank_by_p50():
+    registry = ParserRegistry()
+    local = registry.register(_backend("local", cost=2.0))
+    space = registry.register(_backend("space", cost=1.0))
+    for _ in range(5):
+        local.stats.record(0.01, True)
+        space.stats.record(0.2, True)
+    assert _names(registry) == ["local", "space"]
+    assert _names(registry, "cheapest") == ["space", "local"]
+
+
+def test_fallback_chain_skips_backend_without_result():
+    registry = ParserRegistry()
+    registry.register(_backend("dateparser", cost=0.1, fallback=True, result=lambda text: None))
+    registry.register(_backend("regex", cost=0.5, fallback=True, result=lambda text: {"title": text, "start": None}))
+    [result] = registry.parse_batch(["Бележка без дата"])
+    assert result["title"] == "Бележка без дата"
+    assert result["debug"]["backend"] == "regex"
+
+
+def test_dateparser_without_date_falls_through():
+    import pytest
+
+    pytest.importorskip("dateparser")
+    from ml.nlp_parser_ml import parse_with_dateparser
+
+    assert parse_with_dateparser("Бележка без дата") is None
+
+
+def test_hf_breaker_counts_unusable_response_as_failure(monkeypatch):
+    from ml import nlp_parser_ml
+    from ml.circuit_breaker import CircuitBreaker
+
+    breaker = CircuitBreaker(failure_threshold=2)
+    monkeypatch.setattr(nlp_parser_ml, "hf_breaker", breaker)
+    monkeypatch.setattr(nlp_parser_ml, "_post_hf_space", lambda text: {"error": "cold start"})
+    assert nlp_parser_ml.query_hf_space("Среща утре") is None
+    monkeypatch.setattr(nlp_parser_ml, "_post_hf_space", lambda text: ["not", "a", "dict"])
+    assert nlp_parser_ml.query_hf_space("Среща утре") is None
+    assert (breaker.successes, breaker.failures, breaker.state) == (0, 2, "open")
+
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(nlp_parser_ml, "hf_breaker", breaker)
+    monkeypatch.setattr(nlp_parser_ml, "_post_hf_space", lambda text: {"title": "Среща", "start": "2030-01-01T10:00:00"})
+    assert nlp_parser_ml.query_hf_space("Среща утре")["datetime"] == "2030-01-01T10:00:00"
+    assert (breaker.successes, breaker.failures) == (1, 0)
@@ -0,0 +1,112 @@
+# ml/train_early_exit.py
+"""
+Разширение на ml/train_token_classification.py: тренира класификационни глави
+върху междинните слоеве на вече обучения модел (backbone-ът е замразен), за
+early-exit inference (ml/early_exit.py).
+
+    python -m ml.train_early_exit --model dex7er999/NLPCalendar --layers 2 4 6 8 10
+
+Всяка глава учи от златните етикети и от меките етикети на последния слой, за
+да спира с предсказанията, които би дал пълният модел. Накрая за няколко прага
+се отпечатват точността на dev и средният брой изпълнени слоеве. Сървърът
+ползва главите с
+
+    ML_EARLY_EXIT_THRESHOLD=0.95 ML_EARLY_EXIT_HEADS=ml/model_early_exit/heads.pt
+"""
+import argparse
+import random
+from pathlib import Path
+
+import torch
+import torch.nn.functional as F
+from transformers import BertTokenizerFast, BertForTokenClassification
+
+from ml.bench_utils import load_jsonl
+from ml.early_exit import EarlyExitClassifier, EarlyExitHeads
+
+# --- Настройки ---
+MODEL_NAME = "dex7er999/NLPCalendar"
+DATA_DIR = Path("ml/data")
+OUTPUT_PATH = Path("ml/model_early_exit/heads.pt")
+BATCH_SIZE = 16
+EPOCHS = 5
+LEARNING_RATE = 1e-3
+MAX_LENGTH = 64
+TEMPERATURE = 2.0
+THRESHOLDS = [0.8, 0.9, 0.95, 0.99]
+
+def encode(tokenizer, examples, label2id):
+    encoding = tokenizer([ex["tokens"] for ex in examples], is_split_into_words=True, truncation=True,
+                         padding=True, max_length=MAX_LENGTH, return_tensors="pt")
+    labels = []
+    for i, ex in enumerate(examples):
+        labels.append([-100 if wid is None else label2id[ex["labels"][wid]]
+                       for wid in encoding.word_ids(batch_index=i)])
+    return encoding, torch.tensor(labels)
+
+def train_heads(model, heads, tokenizer, train_data, label2id, epochs, seed):
+    optimizer = torch.optim.AdamW(heads.parameters(), lr=LEARNING_RATE)
+    rng = random.Random(seed)
+    heads.train()
+    for epoch in range(epochs):
+        rng.shuffle(train_data)
+        total = 0.0
+        for offset in range(0, len(train_data), BATCH_SIZE):
+            encoding, labels = encode(tokenizer, train_data[offset:offset + BATCH_SIZE], label2id)
+            with torch.no_grad():
+                outputs = model(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"],
+                                output_hidden_states=True)
+            mask = labels != -100
+            teacher = F.softmax(outputs.logits[mask] / TEMPERATURE, dim=-1)
+
+            loss = 0.0
+            for layer in heads.layers:
+                # hidden_states[0] е изходът на embeddings, hidden_states[i] - на слой i
+                logits = heads(layer, outputs.hidden_states[layer])[mask]
+                loss = loss + F.cross_entropy(logits, labels[mask])
+                loss = loss + F.kl_div(F.log_softmax(logits / TEMPERATURE, dim=-1), teacher,
+                                       reduction="batchmean") * TEMPERATURE ** 2
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item()
+        print(f"📉 Epoch {epoch + 1}/{epochs}: loss {total:.3f}")
+    heads.eval()
+
+def evaluate_thresholds(model, heads, tokenizer, dev_data, label2id):
+    encoding, labels = encode(tokenizer, dev_data, label2id)
+    mask = labels != -100
+    special = {tokenizer.cls_token_id, tokenizer.sep_token_id, tokenizer.pad_token_id}
+    for threshold in THRESHOLDS:
+        wrapped = EarlyExitClassifier(model, heads, threshold, special).eval()
+        with torch.no_grad():
+            pred = wrapped(input_ids=encoding["input_ids"], attention_mask=encoding["attention_mask"]).logits.argmax(-1)
+        accuracy = (pred[mask] == labels[mask]).float().mean().item()
+        stats = wrapped.stats()
+        print(f"🎯 threshold {threshold}: token accuracy {accuracy:.4f}, avg layers {stats['avg_layers']}, "
+              f"speed-up x{stats['layer_speedup']}, exits {stats['exit_histogram']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train early-exit heads on a frozen token classifier")
+    parser.add_argument("--model", default=MODEL_NAME, help="Hub name or local directory")
+    parser.add_argument("--layers", nargs="+", type=int, default=[2, 4, 6, 8, 10])
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    tokenizer = BertTokenizerFast.from_pretrained(args.model)
+    model = BertForTokenClassification.from_pretrained(args.model)
+    model.eval()
+    for param in model.parameters():
+        param.requires_grad = False
+    label2id = {label: int(i) for label, i in model.config.label2id.items()}
+
+    layers = [layer for layer in args.layers if 0 < layer < model.config.num_hidden_layers]
+    heads = EarlyExitHeads(layers, model.config.hidden_size, model.config.num_labels)
+    train_heads(model, heads, tokenizer, load_jsonl(DATA_DIR / "train.jsonl"), label2id, args.epochs, args.seed)
+    evaluate_thresholds(model, heads, tokenizer, load_jsonl(DATA_DIR / "dev.jsonl"), label2id)
+
+    heads.save(str(args.output), args.model)
+    print(f"💾 Saved early-exit heads to {args.output}")
@@ -0,0 +1,137 @@
+# ml/word_encoder.py
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+WORDPIECE_CACHE_SIZE = int(os.getenv("WORDPIECE_CACHE_SIZE", "50000"))
+
+
+class CachedEncoding:
+    """Минималният интерфейс на BatchEncoding, който ползва _predict_labels_batch:
+    encoding["input_ids"], encoding["attention_mask"] и encoding.word_ids(batch_index),
+    плюс first_subword_mask - True на първия subword на всяка дума."""
+
+    def __init__(self, data: dict, word_ids: list[list[Optional[int]]], first_subword_mask):
+        self._data = data
+        self._word_ids = word_ids
+        self.first_subword_mask = first_subword_mask
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def keys(self):
+        return self._data.keys()
+
+    def word_ids(self, batch_index: int = 0) -> list[Optional[int]]:
+        return self._word_ids[batch_index]
+
+    def word_labels(self, pred_ids, labels: list[str]) -> list[list[str]]:
+        """Етикетът на всяка дума е предсказанието за първия ѝ subword.
+
+        pred_ids е [batch, seq] масив с argmax id-тата; събираме ги с една маска
+        за целия batch вместо да обхождаме word_ids ред по ред."""
+        import numpy as np
+
+        mask = self.first_subword_mask
+        flat = np.asarray(labels, dtype=object)[np.asarray(pred_ids)[mask]]
+        return [row.tolist() for row in np.split(flat, np.cumsum(mask.sum(axis=1))[:-1])]
+
+
+class WordPieceCache:
+    """Bounded LRU кеш: дума -> subword id-та на BertTokenizerFast.
+
+    BERT токенизира всяка предварително разделена дума независимо от съседите ѝ,
+    затова id-тата на изречението са [CLS] + парчетата на думите + [SEP] - същото,
+    което връща tokenizer(words, is_split_into_words=True, truncation=True, padding=True).
+    WordPiece се пуска само за думи, които не са в кеша, с едно извикване за целия batch."""
+
+    def __init__(self, tokenizer, maxsize: int = WORDPIECE_CACHE_SIZE):
+        self.tokenizer = tokenizer
+        self.maxsize = maxsize
+        self.max_length = min(tokenizer.model_max_length, 512)
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _pieces(self, words: set) -> dict:
+        found, missing = {}, []
+        with self._lock:
+            for word in words:
+                ids = self._data.get(word)
+                if ids is None:
+                    missing.append(word)
+                    continue
+                self._data.move_to_end(word)
+                found[word] = ids
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        if missing:
+            encoded = self.tokenizer(missing, add_special_tokens=False)["input_ids"]
+            fresh = {word: tuple(ids) for word, ids in zip(missing, encoded)}
+            found.update(fresh)
+            if self.maxsize > 0:
+                with self._lock:
+                    self._data.update(fresh)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+                        self.evictions += 1
+        return found
+
+    def encode(self, words_batch: list[list[str]], return_tensors: str = "np") -> CachedEncoding:
+        # numpy идва с transformers; модулът се импортира и без ML зависимостите (Vercel)
+        import numpy as np
+
+        pieces = self._pieces({word for words in words_batch for word in words})
+        budget = self.max_length - 2  # [CLS] и [SEP]
+
+        rows, word_ids, first_positions = [], [], []
+        for words in words_batch:
+            ids, wids, firsts = [self.tokenizer.cls_token_id], [None], []
+            for wid, word in enumerate(words):
+                word_pieces = pieces[word][:max(0, budget - (len(ids) - 1))]
+                if word_pieces:
+                    firsts.append(len(ids))
+                ids.extend(word_pieces)
+                wids.extend([wid] * len(word_pieces))
+            ids.append(self.tokenizer.sep_token_id)
+            wids.append(None)
+            rows.append(ids)
+            word_ids.append(wids)
+            first_positions.append(firsts)
+
+        # Dynamic padding до най-дългия ред в batch-а
+        width = max(len(ids) for ids in rows)
+        input_ids = np.full((len(rows), width), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+        first_subword_mask = np.zeros((len(rows), width), dtype=bool)
+        for row, (ids, wids) in enumerate(zip(rows, word_ids)):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+            first_subword_mask[row, first_positions[row]] = True
+            wids.extend([None] * (width - len(ids)))
+
+        data = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if return_tensors == "pt":
+            import torch
+
+            data = {key: torch.from_numpy(value) for key, value in data.items()}
+        return CachedEncoding(data, word_ids, first_subword_mask)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }